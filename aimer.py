@@ -1,14 +1,136 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QSlider, QSpinBox, QDoubleSpinBox,
-                             QPushButton, QSplitter, QDesktopWidget)
-from PyQt5.QtCore import Qt, QPoint, QPointF
-from PyQt5.QtGui import QPainter, QPen, QColor
+                             QPushButton, QSplitter, QDesktopWidget, QFileDialog, QComboBox)
+from PyQt5.QtCore import Qt, QObject, QTimer, QPoint, QPointF, QRect, QRectF, QSettings, pyqtSignal
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF, QPixmap, QImage
+import json
 import math
+import os
+import time
+
+import numpy as np
+
+import ballistics
 
 LEFT_SPACE = 0
+HUD_WIDTH = 380  # Performance overlay in the canvas' top-left corner
+HUD_LINES = 7
+AIM_SWEEP_ROWS = 6  # Power levels listed at the target, from the minimum power to 100%
+AIM_TOLERANCE = 0.1  # Largest miss (px) at the target accepted for a refined firing-table angle
+PIN_HIT_RADIUS = 12  # Shift+right-click this close to a pinned shooter unpins it
+CALIBRATION_BUTTON_STYLE = """
+    QPushButton {
+        background-color: #16a085;
+        color: white;
+        border: none;
+        padding: 6px;
+        border-radius: 4px;
+        margin-bottom: 4px;
+    }
+    QPushButton:hover {
+        background-color: #138d75;
+    }
+    QPushButton:checked {
+        background-color: #0e6655;
+    }
+    QPushButton:disabled {
+        background-color: #a2d9ce;
+    }
+"""
+SETTINGS_ORGANIZATION = 'WormsAimer'
+SETTINGS_APPLICATION = 'Aimer'
+STARTUP_PROBE = 'AIMER_STARTUP_PROBE'  # Launch time (time.time()) set by benchmark.py
+
+
+def set_layout_visible(layout, visible):
+    # 显示/隐藏布局里的全部控件 (包括嵌套布局)
+    for i in range(layout.count()):
+        item = layout.itemAt(i)
+        if item.widget() is not None:
+            item.widget().setVisible(visible)
+        elif item.layout() is not None:
+            set_layout_visible(item.layout(), visible)
+
+
+def load_terrain(path):
+    # 读取地形蒙版: 有透明通道时不透明像素为实心, 否则亮度>=128(白色)为实心
+    image = QImage(path)
+    if image.isNull():
+        return None
+    has_alpha = image.hasAlphaChannel()
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    ptr = image.constBits()
+    ptr.setsize(image.byteCount())
+    rows = np.frombuffer(ptr, np.uint8).reshape(image.height(), image.bytesPerLine())
+    rgba = rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4)
+    from terrain import TerrainMask
+
+    if has_alpha:
+        return TerrainMask.from_rgba(rgba)
+    return TerrainMask(rgba[..., :3].mean(axis=2) >= 128)
+
+
+def polygon_from_array(points):
+    # 一次内存拷贝把 (n, 2) float64 数组写进 QPolygonF 的缓冲区, 不创建任何 QPointF 对象
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    polygon = QPolygonF(len(points))
+    if len(points):
+        buffer = polygon.data()
+        buffer.setsize(points.nbytes)
+        np.frombuffer(buffer, np.float64).reshape(-1, 2)[:] = points
+    return polygon
+
+
+def frame_interval_ms():
+    # 一帧的时长, 取主屏幕刷新率, 无法获取时按 60Hz
+    app = QApplication.instance()
+    screen = app.primaryScreen() if app else None
+    rate = screen.refreshRate() if screen else 0
+    return max(1, int(1000 / rate)) if rate > 0 else 16
+
+
+class FrameScheduler(QObject):
+    # 把一帧内的多次请求合并成一次回调: 空闲时立即执行, 否则推迟到下一帧统一执行
+    def __init__(self, callback, parent=None):
+        super().__init__(parent)
+        self.callback = callback
+        self.pending = False
+        self.requests = 0  # Total requests received
+        self.runs = 0  # Callbacks actually executed
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(frame_interval_ms())
+        self.timer.timeout.connect(self._on_frame)
+        
+    def request(self):
+        self.requests += 1
+        if self.timer.isActive():
+            self.pending = True
+            return
+        self._run()
+        
+    def flush(self):
+        # 立即执行挂起的回调 (例如松开鼠标时需要最终状态)
+        if self.pending:
+            self.timer.stop()
+            self._run()
+            
+    def _on_frame(self):
+        if self.pending:
+            self._run()
+            
+    def _run(self):
+        self.pending = False
+        self.runs += 1
+        self.callback()
+        self.timer.start()
 
 class TransparentCanvas(QWidget):
+    observations_changed = pyqtSignal(int)  # Number of recorded calibration shots
+    firing_table_changed = pyqtSignal(str)
+    first_frame = pyqtSignal()  # Emitted once, after the first paint finished
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAttribute(Qt.WA_TranslucentBackground)
@@ -32,32 +154,133 @@ class TransparentCanvas(QWidget):
         self.ticks_per_second = 30  # Will be set from main window
         self.wind_power = 0    # Will be set from main window (-10 to 10)
         self.wind_accel = 5    # Will be set from main window (pixels/sec^2)
-        self.trajectory_points = []
-        self.time_points = []  # Points at each second
+        self.trajectory_points = np.empty((0, 2))  # (n, 2) float64 arc vertices
+        self.time_points = np.empty((0, 2))  # Points at each second
+        self.aim_mode = False  # Left click picks a target instead of dragging
+        self.target_point = None
+        self.aim_solutions = []  # (angle, power, points) for the flat and high shot
+        self.aim_message = None  # Shown at the target when it is out of range
+        self.aim_sweep = []  # Readout lines of every power that hits the target (flat / lob angles)
+        self.trajectory_polygon = QPolygonF()  # Arc built once per trajectory change
+        self._static_layer = None  # Cached background, max-radius circle and center dot
+        self._overlay_rect = QRect()  # Area covered by the dynamic overlays last frame
+        self.repaint_pixels = 0  # Pixels repainted by the last paintEvent
+        self.repaint_pixels_total = 0
+        self.repaint_frames = 0
+        self.sample_tolerance = 0.25  # Max distance (px) between drawn polyline and true arc, None for fixed dt
+        self.max_trajectory_points = None  # Optional hard cap on vertices per arc
+        self.trajectory_cache = ballistics.TrajectoryCache()
+        self.engine = 'continuous'  # 'tick' steps shots like the game's fixed-point physics
+        self._trajectory_key = None  # Cache key of the trajectory currently shown
+        # Input only marks state dirty; at most one recompute per display frame
+        self._trajectory_dirty = False
+        self._aim_dirty = False
+        self.scheduler = FrameScheduler(self.recompute, self)
+        self.stats = None  # FrameStats while the performance HUD is on
+        self.terrain = None  # TerrainMask the arcs stop at, if loaded
+        self.impact_point = None  # Where the current arc hits the terrain
+        self.coverage_enabled = False  # Reachability heat map under the arcs
+        self.coverage_job = None
+        self._coverage_image = None  # QImage of the latest heat-map counts
+        self.coverage_timer = QTimer(self)  # Folds finished pool chunks into the image
+        self.coverage_timer.setInterval(50)
+        self.coverage_timer.timeout.connect(self.poll_coverage)
+        self.coverage_restart = QTimer(self)  # Debounces restarts while parameters change
+        self.coverage_restart.setSingleShot(True)
+        self.coverage_restart.setInterval(150)
+        self.coverage_restart.timeout.connect(self.start_coverage)
+        self.uncertainty = None  # WindUncertainty while the Monte Carlo band is shown
+        self.envelope_band = QPolygonF()  # Min/max band of the perturbed shots
+        self.spread_ellipse = None  # (center, rx, ry, degrees) of the landing spread
+        self.hit_radius = None  # Show the angle/power ranges landing this close (px), None = off
+        self.sensitivity = None  # sensitivity.Sensitivity of the current shot while hit_radius is set
+        self.calibration_mode = False  # After each drag, the next left click marks where it landed
+        self.observations = []  # calibration.Observation of every recorded shot
+        self.pending_shot = None  # (x0, y0, dx, dy, wind) waiting for its landing point
+        self.flight_seconds = float('nan')  # Fuse seconds recorded with the next landing
+        self.recorder = None  # SessionRecorder while a session log is being written
+        self.fan_mode = None  # 'power' / 'angle': preview the family of arcs around the shot
+        self.fan_arcs = []  # (angle, power, polygon) of every arc in the fan
+        self._fan_key = None  # Fan stays cached while only the varying quantity changes
+        self.firing_table_enabled = False  # Inverse aim reads the precomputed table
+        self.firing_table = None  # Memory-mapped FiringTable, may be for an older profile
+        self._table_build = None  # Thread building the table for the current profile
+        self._table_error = None
+        self.table_timer = QTimer(self)  # Waits for the background build to finish
+        self.table_timer.setInterval(100)
+        self.table_timer.timeout.connect(self.poll_firing_table)
+        self.table_restart = QTimer(self)  # Debounces rebuilds while constants change
+        self.table_restart.setSingleShot(True)
+        self.table_restart.setInterval(500)
+        self.table_restart.timeout.connect(self.load_firing_table)
+        self.grenade = None  # (fuse_seconds, restitution): bounce off terrain until the fuse runs out
+        self.bounce_points = np.empty((0, 2))  # Terrain contacts of the grenade path
+        self.pinned_shooters = []  # (QPoint, angle, power) pinned with Shift+right-click
+        self.pinned_arcs = []  # (key, polygon, fuse_points) per pinned shooter
+        self._pinned_dirty = False
         self.setMouseTracking(True)  # Enable mouse tracking for better interaction
         
     def mousePressEvent(self, event):
+        if self.recorder:
+            import session
+
+            self.recorder.mouse(session.PRESS, event)
         if event.button() == Qt.RightButton:
+            if event.modifiers() & Qt.ShiftModifier and self.pin_shooter(event.pos()):
+                return
             # Clear previous trajectory and set new center point
             self.center_point = event.pos()
             self.current_point = None
             self.last_angle = None
             self.last_power = None
-            self.trajectory_points = []
-            self.time_points = []
-            self.update()
+            self.trajectory_points = np.empty((0, 2))
+            self.time_points = np.empty((0, 2))
+            self.trajectory_polygon = QPolygonF()
+            self._trajectory_key = None
+            self.impact_point = None
+            self.bounce_points = np.empty((0, 2))
+            self.envelope_band = QPolygonF()
+            self.spread_ellipse = None
+            self.sensitivity = None
+            self.fan_arcs = []
+            self._fan_key = None
+            self.target_point = None
+            self.aim_solutions = []
+            self.aim_message = None
+            self.aim_sweep = []
+            self.pending_shot = None
+            self.invalidate_static_layer()
+            self.schedule_coverage()
+        elif event.button() == Qt.LeftButton and self.pending_shot:
+            self.record_landing(event.pos())
+        elif event.button() == Qt.LeftButton and self.center_point and self.aim_mode:
+            self.target_point = event.pos()
+            self.schedule_aim()
         elif event.button() == Qt.LeftButton and self.center_point:
             # Start trajectory calculation
             self.current_point = event.pos()
-            self.calculate_trajectory()
+            self.schedule_trajectory()
             
     def mouseMoveEvent(self, event):
-        if event.buttons() & Qt.LeftButton and self.center_point:
+        if self.recorder and event.buttons() & Qt.LeftButton:
+            import session
+
+            self.recorder.mouse(session.MOVE, event)
+        if event.buttons() & Qt.LeftButton and self.center_point and self.aim_mode:
+            self.target_point = event.pos()
+            self.schedule_aim()
+        elif event.buttons() & Qt.LeftButton and self.center_point:
             self.current_point = event.pos()
-            self.calculate_trajectory()
+            self.schedule_trajectory()
             
     def mouseReleaseEvent(self, event):
+        if self.recorder:
+            import session
+
+            self.recorder.mouse(session.RELEASE, event)
         if event.button() == Qt.LeftButton:
+            # Make sure the final position has been computed
+            self.scheduler.flush()
             # Store the last angle and power before clearing current point
             if self.center_point and self.current_point:
                 dx = self.current_point.x() - self.center_point.x()
@@ -66,122 +289,778 @@ class TransparentCanvas(QWidget):
                 
                 distance = math.sqrt(dx * dx + dy * dy)
                 self.last_power = min(100, (distance / self.max_radius * 100) if self.max_radius else 100)
+                if self.calibration_mode:
+                    self.pending_shot = (self.center_point.x(), self.center_point.y(),
+                                         dx, dy, self.wind_power)
             
             self.current_point = None
-            self.update()
+            self.refresh()
             
-    def calculate_power(self):
-        if not self.center_point or not self.current_point:
-            return 0
+    def schedule_trajectory(self):
+        if self.stats:
+            self.stats.mark_input()
+        self._trajectory_dirty = True
+        self.scheduler.request()
         
-        # Calculate distance between center and current point
-        distance = math.sqrt(
-            (self.current_point.x() - self.center_point.x()) ** 2 +
-            (self.current_point.y() - self.center_point.y()) ** 2
-        )
+    def schedule_aim(self):
+        if self.stats:
+            self.stats.mark_input()
+        self._aim_dirty = True
+        self.scheduler.request()
         
-        # If max_radius is not set, use the distance directly
-        if self.max_radius is None:
-            return 100
-            
-        # If distance is greater than max_radius, return 100% power
-        if distance > self.max_radius:
-            return 100
+    def recompute(self):
+        # 每帧最多执行一次: 只重算被标记为脏的部分
+        if self._trajectory_dirty:
+            self._trajectory_dirty = False
+            if self.stats:
+                started = time.perf_counter()
+                self.calculate_trajectory()
+                self.stats.record('trajectory_ms', (time.perf_counter() - started) * 1000)
+                self.stats.record('vertices', len(self.trajectory_points))
+            else:
+                self.calculate_trajectory()
+        if self._aim_dirty:
+            self._aim_dirty = False
+            self.calculate_aim()
+        if self._pinned_dirty:
+            self._pinned_dirty = False
+            self.calculate_pinned()
             
-        # Calculate power percentage (0-100)
-        power = (distance / self.max_radius) * 100
-        return power
+    def calculate_power(self):
+        if not self.center_point or not self.current_point:
+            return 0
+        dx = self.current_point.x() - self.center_point.x()
+        dy = self.current_point.y() - self.center_point.y()
+        return ballistics.shot_power(dx, dy, self.max_radius)
         
     def calculate_angle(self):
         if not self.center_point or not self.current_point:
             return 0
-            
-        # Calculate angle in radians
         dx = self.current_point.x() - self.center_point.x()
-        dy = self.center_point.y() - self.current_point.y()  # Inverted Y axis
-        angle = math.atan2(dy, dx)
-        return angle
+        dy = self.current_point.y() - self.center_point.y()
+        return ballistics.shot_angle(dx, dy)
         
     def calculate_trajectory(self):
         if not self.center_point or not self.current_point:
             return
             
-        # Calculate angle and initial velocity
-        dx = self.current_point.x() - self.center_point.x()
-        dy = self.current_point.y() - self.center_point.y()
-        angle = math.atan2(-dy, dx)  # Negative because y is inverted in screen coordinates
-        
-        # Calculate power (0-100%)
-        power = self.calculate_power()
-        
-        # Calculate initial velocity components
-        v0 = self.max_velocity * (power / 100)
-        v0x = v0 * math.cos(angle)
-        v0y = v0 * math.sin(angle)
-        
-        # Calculate points
-        points = []
-        time_points = []
-        dt = 0.02  # 更小的时间步长以获得更平滑的轨迹
-        x0 = self.center_point.x()
-        y0 = self.center_point.y()
-        
-        # 计算轨迹点
-        t = 0
-        while True:
-            # 计算风力效果
-            wind_ax = self.wind_power * self.wind_accel
-            
-            # 计算位置
-            x = x0 + v0x * t + 0.5 * wind_ax * t * t
-            y = y0 - (v0y * t - 0.5 * self.gravity * t * t)  # Y轴反转
-            
-            # 计算垂直速度
-            vy = v0y - self.gravity * t
-            going_down = vy < 0
-            
-            # 获取画布大小
-            canvas_height = self.height() if self.height() > 0 else 1000
-            canvas_width = self.width() if self.width() > 0 else 1000
-            
-            # 检查水平边界
-            if x < 0 or x > canvas_width:
-                break
-                
-            # 添加轨迹点
-            point = QPointF(x, y)
-            points.append(point)
-            
-            t += dt
-            
-            # 检查是否超出底部边界
-            if going_down and y > canvas_height:
-                break
-        
-        # 直接计算6个时间点的位置
-        for i in range(1, 7):
-            t = i * self.ticks_per_second  # 实际物理时间
-            x = x0 + v0x * t + 0.5 * wind_ax * t * t
-            y = y0 - (v0y * t - 0.5 * self.gravity * t * t)
-            time_points.append(QPointF(x, y))
-            
-            # Check if we should stop - only when going down and below bottom
-            if going_down and y > canvas_height:
-                break
-                
-            t += dt
+        canvas_height = self.height() if self.height() > 0 else 1000
+        canvas_width = self.width() if self.width() > 0 else 1000
+        angle, power = self.calculate_angle(), self.calculate_power()
+        shot = (self.center_point.x(), self.center_point.y(), angle, power,
+                self.gravity, self.max_velocity, self.wind_power, self.wind_accel,
+                self.ticks_per_second, canvas_width, canvas_height,
+                self.sample_tolerance, self.max_trajectory_points, self.engine)
+        # 同一像素内的抖动或重复的参数不需要重新计算
+        key = self.trajectory_cache.key(*shot)
+        if self.grenade is not None:
+            key = (key, id(self.terrain), self.grenade)
+        if key == self._trajectory_key:
+            return
+        if self.grenade is not None:
+            # 手雷: 逐段求出碰撞时刻并反弹, 直到引线烧完; 终点为爆炸位置.
+            # 没有地形时在画布底边反弹; 逐帧引擎没有反弹模型, 手雷总是按连续模型计算
+            import bounce
+
+            fuse_seconds, restitution = self.grenade
+            flight = bounce.simulate(*shot[:11], self.terrain, fuse_seconds, restitution,
+                                     self.sample_tolerance or 0.25)
+            points, time_points = flight.points, flight.fuse_points
+            self.bounce_points = flight.bounces
+            self.impact_point = QPointF(*flight.detonation) if flight.detonation is not None else None
+        else:
+            points, time_points = self.trajectory_cache.trajectory(*shot)
+            points, time_points, self.impact_point = self.clip_to_terrain(
+                points, time_points, angle, power)
+            self.bounce_points = np.empty((0, 2))
         
+        self._trajectory_key = key
         self.trajectory_points = points
         self.time_points = time_points
+        self.trajectory_polygon = polygon_from_array(points)
+        self.calculate_envelope(angle, power)
+        self.calculate_sensitivity(angle, power)
+        self.calculate_fan(angle, power)
+        self.refresh()
+        
+    def calculate_envelope(self, angle, power):
+        # 对风力/风加速度/力度的扰动样本一次性批量计算, 得到轨迹包络带和落点散布椭圆
+        self.envelope_band = QPolygonF()
+        self.spread_ellipse = None
+        if self.uncertainty is None:
+            return
+        canvas_height = self.height() if self.height() > 0 else 1000
+        canvas_width = self.width() if self.width() > 0 else 1000
+        import uncertainty
+
+        result = uncertainty.envelope(
+            self.center_point.x(), self.center_point.y(),
+            angle, power, self.gravity, self.max_velocity, self.wind_power, self.wind_accel,
+            self.uncertainty, canvas_width, canvas_height, self.terrain)
+        if result is None:
+            return
+        self.envelope_band = polygon_from_array(result.band)
+        rx, ry = result.axes.tolist()
+        self.spread_ellipse = (QPointF(*result.center.tolist()), rx, ry, math.degrees(result.angle))
+        
+    def set_uncertainty_enabled(self, enabled):
+        import uncertainty
+
+        self.uncertainty = uncertainty.WindUncertainty() if enabled else None
+        self._trajectory_key = None
+        if self.center_point and self.current_point:
+            self._trajectory_dirty = True
+            self.scheduler.request()
+            return
+        if len(self.trajectory_points) and self.last_angle is not None:
+            # 已松开鼠标: 对保留的最后一条轨迹计算
+            self.calculate_envelope(self.last_angle, self.last_power)
+        else:
+            self.envelope_band = QPolygonF()
+            self.spread_ellipse = None
+        self.refresh()
+        
+    def calculate_sensitivity(self, angle, power):
+        # 落点对角度/力度/风力的闭式导数: 误差椭圆和仍落在 hit_radius 内的角度/力度范围.
+        # 手雷的落点取决于反弹, 不计算
+        self.sensitivity = None
+        if self.hit_radius is None or self.grenade is not None:
+            return
+        import bounce
+        import sensitivity
+
+        x0, y0 = self.center_point.x(), self.center_point.y()
+        physics = (self.gravity, self.max_velocity, self.wind_power, self.wind_accel)
+        if self.impact_point:
+            # 落在地形上: 用撞击时刻和撞击处的地表法向
+            px, py = self.impact_point.x(), self.impact_point.y()
+            t = ballistics.flight_time_to(x0, y0, angle, power, *physics, px, py)
+            v0x, v0y = (float(v) for v in ballistics.launch_velocity(angle, power, self.max_velocity))
+            velocity = (v0x + self.wind_power * self.wind_accel * t, -v0y + self.gravity * t)
+            normal = bounce.surface_normal(self.terrain, px, py, velocity)
+        else:
+            canvas_height = self.height() if self.height() > 0 else 1000
+            canvas_width = self.width() if self.width() > 0 else 1000
+            landing = sensitivity.canvas_landing(x0, y0, angle, power, *physics,
+                                                 canvas_width, canvas_height)
+            if landing is None:
+                return
+            t, normal = landing
+        self.sensitivity = sensitivity.analyze(x0, y0, angle, power, *physics, t, normal,
+                                               self.hit_radius)
+        
+    def set_hit_radius(self, radius):
+        self.hit_radius = radius
+        self._trajectory_key = None
+        if self.recorder:
+            self.record_mode('hit_radius')
+        if self.center_point and self.current_point:
+            self._trajectory_dirty = True
+            self.scheduler.request()
+            return
+        if len(self.trajectory_points) and self.last_angle is not None:
+            # 已松开鼠标: 对保留的最后一条轨迹计算
+            self.calculate_sensitivity(self.last_angle, self.last_power)
+        else:
+            self.sensitivity = None
+        self.refresh()
+        
+    def sensitivity_labels(self):
+        # 命中范围和落点散布的文字, 显示在命中圆右侧
+        low, high = (math.degrees(a) for a in self.sensitivity.angle_range)
+        return [f"角度 {low:.1f}~{high:.1f}°  力度 {self.sensitivity.power_range[0]:.1f}"
+                f"~{self.sensitivity.power_range[1]:.1f}%",
+                f"落点 ±{self.sensitivity.landing_sigma:.0f} px"]
+        
+    def calculate_fan(self, angle, power):
+        # 一族轨迹一次批量计算; 同角度模式下只改变力度(或反之)时沿用已构建的折线
+        if self.fan_mode is None:
+            self.fan_arcs = []
+            self._fan_key = None
+            return
+        canvas_height = self.height() if self.height() > 0 else 1000
+        canvas_width = self.width() if self.width() > 0 else 1000
+        x0, y0 = self.center_point.x(), self.center_point.y()
+        if self.fan_mode == 'power':
+            fixed_angle, fixed_power = angle, 0
+        else:
+            fixed_angle, fixed_power = (0.0 if math.cos(angle) >= 0 else math.pi), power
+        key = (self.fan_mode, id(self.terrain), self.trajectory_cache.key(
+            x0, y0, fixed_angle, fixed_power, self.gravity, self.max_velocity, self.wind_power,
+            self.wind_accel, self.ticks_per_second, canvas_width, canvas_height,
+            self.sample_tolerance, self.max_trajectory_points, self.engine))
+        if key == self._fan_key:
+            return
+        angles, powers, batch = ballistics.fan(
+            x0, y0, angle, power, self.fan_mode, self.gravity, self.max_velocity,
+            self.wind_power, self.wind_accel, self.ticks_per_second, canvas_width, canvas_height,
+            self.sample_tolerance, self.max_trajectory_points, self.engine)
+        arcs = []
+        for k, (fan_angle, fan_power) in enumerate(zip(angles.tolist(), powers.tolist())):
+            points = batch.trajectory(k)
+            if self.terrain is not None:
+                hit = self.terrain.first_hit(points)
+                if hit is not None:
+                    points = np.vstack((points[:hit[0] + 1], hit[1]))
+            arcs.append((fan_angle, fan_power, polygon_from_array(points)))
+        self.fan_arcs = arcs
+        self._fan_key = key
+        
+    def set_fan_mode(self, mode):
+        self.fan_mode = mode
+        self._fan_key = None
+        if self.recorder:
+            self.record_mode('fan_mode')
+        if self.center_point and self.current_point:
+            self.calculate_fan(self.calculate_angle(), self.calculate_power())
+        elif self.center_point and self.last_angle is not None:
+            # 已松开鼠标: 对保留的最后一次发射计算
+            self.calculate_fan(self.last_angle, self.last_power)
+        else:
+            self.fan_arcs = []
+        self.refresh()
+        
+    def pin_shooter(self, pos):
+        # Shift+右键: 点中已固定的射手则取消固定, 否则把当前射手连同最后一次发射固定下来;
+        # 两者都不适用 (还没有发射过) 时返回 False, 按普通右键设置射手
+        for i, (point, _, _) in enumerate(self.pinned_shooters):
+            if (point - pos).manhattanLength() <= PIN_HIT_RADIUS:
+                _, polygon, fuse = self.pinned_arcs[i]
+                del self.pinned_shooters[i]
+                del self.pinned_arcs[i]
+                self.update(self.pinned_rect(point, polygon, fuse))
+                return True
+        if self.center_point and self.last_angle is not None:
+            self.pinned_shooters.append((QPoint(self.center_point), self.last_angle, self.last_power))
+            self.pinned_arcs.append((None, QPolygonF(), np.empty((0, 2))))
+            self.schedule_pinned()
+            return True
+        return False
+        
+    def clear_pinned(self):
+        self.pinned_shooters = []
+        self.pinned_arcs = []
         self.update()
         
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    def schedule_pinned(self):
+        if self.pinned_shooters:
+            self._pinned_dirty = True
+            self.scheduler.request()
+        
+    def pinned_rect(self, point, polygon, fuse):
+        rect = polygon.boundingRect() | QRectF(point.x() - 6, point.y() - 6, 12, 12)
+        for x, y in fuse[:6].tolist():
+            rect |= QRectF(x - 3, y - 3, 6, 6)
+        return rect.adjusted(-4, -4, 4, 4).toAlignedRect()
+        
+    def calculate_pinned(self):
+        # 缓存键变化的固定射手 (全局参数变化时即全部) 一次批量计算, 只重绘这些轨迹
+        canvas_height = self.height() if self.height() > 0 else 1000
+        canvas_width = self.width() if self.width() > 0 else 1000
+        keys = [(id(self.terrain), self.trajectory_cache.key(
+                    point.x(), point.y(), angle, power, self.gravity, self.max_velocity,
+                    self.wind_power, self.wind_accel, self.ticks_per_second, canvas_width,
+                    canvas_height, self.sample_tolerance, self.max_trajectory_points, self.engine))
+                for point, angle, power in self.pinned_shooters]
+        stale = [i for i, key in enumerate(keys) if key != self.pinned_arcs[i][0]]
+        if not stale:
+            return
+        x0, y0, angles, powers = (np.array(column, dtype=float) for column in zip(
+            *((self.pinned_shooters[i][0].x(), self.pinned_shooters[i][0].y(),
+               self.pinned_shooters[i][1], self.pinned_shooters[i][2]) for i in stale)))
+        batch = ballistics.shot_batch(
+            x0, y0, angles, powers, self.gravity, self.max_velocity, self.wind_power,
+            self.wind_accel, self.ticks_per_second, canvas_width, canvas_height,
+            self.sample_tolerance, self.max_trajectory_points, self.engine)
+        dirty = QRect()
+        for k, i in enumerate(stale):
+            point, angle, power = self.pinned_shooters[i]
+            _, old_polygon, old_fuse = self.pinned_arcs[i]
+            points, fuse, _ = self.clip_to_terrain(batch.trajectory(k), batch.fuse(k),
+                                                   angle, power, point)
+            polygon = polygon_from_array(points)
+            self.pinned_arcs[i] = (keys[i], polygon, fuse)
+            dirty |= self.pinned_rect(point, old_polygon, old_fuse)
+            dirty |= self.pinned_rect(point, polygon, fuse)
+        self.update(dirty)
+        
+    def clip_to_terrain(self, points, time_points, angle, power, origin=None):
+        # 在第一个实心像素处截断轨迹, 并去掉落地之后的时间点
+        if self.terrain is None:
+            return points, time_points, None
+        hit = self.terrain.first_hit(points)
+        if hit is None:
+            return points, time_points, None
+        segment, position = hit
+        origin = origin or self.center_point
+        if self.engine == 'tick':
+            # 逐帧轨迹的顶点就是各帧位置, 撞击时刻按帧数插值, 与引线时间点一致
+            t_hit = ballistics.tick_time_to(points, segment, position, self.ticks_per_second)
+        else:
+            t_hit = ballistics.flight_time_to(
+                origin.x(), origin.y(), angle, power,
+                self.gravity, self.max_velocity, self.wind_power, self.wind_accel, *position)
+        fuse_times = np.arange(1, len(time_points) + 1) * self.ticks_per_second
+        points = np.vstack((points[:segment + 1], position))
+        return points, time_points[fuse_times <= t_hit], QPointF(*position)
+        
+    def set_terrain(self, terrain):
+        self.terrain = terrain
+        self._trajectory_key = None
+        if self.recorder:
+            self.record_mode('terrain')
+        if self.center_point and self.current_point:
+            self._trajectory_dirty = True
+        if self.target_point:
+            self._aim_dirty = True
+        self.scheduler.request()
+        self.schedule_coverage()
+        self.schedule_pinned()
+        
+    def set_coverage_enabled(self, enabled):
+        self.coverage_enabled = enabled
+        if enabled:
+            self.start_coverage()
+        else:
+            self.stop_coverage()
+            self._coverage_image = None
+            self.invalidate_static_layer()
+        
+    def schedule_coverage(self):
+        if self.coverage_enabled:
+            self.stop_coverage()
+            self.coverage_restart.start()
+        
+    def start_coverage(self):
+        # 先在本进程算一个粗网格立即显示, 完整网格交给进程池逐块合并
+        self.stop_coverage()
+        if not self.center_point or self.width() <= 0 or self.height() <= 0:
+            self._coverage_image = None
+            self.invalidate_static_layer()
+            return
+        import reachability  # 进程池等依赖较重, 首次使用时才导入
+
+        self.coverage_job = reachability.CoverageJob({
+            'x0': self.center_point.x(), 'y0': self.center_point.y(),
+            'gravity': self.gravity, 'max_velocity': self.max_velocity,
+            'wind_power': self.wind_power, 'wind_accel': self.wind_accel,
+            'width': self.width(), 'height': self.height(),
+        }, terrain=self.terrain)
+        self.set_coverage_counts(self.coverage_job.coarse())
+        self.coverage_job.start()
+        self.coverage_timer.start()
+        
+    def stop_coverage(self):
+        self.coverage_restart.stop()
+        self.coverage_timer.stop()
+        if self.coverage_job is not None:
+            self.coverage_job.cancel()
+            self.coverage_job = None
+        
+    def poll_coverage(self):
+        job = self.coverage_job
+        if job is None:
+            return
+        if job.poll():
+            self.set_coverage_counts(job.counts)
+        if job.done:
+            self.coverage_timer.stop()
+            self.coverage_job = None
+        
+    def set_coverage_counts(self, counts):
+        import reachability
+
+        rgba = np.ascontiguousarray(reachability.heat_image(counts))
+        rows, cols = counts.shape
+        self._coverage_image = QImage(rgba.data, cols, rows, cols * 4, QImage.Format_RGBA8888).copy()
+        self.invalidate_static_layer()
+        
+    def table_profile(self):
+        import firing_table
+
+        return firing_table.Profile(float(self.gravity), float(self.max_velocity),
+                                    float(self.wind_accel))
+        
+    def set_firing_table_enabled(self, enabled):
+        self.firing_table_enabled = enabled
+        self._table_error = None
+        if enabled:
+            self.load_firing_table()
+        else:
+            self.table_restart.stop()
+            self.firing_table = None
+            self.firing_table_changed.emit('')
+        if self.target_point:
+            self.schedule_aim()
+        
+    def schedule_firing_table(self):
+        if self.firing_table_enabled:
+            self.table_restart.start()
+        
+    def load_firing_table(self):
+        # 当前常数的射表已存在则直接映射, 否则在后台线程生成后再映射
+        if not self.firing_table_enabled or self._table_error:
+            return
+        if self._table_build is not None:
+            # 同一时间只生成一张表, 生成完成后 poll 会按最新的常数重新加载
+            return
+        import firing_table
+
+        if self.firing_table is not None and self.firing_table.matches(
+                self.gravity, self.max_velocity, self.wind_accel):
+            return
+        profile = self.table_profile()
+        table = firing_table.open_table(profile, create=False)
+        if table is not None:
+            self.firing_table = table
+            self.firing_table_changed.emit(f'{table.nbytes / 2 ** 20:.0f} MiB')
+            if self.target_point:
+                self.schedule_aim()
+            return
+        
+        def build():
+            try:
+                firing_table.open_table(profile)  # 生成后清理最久未用的旧表
+            except OSError as e:
+                self._table_error = e
+        
+        import threading
+
+        self._table_build = threading.Thread(target=build, name='firing-table', daemon=True)
+        self._table_build.start()
+        self.table_timer.start()
+        self.firing_table_changed.emit('生成中...')
+        
+    def poll_firing_table(self):
+        if self._table_build is None or self._table_build.is_alive():
+            return
+        self.table_timer.stop()
+        self._table_build = None
+        if self._table_error:
+            self.firing_table_changed.emit(f'生成失败: {self._table_error}')
+            return
+        self.load_firing_table()
+        
+    def set_engine(self, engine):
+        self.engine = engine
+        self._trajectory_key = None
+        if self.recorder:
+            self.record_mode('engine')
+        if self.center_point and self.current_point:
+            self._trajectory_dirty = True
+        if self.target_point:
+            self._aim_dirty = True
+        self.scheduler.request()
+        self.schedule_pinned()
+        
+    def set_grenade(self, fuse_seconds, restitution):
+        # fuse_seconds 为 None 时关闭手雷模式
+        self.grenade = None if fuse_seconds is None else (fuse_seconds, restitution)
+        self._trajectory_key = None
+        if self.recorder:
+            self.record_mode('grenade')
+        if self.center_point and self.current_point:
+            self._trajectory_dirty = True
+            self.scheduler.request()
+        
+    def set_calibration_mode(self, enabled):
+        self.calibration_mode = enabled
+        self.pending_shot = None
+        if self.recorder:
+            self.record_mode('calibration')
+        self.refresh()
+        
+    def record_landing(self, pos):
+        # 记录刚才这一发在游戏里的实际落点
+        x0, y0, dx, dy, wind = self.pending_shot
+        self.pending_shot = None
+        import calibration
+
+        self.observations.append(calibration.observation(
+            x0, y0, dx, dy, self.max_radius, wind, pos.x(), pos.y(), self.flight_seconds))
+        self.observations_changed.emit(len(self.observations))
+        self.refresh()
+        
+    def clear_observations(self):
+        self.observations = []
+        self.pending_shot = None
+        self.observations_changed.emit(0)
+        self.refresh()
+        
+    def start_recording(self, path):
+        # 先写入当前尺寸和参数, 回放时从相同的状态开始
+        import session
+
+        self.recorder = session.SessionRecorder(path)
+        self.recorder.record(session.RESIZE, self.width(), self.height())
+        self.recorder.record(session.PARAMS, self.max_radius, self.gravity, self.max_velocity,
+                             self.ticks_per_second, self.wind_power, self.wind_accel)
+        for name in ('aim_mode', 'calibration', 'engine', 'fan_mode', 'grenade', 'hit_radius', 'terrain'):
+            self.record_mode(name)
+        
+    def record_mode(self, name):
+        # 把一种模式 (session.KINDS 中的名字) 的当前状态写入会话记录, 回放时才能走同样的计算
+        import session
+
+        if name == 'terrain':
+            self.recorder.terrain(self.terrain)
+            return
+        values = {
+            'aim_mode': (self.aim_mode,),
+            'calibration': (self.calibration_mode,),
+            'engine': (ballistics.ENGINES.index(self.engine),),
+            'fan_mode': (session.FAN_MODES.index(self.fan_mode),),
+            'grenade': self.grenade or (0, 0),
+            'hit_radius': (self.hit_radius or 0,),
+        }[name]
+        self.recorder.record(session.KINDS[name], *values)
+        
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        
+    def set_aim_mode(self, enabled):
+        self.aim_mode = enabled
+        if self.recorder:
+            self.record_mode('aim_mode')
+        if not enabled:
+            self.target_point = None
+            self.aim_solutions = []
+            self.aim_message = None
+            self.aim_sweep = []
+        self.refresh()
+        
+    def calculate_aim(self):
+        # 反解: 以当前力度(未拖动过则为100%)求出命中目标点的平射和吊射角度
+        self.aim_solutions = []
+        self.aim_message = None
+        self.aim_sweep = []
+        if not self.center_point or not self.target_point:
+            self.refresh()
+            return
+        power = self.last_power if self.last_power is not None else 100
+        angles = self.aim_angles([power])[0]
+        canvas_height = self.height() if self.height() > 0 else 1000
+        canvas_width = self.width() if self.width() > 0 else 1000
+        for angle in angles.tolist():
+            if math.isnan(angle):
+                continue
+            points, fuse = self.trajectory_cache.trajectory(
+                self.center_point.x(), self.center_point.y(), angle, power,
+                self.gravity, self.max_velocity, self.wind_power, self.wind_accel,
+                self.ticks_per_second, canvas_width, canvas_height,
+                self.sample_tolerance, self.max_trajectory_points, self.engine)
+            points, _, _ = self.clip_to_terrain(points, fuse, angle, power)
+            self.aim_solutions.append((angle, power, polygon_from_array(points)))
+        if not self.aim_solutions:
+            min_power = ballistics.min_aim_power(
+                self.center_point.x(), self.center_point.y(),
+                self.target_point.x(), self.target_point.y(),
+                self.gravity, self.max_velocity, self.wind_power, self.wind_accel)
+            self.aim_message = f"{power:.0f}% 无法命中, 至少需要 {min_power:.1f}%"
+        # 其他力度下的全部解: 从最小可达力度到 100% 扫描, 列在目标点下方
+        powers = ballistics.aim_powers(
+            self.center_point.x(), self.center_point.y(),
+            self.target_point.x(), self.target_point.y(),
+            self.gravity, self.max_velocity, self.wind_power, self.wind_accel, AIM_SWEEP_ROWS)
+        angles = self.aim_angles(powers) if len(powers) else np.empty((0, 2))
+        for p, pair in zip(powers.tolist(), angles.tolist()):
+            flat, lob = (f"{math.degrees(a):.1f}°" if not math.isnan(a) else "-" for a in pair)
+            self.aim_sweep.append(f"{p:.1f}%: {flat} / {lob}")
+        self.refresh()
+        
+    def aim_angles(self, powers):
+        # 每个力度的 [平射, 吊射] 角度. 射表查出的角度只作初值, 按精确运动学修正后
+        # 仍偏离目标、查不到 (如上升段直接命中) 或两个初值收敛到同一解的, 整行改用闭式解
+        target = (self.center_point.x(), self.center_point.y(),
+                  self.target_point.x(), self.target_point.y())
+        physics = (self.gravity, self.max_velocity, self.wind_power, self.wind_accel)
+        powers = np.asarray(powers, dtype=float)
+        angles = np.full((len(powers), 2), np.nan)
+        table = self.firing_table
+        if (table is not None and self.engine == 'continuous' and
+                table.matches(self.gravity, self.max_velocity, self.wind_accel)):
+            seeds = np.array([table.aim(*target, power, self.wind_power) for power in powers.tolist()])
+            refined, miss = ballistics.refine_aim(*target, seeds, powers[:, None], *physics)
+            distinct = ~(np.abs(refined[:, 0] - refined[:, 1]) <= 1e-6)
+            angles = np.where((miss <= AIM_TOLERANCE) & distinct[:, None], refined, np.nan)
+        missing = np.isnan(angles).any(axis=1)
+        if missing.any():
+            angles[missing], _ = ballistics.solve_aim(*target, powers[missing], *physics)
+        return angles
+        
+    def radius_end(self, angle):
+        # 沿发射角方向、长度为最大半径的辅助线终点
+        reach = self.max_radius or 200
+        return QPointF(self.center_point.x() + math.cos(angle) * reach,
+                       self.center_point.y() - math.sin(angle) * reach)
+        
+    def overlay_rect(self):
+        # 所有随拖动变化的元素(辅助线、力度圆、轨迹、时间标签、瞄准解)的外接矩形
+        metrics = self.fontMetrics()
+        rect = QRectF()
+        
+        def label(x, y, text):
+            return QRectF(metrics.boundingRect(text)).translated(x, y)
+        
+        if self.center_point and (self.current_point or self.last_angle is not None):
+            reach = self.max_radius or 200
+            rect |= QRectF(self.center_point.x() - reach, self.center_point.y() - reach,
+                           2 * reach, 2 * reach)
+            if self.current_point:
+                rect |= QRectF(QPointF(self.center_point), QPointF(self.current_point)).normalized()
+        if not self.envelope_band.isEmpty():
+            rect |= self.envelope_band.boundingRect()
+        for _, _, polygon in self.fan_arcs:
+            rect |= polygon.boundingRect()
+        if self.spread_ellipse:
+            center, rx, ry, _ = self.spread_ellipse
+            reach = max(rx, ry) + 2
+            rect |= QRectF(center.x() - reach, center.y() - reach, 2 * reach, 2 * reach)
+        if self.sensitivity:
+            x, y = self.sensitivity.landing.tolist()
+            reach = max(*self.sensitivity.axes.tolist(), self.sensitivity.radius) + 2
+            rect |= QRectF(x - reach, y - reach, 2 * reach, 2 * reach)
+            for i, text in enumerate(self.sensitivity_labels()):
+                rect |= label(int(x + self.sensitivity.radius) + 6, int(y) + 16 * i, text)
+        if len(self.trajectory_points):
+            rect |= self.trajectory_polygon.boundingRect()
+            if self.impact_point:
+                reach = 16 if self.grenade else 8
+                rect |= QRectF(self.impact_point.x() - reach, self.impact_point.y() - reach,
+                               2 * reach, 2 * reach)
+            for x, y in self.bounce_points.tolist():
+                rect |= QRectF(x - 5, y - 5, 10, 10)
+            for i, (x, y) in enumerate(self.time_points[:6].tolist()):
+                rect |= QRectF(x - 2, y - 2, 4, 4)
+                rect |= label(int(x) + 10, int(y) - 10, f"{i+1}s")
+        if self.calibration_mode:
+            for obs in self.observations:
+                rect |= QRectF(obs.tx - 6, obs.ty - 6, 12, 12)
+            if self.pending_shot:
+                x0, y0 = self.pending_shot[:2]
+                rect |= label(x0 + 10, y0 + 20, "点击实际落点")
+        if self.stats:
+            rect |= QRectF(self.hud_rect())
+        if self.center_point and self.target_point:
+            rect |= QRectF(self.target_point.x() - 8, self.target_point.y() - 8, 16, 16)
+            if self.aim_message:
+                rect |= label(self.target_point.x() + 10, self.target_point.y() - 10, self.aim_message)
+            for i, text in enumerate(self.aim_sweep):
+                rect |= label(self.target_point.x() + 10, self.target_point.y() + 20 + 14 * i, text)
+            for angle, power, polygon in self.aim_solutions:
+                end = self.radius_end(angle)
+                rect |= polygon.boundingRect()
+                rect |= QRectF(QPointF(self.center_point), end).normalized()
+                rect |= label(int(end.x()) + 10, int(end.y()) - 10, f"{math.degrees(angle):.1f}° {power:.0f}%")
+        # 留出画笔宽度和抗锯齿的余量
+        return rect.adjusted(-4, -4, 4, 4).toAlignedRect()
+        
+    def refresh(self):
+        # 只重绘上一帧和这一帧动态元素覆盖的区域, 而不是整个画布
+        rect = self.overlay_rect()
+        self.update(rect.united(self._overlay_rect))
+        self._overlay_rect = rect
+        
+    def invalidate_static_layer(self):
+        self._static_layer = None
+        self._overlay_rect = self.overlay_rect()
+        self.update()
+        
+    def set_stats_enabled(self, enabled):
+        from instrumentation import FrameStats
+
+        self.stats = FrameStats() if enabled else None
+        self.update(self.hud_rect())
+        self.refresh()
+        
+    def hud_rect(self):
+        return QRect(10, 10, HUD_WIDTH, self.fontMetrics().height() * HUD_LINES + 12)
+        
+    def draw_hud(self, painter):
+        latency = self.stats.percentiles('input_latency_ms')
+        frame = self.stats.percentiles('frame_ms')
+        lines = [
+            f"输入→绘制: {self.stats.last('input_latency_ms'):6.2f} ms  "
+            f"p95 {latency['p95']:.2f}",
+            f"轨迹计算: {self.stats.last('trajectory_ms'):6.2f} ms  "
+            f"p95 {self.stats.percentiles('trajectory_ms')['p95']:.2f}",
+            f"绘制: {self.stats.last('paint_ms'):6.2f} ms  "
+            f"p95 {self.stats.percentiles('paint_ms')['p95']:.2f}",
+            f"帧时间 p50/p95/p99: {frame['p50']:.1f} / {frame['p95']:.1f} / {frame['p99']:.1f} ms",
+            f"轨迹顶点: {self.stats.last('vertices')}  "
+            f"内存 {self.memory_footprint()['trajectory_total_bytes'] / 1024:.1f} KiB",
+            f"重绘像素: {self.repaint_pixels} ({self.repaint_stats()['last_fraction']:.1%})",
+        ]
+        rect = self.hud_rect()
+        painter.fillRect(rect, QColor(0, 0, 0, 150))
+        painter.setPen(QColor(255, 255, 255))
+        metrics = painter.fontMetrics()
+        for i, line in enumerate(lines):
+            painter.drawText(rect.x() + 8, rect.y() + 6 + metrics.ascent() + metrics.height() * i, line)
+        
+    def memory_footprint(self):
+        # 当前显示的几何数据占用的字节数; 轨迹数组与缓存条目共享内存, 不重复计入缓存
+        polygons = ([self.trajectory_polygon, self.envelope_band] +
+                    [p for _, _, p in self.aim_solutions] + [p for _, _, p in self.fan_arcs] +
+                    [p for _, p, _ in self.pinned_arcs])
+        arrays = self.trajectory_points.nbytes + self.time_points.nbytes
+        polygon_bytes = sum(p.size() for p in polygons) * 16  # QPointF = 2 x double
+        layer = self._static_layer
+        return {
+            'trajectory_vertices': len(self.trajectory_points),
+            'trajectory_array_bytes': arrays,
+            'polygon_bytes': polygon_bytes,
+            'trajectory_total_bytes': arrays + polygon_bytes,
+            'trajectory_cache_bytes': self.trajectory_cache.nbytes,
+            'static_layer_bytes': layer.width() * layer.height() * 4 if layer is not None else 0,
+            'coverage_image_bytes': (self._coverage_image.sizeInBytes()
+                                     if self._coverage_image is not None else 0),
+        }
+        
+    def repaint_stats(self):
+        canvas_pixels = max(self.width() * self.height(), 1)
+        return {
+            'frames': self.repaint_frames,
+            'last_pixels': self.repaint_pixels,
+            'last_fraction': self.repaint_pixels / canvas_pixels,
+            'mean_pixels': self.repaint_pixels_total / self.repaint_frames if self.repaint_frames else 0,
+            'canvas_pixels': canvas_pixels,
+        }
+        
+    def resizeEvent(self, event):
+        if self.recorder:
+            import session
+
+            self.recorder.record(session.RESIZE, event.size().width(), event.size().height())
+        self._static_layer = None
+        self.schedule_coverage()
+        self.schedule_pinned()
+        super().resizeEvent(event)
+        
+    def static_layer(self):
+        # 背景、最大半径圆和中心点只在 center_point / max_radius / 尺寸变化时重画
+        if self._static_layer is not None:
+            return self._static_layer
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
         
         # Draw frosted glass effect background
         painter.fillRect(self.rect(), QColor(255, 255, 255, 40))
         
+        # Draw reachability heat map, one image pixel per coverage cell
+        if self._coverage_image is not None:
+            import reachability
+
+            painter.drawImage(QRectF(0, 0, self._coverage_image.width() * reachability.DEFAULT_CELL,
+                                     self._coverage_image.height() * reachability.DEFAULT_CELL),
+                              self._coverage_image)
+        
         # Draw center point and radius circle if center is set
         if self.center_point:
             # Draw max radius circle first (so it's behind the center point)
@@ -192,6 +1071,24 @@ class TransparentCanvas(QWidget):
             # Draw center point on top
             painter.setPen(QPen(QColor(255, 0, 0, 255), 8))  # Larger red dot
             painter.drawPoint(self.center_point)
+        painter.end()
+        self._static_layer = pixmap
+        return pixmap
+        
+    def paintEvent(self, event):
+        started = time.perf_counter()
+        painter = QPainter(self)
+        self.repaint_pixels = sum(r.width() * r.height() for r in event.region().rects())
+        self.repaint_pixels_total += self.repaint_pixels
+        self.repaint_frames += 1
+        
+        # 只拷贝需要重绘的区域
+        layer = self.static_layer()
+        ratio = layer.devicePixelRatio()
+        rect = QRectF(event.rect())
+        painter.drawPixmap(rect, layer, QRectF(rect.x() * ratio, rect.y() * ratio,
+                                               rect.width() * ratio, rect.height() * ratio))
+        painter.setRenderHint(QPainter.Antialiasing)
         
         # Draw helper lines if we have a center point and either current point or last angle
         if self.center_point and (self.current_point or self.last_angle is not None):
@@ -209,9 +1106,7 @@ class TransparentCanvas(QWidget):
             
             # Draw radius line (red)
             painter.setPen(QPen(QColor(255, 0, 0, 200), 2))
-            end_x = self.center_point.x() + math.cos(angle) * (self.max_radius or 200)
-            end_y = self.center_point.y() - math.sin(angle) * (self.max_radius or 200)
-            painter.drawLine(self.center_point, QPointF(end_x, end_y))
+            painter.drawLine(QPointF(self.center_point), self.radius_end(angle))
             
             # Draw power circle (red, smaller than max radius)
             radius = (self.max_radius or 200) * (power / 100)
@@ -223,27 +1118,134 @@ class TransparentCanvas(QWidget):
                 painter.setPen(QPen(QColor(255, 255, 0, 200), 2))
                 painter.drawLine(self.center_point, self.current_point)
         
+        # Draw wind-uncertainty band and landing spread
+        if not self.envelope_band.isEmpty():
+            painter.setPen(QPen(QColor(255, 0, 0, 90), 1))
+            painter.setBrush(QColor(255, 0, 0, 50))
+            painter.drawPolygon(self.envelope_band, Qt.WindingFill)
+            painter.setBrush(Qt.NoBrush)
+        if self.spread_ellipse:
+            center, rx, ry, degrees = self.spread_ellipse
+            painter.save()
+            painter.translate(center)
+            painter.rotate(degrees)
+            painter.setPen(QPen(QColor(255, 140, 0, 220), 2))
+            painter.drawEllipse(QPointF(0, 0), rx, ry)
+            painter.restore()
+        
+        # Draw hit tolerance: error ellipse, hit radius and the ranges that stay inside it
+        if self.sensitivity:
+            x, y = self.sensitivity.landing.tolist()
+            rx, ry = self.sensitivity.axes.tolist()
+            painter.save()
+            painter.translate(x, y)
+            painter.rotate(math.degrees(self.sensitivity.angle))
+            painter.setPen(QPen(QColor(0, 200, 200, 220), 2))
+            painter.drawEllipse(QPointF(0, 0), rx, ry)
+            painter.restore()
+            painter.setPen(QPen(QColor(0, 200, 200, 180), 1, Qt.DashLine))
+            painter.drawEllipse(QPointF(x, y), self.sensitivity.radius, self.sensitivity.radius)
+            painter.setPen(QPen(QColor(0, 200, 200, 230), 1))
+            for i, text in enumerate(self.sensitivity_labels()):
+                painter.drawText(int(x + self.sensitivity.radius) + 6, int(y) + 16 * i, text)
+        
+        # Draw pinned shooters, skipping arcs outside the repainted area
+        if self.pinned_shooters:
+            clip = QRectF(event.rect())
+            for (point, _, _), (_, polygon, fuse) in zip(self.pinned_shooters, self.pinned_arcs):
+                if not polygon.boundingRect().adjusted(-4, -4, 4, 4).intersects(clip):
+                    continue
+                painter.setPen(QPen(QColor(0, 150, 200, 200), 2))
+                painter.drawPolyline(polygon)
+                painter.setPen(QPen(QColor(0, 150, 200), 4))
+                for x, y in fuse[:6].tolist():
+                    painter.drawPoint(QPointF(x, y))
+            painter.setPen(QPen(QColor(0, 120, 200, 255), 8))
+            for point, _, _ in self.pinned_shooters:
+                painter.drawPoint(point)
+        
+        # Draw fan preview: low power / low angle blue, high power / steep angle green
+        if self.fan_arcs:
+            for k, (_, _, polygon) in enumerate(self.fan_arcs):
+                hue = 220 - 100 * k // max(len(self.fan_arcs) - 1, 1)
+                painter.setPen(QPen(QColor.fromHsv(hue, 200, 220, 150), 1))
+                painter.drawPolyline(polygon)
+        
         # Draw trajectory
-        if self.trajectory_points:
+        if len(self.trajectory_points):
             # Draw trajectory line
             painter.setPen(QPen(QColor(255, 0, 0, 200), 2))
-            for i in range(len(self.trajectory_points) - 1):
-                painter.drawLine(self.trajectory_points[i], self.trajectory_points[i + 1])
+            painter.drawPolyline(self.trajectory_polygon)
+            
+            # Draw grenade bounces
+            painter.setPen(QPen(QColor(255, 140, 0, 230), 2))
+            for x, y in self.bounce_points.tolist():
+                painter.drawEllipse(QPointF(x, y), 3, 3)
+            
+            # Draw terrain impact (grenade: detonation)
+            if self.impact_point:
+                painter.setPen(QPen(QColor(255, 0, 0, 230), 2))
+                radius = 14 if self.grenade else 6
+                painter.drawEllipse(self.impact_point, radius, radius)
             
             # Draw time points with larger dots and labels
             painter.setPen(QPen(QColor(255, 0, 0), 4))
-            for i, point in enumerate(self.time_points[:6]):  # 只绘制前6个时间点
+            for i, (x, y) in enumerate(self.time_points[:6].tolist()):  # 只绘制前6个时间点
                 # Draw larger point
-                painter.drawPoint(point)
+                painter.drawPoint(QPointF(x, y))
                 
                 # Draw time label with actual game time
                 painter.drawText(
-                    int(point.x()) + 10,
-                    int(point.y()) - 10,
+                    int(x) + 10,
+                    int(y) - 10,
                     f"{i+1}s"
                 )
+        
+        # Draw target and inverse-aim solutions (orange: flat shot, purple: high lob)
+        if self.center_point and self.target_point:
+            painter.setPen(QPen(QColor(0, 160, 0, 220), 2))
+            painter.drawLine(self.target_point + QPoint(-8, 0), self.target_point + QPoint(8, 0))
+            painter.drawLine(self.target_point + QPoint(0, -8), self.target_point + QPoint(0, 8))
+            if self.aim_message:
+                painter.drawText(self.target_point.x() + 10, self.target_point.y() - 10, self.aim_message)
+            for i, text in enumerate(self.aim_sweep):
+                painter.drawText(self.target_point.x() + 10, self.target_point.y() + 20 + 14 * i, text)
+            colors = [QColor(255, 140, 0, 220), QColor(170, 0, 200, 220)]
+            for (angle, power, polygon), color in zip(self.aim_solutions, colors):
+                painter.setPen(QPen(color, 2))
+                painter.drawPolyline(polygon)
+                end = self.radius_end(angle)
+                painter.drawLine(QPointF(self.center_point), end)
+                painter.drawText(int(end.x()) + 10, int(end.y()) - 10,
+                                 f"{math.degrees(angle):.1f}° {power:.0f}%")
+        
+        # Draw recorded calibration landings
+        if self.calibration_mode:
+            painter.setPen(QPen(QColor(0, 200, 0, 230), 2))
+            for obs in self.observations:
+                painter.drawLine(QPointF(obs.tx - 5, obs.ty - 5), QPointF(obs.tx + 5, obs.ty + 5))
+                painter.drawLine(QPointF(obs.tx - 5, obs.ty + 5), QPointF(obs.tx + 5, obs.ty - 5))
+            if self.pending_shot:
+                x0, y0 = self.pending_shot[:2]
+                painter.drawText(x0 + 10, y0 + 20, "点击实际落点")
+        
+        if self.stats:
+            self.draw_hud(painter)
+            painter.end()
+            self.stats.paint_done(started)
+        if self.repaint_frames == 1:
+            self.first_frame.emit()
     
     def set_parameters(self, max_radius, gravity, max_velocity, ticks_per_second, wind_power, wind_accel):
+        if self.recorder:
+            import session
+
+            self.recorder.record(session.PARAMS, max_radius, gravity, max_velocity,
+                                 ticks_per_second, wind_power, wind_accel)
+        radius_changed = max_radius != self.max_radius
+        physics_changed = ((gravity, max_velocity, wind_power, wind_accel) !=
+                           (self.gravity, self.max_velocity, self.wind_power, self.wind_accel))
+        ticks_changed = ticks_per_second != self.ticks_per_second
         self.max_radius = max_radius
         self.gravity = gravity
         self.max_velocity = max_velocity
@@ -251,17 +1253,51 @@ class TransparentCanvas(QWidget):
         self.wind_power = wind_power
         self.wind_accel = wind_accel
         if self.center_point and self.current_point:
-            self.calculate_trajectory()
+            self._trajectory_dirty = True
+        if self.target_point:
+            self._aim_dirty = True
+        if self._trajectory_dirty or self._aim_dirty:
+            if self.stats:
+                self.stats.mark_input()
+            self.scheduler.request()
+        if radius_changed:
+            self.invalidate_static_layer()
+        if physics_changed:
+            self.schedule_coverage()
+        if physics_changed or ticks_changed:
+            # 固定发射者的引线标记 (tick 引擎下整条轨迹) 也取决于 ticks_per_second
+            self.schedule_pinned()
+        self.schedule_firing_table()
 
 class AimerTool(QMainWindow):
-    def __init__(self):
+    def __init__(self, restore_settings=True):
         super().__init__()
+        self.restore_settings = restore_settings  # Off for deterministic replays
+        self.deferred_styles = []  # (widget, style sheet) applied after the first frame
         self.oldPos = None
+        self.drag_start_pos = None
+        self.pending_geometry = None  # Window geometry applied on the next frame
+        self.geometry_scheduler = FrameScheduler(self.apply_pending_geometry, self)
         self.resize_edge = None
         self.resize_start_pos = None
         self.resize_start_geometry = None
         self.resize_edge_width = 8
         self.initUI()
+        self.canvas.first_frame.connect(self.apply_deferred_styles, Qt.QueuedConnection)
+        
+    def defer_style(self, widget, sheet):
+        # 按钮样式表解析较慢, 首帧之后统一应用; 之后才创建的控件直接应用
+        if self.deferred_styles is None:
+            widget.setStyleSheet(sheet)
+            return
+        self.deferred_styles.append((widget, sheet))
+        
+    def apply_deferred_styles(self):
+        styles, self.deferred_styles = self.deferred_styles or [], None
+        self.controls_widget.setUpdatesEnabled(False)
+        for widget, sheet in styles:
+            widget.setStyleSheet(sheet)
+        self.controls_widget.setUpdatesEnabled(True)
         
     def initUI(self):
         # Set window flags for resizable frameless window
@@ -354,7 +1390,7 @@ class AimerTool(QMainWindow):
                 color: black;
                 font-weight: bold;
             }
-            QSpinBox, QSlider {
+            QSpinBox, QSlider, QComboBox {
                 background-color: rgba(255, 255, 255, 220);
                 border: 1px solid gray;
                 border-radius: 4px;
@@ -417,6 +1453,15 @@ class AimerTool(QMainWindow):
         self.tick_spin.setDecimals(2)
         self.tick_spin.setSingleStep(0.01)
         
+        # Physics engine: continuous kinematics or per-tick fixed point like the game
+        engine_label = QLabel('物理模型:')
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem('连续 (解析)', 'continuous')
+        self.engine_combo.addItem(f'逐帧定点 ({ballistics.TICKS_PER_FUSE_SECOND} 帧/秒)', 'tick')
+        self.engine_combo.currentIndexChanged.connect(
+            lambda index: (self.canvas.set_engine(self.engine_combo.itemData(index)),
+                           self.update_service_defaults()))
+        
         # Add all controls to layout
         controls_layout.addWidget(gravity_label)
         controls_layout.addWidget(self.gravity_spin)
@@ -426,6 +1471,8 @@ class AimerTool(QMainWindow):
         controls_layout.addWidget(self.radius_spin)
         controls_layout.addWidget(tick_label)
         controls_layout.addWidget(self.tick_spin)
+        controls_layout.addWidget(engine_label)
+        controls_layout.addWidget(self.engine_combo)
         controls_layout.addWidget(wind_label)
         controls_layout.addWidget(self.wind_slider)
         controls_layout.addWidget(wind_accel_label)
@@ -433,9 +1480,298 @@ class AimerTool(QMainWindow):
         controls_layout.addWidget(self.wind_value_label)
         controls_layout.addStretch()
         
+        # Add inverse-aim toggle: left click picks a target instead of dragging
+        aim_button = QPushButton('目标瞄准')
+        aim_button.setCheckable(True)
+        self.defer_style(aim_button, """
+            QPushButton {
+                background-color: #27ae60;
+                color: white;
+                border: none;
+                padding: 8px;
+                border-radius: 4px;
+                font-weight: bold;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #229954;
+            }
+            QPushButton:checked {
+                background-color: #1e8449;
+            }
+        """)
+        aim_button.toggled.connect(self.canvas.set_aim_mode)
+        controls_layout.addWidget(aim_button)
+        self.aim_button = aim_button
+        
+        # Add terrain mask loader: arcs stop at the first solid pixel
+        terrain_button = QPushButton('加载地形')
+        self.defer_style(terrain_button, """
+            QPushButton {
+                background-color: #8e6e53;
+                color: white;
+                border: none;
+                padding: 8px;
+                border-radius: 4px;
+                font-weight: bold;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #7a5c43;
+            }
+        """)
+        terrain_button.clicked.connect(self.toggle_terrain)
+        controls_layout.addWidget(terrain_button)
+        self.terrain_button = terrain_button
+
+        # Add grenade mode: bounce off terrain, detonate when the fuse runs out
+        grenade_button = QPushButton('手雷模式')
+        grenade_button.setCheckable(True)
+        grenade_button.setToolTip('在地形 (没有地形时为画布底边) 上反弹, 引线烧完时爆炸; 总是按连续 (解析) 模型计算')
+        self.defer_style(grenade_button, """
+            QPushButton {
+                background-color: #7f8c8d;
+                color: white;
+                border: none;
+                padding: 6px;
+                border-radius: 4px;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #6c7a7b;
+            }
+            QPushButton:checked {
+                background-color: #27ae60;
+            }
+        """)
+        grenade_button.toggled.connect(self.update_grenade)
+        controls_layout.addWidget(grenade_button)
+        self.grenade_panel = QVBoxLayout()  # Fuse/restitution inputs, built when grenade mode is first enabled
+        controls_layout.addLayout(self.grenade_panel)
+        self.grenade_button = grenade_button
+
+        # Add reachability heat map toggle (shortcut H)
+        coverage_button = QPushButton('覆盖热图 (H)')
+        coverage_button.setCheckable(True)
+        coverage_button.setShortcut('H')
+        self.defer_style(coverage_button, """
+            QPushButton {
+                background-color: #d35400;
+                color: white;
+                border: none;
+                padding: 8px;
+                border-radius: 4px;
+                font-weight: bold;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #ba4a00;
+            }
+            QPushButton:checked {
+                background-color: #873600;
+            }
+        """)
+        coverage_button.toggled.connect(self.canvas.set_coverage_enabled)
+        controls_layout.addWidget(coverage_button)
+        self.coverage_button = coverage_button
+
+        # Add firing table toggle: inverse aim from a memory-mapped precomputed table
+        table_button = QPushButton('射表')
+        table_button.setCheckable(True)
+        self.defer_style(table_button, """
+            QPushButton {
+                background-color: #7f8c8d;
+                color: white;
+                border: none;
+                padding: 6px;
+                border-radius: 4px;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #6c7a7b;
+            }
+            QPushButton:checked {
+                background-color: #2c3e50;
+            }
+        """)
+        table_button.toggled.connect(self.canvas.set_firing_table_enabled)
+        self.canvas.firing_table_changed.connect(
+            lambda status: table_button.setText(f'射表: {status}' if status else '射表'))
+        controls_layout.addWidget(table_button)
+        self.table_button = table_button
+
+        # Add wind-uncertainty envelope toggle
+        uncertainty_button = QPushButton('风力误差')
+        uncertainty_button.setCheckable(True)
+        self.defer_style(uncertainty_button, """
+            QPushButton {
+                background-color: #c0392b;
+                color: white;
+                border: none;
+                padding: 8px;
+                border-radius: 4px;
+                font-weight: bold;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #a93226;
+            }
+            QPushButton:checked {
+                background-color: #78281f;
+            }
+        """)
+        uncertainty_button.toggled.connect(self.canvas.set_uncertainty_enabled)
+        controls_layout.addWidget(uncertainty_button)
+        self.uncertainty_button = uncertainty_button
+
+        # Add hit tolerance: error ellipse and the angle/power ranges that still land within the radius
+        hit_button = QPushButton('命中容差')
+        hit_button.setCheckable(True)
+        self.defer_style(hit_button, """
+            QPushButton {
+                background-color: #7f8c8d;
+                color: white;
+                border: none;
+                padding: 6px;
+                border-radius: 4px;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #6c7a7b;
+            }
+            QPushButton:checked {
+                background-color: #16a085;
+            }
+        """)
+        hit_button.toggled.connect(self.update_hit_radius)
+        controls_layout.addWidget(hit_button)
+        self.hit_panel = QVBoxLayout()  # Hit radius input, built when the mode is first enabled
+        controls_layout.addLayout(self.hit_panel)
+        self.hit_button = hit_button
+
+        # Add fan preview: whole family of arcs for the dragged angle (or power)
+        fan_label = QLabel('扇形预览:')
+        self.fan_combo = QComboBox()
+        self.fan_combo.addItem('关闭', None)
+        self.fan_combo.addItem('同角度, 力度每 10%', 'power')
+        self.fan_combo.addItem('同力度, 仰角每 10°', 'angle')
+        self.fan_combo.currentIndexChanged.connect(
+            lambda index: self.canvas.set_fan_mode(self.fan_combo.itemData(index)))
+        controls_layout.addWidget(fan_label)
+        controls_layout.addWidget(self.fan_combo)
+
+        # Add pinned shooters: Shift+right-click pins the current shooter, again on it unpins
+        clear_pinned_button = QPushButton('清除固定射手')
+        clear_pinned_button.setToolTip('Shift+右键: 固定当前射手及其最后一次发射; 在固定的射手上 Shift+右键取消')
+        self.defer_style(clear_pinned_button, """
+            QPushButton {
+                background-color: #7f8c8d;
+                color: white;
+                border: none;
+                padding: 6px;
+                border-radius: 4px;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #6c7a7b;
+            }
+        """)
+        clear_pinned_button.clicked.connect(self.canvas.clear_pinned)
+        controls_layout.addWidget(clear_pinned_button)
+
+        # Add calibration from recorded shots: drag a shot, then click where it really landed
+        calibration_button = QPushButton('校准模式')
+        calibration_button.setCheckable(True)
+        self.defer_style(calibration_button, CALIBRATION_BUTTON_STYLE)
+        calibration_button.toggled.connect(self.toggle_calibration)
+        controls_layout.addWidget(calibration_button)
+        self.calibration_panel = QVBoxLayout()  # Fuse seconds, fit and clear, built when first enabled
+        controls_layout.addLayout(self.calibration_panel)
+        self.calibration_button = calibration_button
+
+        # Add performance HUD toggle and sample export
+        stats_layout = QHBoxLayout()
+        stats_button = QPushButton('性能统计')
+        stats_button.setCheckable(True)
+        export_stats_button = QPushButton('导出统计')
+        export_stats_button.setEnabled(False)
+        for button in (stats_button, export_stats_button):
+            self.defer_style(button, """
+                QPushButton {
+                    background-color: #7f8c8d;
+                    color: white;
+                    border: none;
+                    padding: 6px;
+                    border-radius: 4px;
+                    margin-bottom: 4px;
+                }
+                QPushButton:hover {
+                    background-color: #6c7a7b;
+                }
+                QPushButton:checked {
+                    background-color: #4d5656;
+                }
+                QPushButton:disabled {
+                    background-color: #bdc3c7;
+                }
+            """)
+            stats_layout.addWidget(button)
+        stats_button.toggled.connect(self.canvas.set_stats_enabled)
+        stats_button.toggled.connect(export_stats_button.setEnabled)
+        export_stats_button.clicked.connect(self.export_stats)
+        controls_layout.addLayout(stats_layout)
+
+        # Add session recording: every input and parameter change goes to a binary log
+        record_button = QPushButton('录制会话')
+        record_button.setCheckable(True)
+        self.defer_style(record_button, """
+            QPushButton {
+                background-color: #7f8c8d;
+                color: white;
+                border: none;
+                padding: 6px;
+                border-radius: 4px;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #6c7a7b;
+            }
+            QPushButton:checked {
+                background-color: #c0392b;
+            }
+        """)
+        record_button.toggled.connect(self.toggle_recording)
+        controls_layout.addWidget(record_button)
+        self.record_button = record_button
+
+        # Add local solver service: scripts query trajectories / aim over localhost
+        service_button = QPushButton('本地服务')
+        service_button.setCheckable(True)
+        self.defer_style(service_button, """
+            QPushButton {
+                background-color: #7f8c8d;
+                color: white;
+                border: none;
+                padding: 6px;
+                border-radius: 4px;
+                margin-bottom: 4px;
+            }
+            QPushButton:hover {
+                background-color: #6c7a7b;
+            }
+            QPushButton:checked {
+                background-color: #16a085;
+            }
+        """)
+        service_button.toggled.connect(self.toggle_service)
+        controls_layout.addWidget(service_button)
+        self.service_button = service_button
+        self.service_thread = None
+        self.stats_button = stats_button
+        
         # Add toggle canvas button
         toggle_canvas_button = QPushButton('收起 Canvas')
-        toggle_canvas_button.setStyleSheet("""
+        self.defer_style(toggle_canvas_button, """
             QPushButton {
                 background-color: #4a90e2;
                 color: white;
@@ -457,7 +1793,7 @@ class AimerTool(QMainWindow):
         
         # Add exit button
         exit_button = QPushButton('退出')
-        exit_button.setStyleSheet("""
+        self.defer_style(exit_button, """
             QPushButton {
                 background-color: #e74c3c;
                 color: white;
@@ -503,6 +1839,11 @@ class AimerTool(QMainWindow):
         y = (screen.height() - window_height) // 2
         self.setGeometry(x, y, window_width, window_height)
         
+        # Restore the last session's window and physics before signals are connected,
+        # so the canvas is set up once below
+        if self.restore_settings:
+            self.load_settings()
+        
         # Connect signals
         self.gravity_spin.valueChanged.connect(self.update_parameters)
         self.velocity_spin.valueChanged.connect(self.update_parameters)
@@ -519,6 +1860,7 @@ class AimerTool(QMainWindow):
             # 检查是否点击在控制区域
             if self.controls_widget.geometry().contains(event.pos()):
                 self.oldPos = event.globalPos()
+                self.drag_start_pos = self.pos()
             else:
                 # 如果不在控制区域，检查是否是调整大小
                 edge = self.check_resize_edge(event.pos())
@@ -531,7 +1873,7 @@ class AimerTool(QMainWindow):
         if self.resize_start_pos is not None and self.canvas.isVisible():
             # 处理窗口调整大小
             delta = event.globalPos() - self.resize_start_pos
-            new_geometry = self.resize_start_geometry
+            new_geometry = QRect(self.resize_start_geometry)
             min_width = self.minimumWidth()
             min_height = self.minimumHeight()
             
@@ -542,13 +1884,14 @@ class AimerTool(QMainWindow):
                 new_height = max(min_height, self.resize_start_geometry.height() + delta.y())
                 new_geometry.setHeight(new_height)
             
-            self.setGeometry(new_geometry)
+            self.pending_geometry = new_geometry
+            self.geometry_scheduler.request()
         
         elif self.oldPos:
             # 处理窗口拖动
             delta = event.globalPos() - self.oldPos
-            self.move(self.pos() + delta)
-            self.oldPos = event.globalPos()
+            self.pending_geometry = QRect(self.drag_start_pos + delta, self.size())
+            self.geometry_scheduler.request()
         
         else:
             # 更新鼠标光标形状
@@ -566,11 +1909,23 @@ class AimerTool(QMainWindow):
                     self.setCursor(Qt.ArrowCursor)
             
     def mouseReleaseEvent(self, event):
+        self.geometry_scheduler.flush()
         self.oldPos = None
+        self.drag_start_pos = None
         self.resize_start_pos = None
         self.resize_edge = None
         self.resize_start_geometry = None
         
+    def apply_pending_geometry(self):
+        # 每帧最多调整一次窗口位置/大小
+        if self.pending_geometry is None:
+            return
+        geometry, self.pending_geometry = self.pending_geometry, None
+        if self.resize_start_pos is not None:
+            self.setGeometry(geometry)
+        else:
+            self.move(geometry.topLeft())
+        
     def check_resize_edge(self, pos):
         # 如果canvas已经隐藏，不允许调整大小
         if not self.canvas.isVisible():
@@ -625,6 +1980,224 @@ class AimerTool(QMainWindow):
                 self.setMaximumSize(16777215, 16777215)  # QWIDGETSIZE_MAX
                 self.resize(default_width, default_height)
         
+    def load_settings(self):
+        settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
+        geometry = settings.value('geometry')
+        if geometry is not None:
+            self.restoreGeometry(geometry)
+        for key, widget in self.settings_widgets().items():
+            value = settings.value(key)
+            if value is not None:
+                widget.setValue(type(widget.value())(value))
+        index = self.engine_combo.findData(settings.value('engine'))
+        if index >= 0:
+            self.engine_combo.setCurrentIndex(index)
+        
+    def save_settings(self):
+        settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
+        if self.canvas.isVisible():  # 收起状态的窄窗口不保存
+            settings.setValue('geometry', self.saveGeometry())
+        for key, widget in self.settings_widgets().items():
+            settings.setValue(key, widget.value())
+        settings.setValue('engine', self.canvas.engine)
+        
+    def settings_widgets(self):
+        # 风力 (wind_slider) 每回合都变, 不保存
+        return {
+            'gravity': self.gravity_spin,
+            'max_velocity': self.velocity_spin,
+            'max_radius': self.radius_spin,
+            'ticks_per_second': self.tick_spin,
+            'wind_accel': self.wind_accel_spin,
+        }
+        
+    def closeEvent(self, event):
+        if self.restore_settings:
+            self.save_settings()
+        self.canvas.stop_coverage()
+        self.canvas.stop_recording()
+        if self.service_thread:
+            self.service_thread.stop()
+            self.service_thread = None
+        super().closeEvent(event)
+        
+    def toggle_terrain(self):
+        if self.canvas.terrain is not None:
+            self.canvas.set_terrain(None)
+            self.terrain_button.setText('加载地形')
+            return
+        path, _ = QFileDialog.getOpenFileName(self, '加载地形', '', 'Images (*.png *.bmp)')
+        if not path:
+            return
+        terrain = load_terrain(path)
+        if terrain is None:
+            return
+        self.canvas.set_terrain(terrain)
+        self.terrain_button.setText('清除地形')
+        
+    def update_grenade(self):
+        enabled = self.grenade_button.isChecked()
+        if enabled and not self.grenade_panel.count():
+            self.build_grenade_panel()
+        set_layout_visible(self.grenade_panel, enabled)
+        if enabled:
+            self.canvas.set_grenade(self.fuse_spin.value(), self.restitution_spin.value())
+        else:
+            self.canvas.set_grenade(None, None)
+        
+    def build_grenade_panel(self):
+        import bounce
+
+        fuse_label = QLabel('引线 (秒) / 弹性:')
+        self.fuse_spin = QSpinBox()
+        self.fuse_spin.setRange(1, 5)
+        self.fuse_spin.setValue(bounce.DEFAULT_FUSE)
+        self.restitution_spin = QDoubleSpinBox()
+        self.restitution_spin.setRange(0, 1)
+        self.restitution_spin.setSingleStep(0.05)
+        self.restitution_spin.setValue(bounce.DEFAULT_RESTITUTION)
+        grenade_layout = QHBoxLayout()
+        grenade_layout.addWidget(self.fuse_spin)
+        grenade_layout.addWidget(self.restitution_spin)
+        self.fuse_spin.valueChanged.connect(self.update_grenade)
+        self.restitution_spin.valueChanged.connect(self.update_grenade)
+        self.grenade_panel.addWidget(fuse_label)
+        self.grenade_panel.addLayout(grenade_layout)
+        
+    def update_hit_radius(self):
+        enabled = self.hit_button.isChecked()
+        if enabled and not self.hit_panel.count():
+            self.build_hit_panel()
+        set_layout_visible(self.hit_panel, enabled)
+        if enabled:
+            self.canvas.set_hit_radius(self.hit_radius_spin.value())
+        else:
+            self.canvas.set_hit_radius(None)
+        
+    def build_hit_panel(self):
+        import sensitivity
+
+        hit_radius_label = QLabel('命中半径 (px):')
+        self.hit_radius_spin = QSpinBox()
+        self.hit_radius_spin.setRange(1, 500)
+        self.hit_radius_spin.setValue(sensitivity.DEFAULT_HIT_RADIUS)
+        self.hit_radius_spin.valueChanged.connect(self.update_hit_radius)
+        self.hit_panel.addWidget(hit_radius_label)
+        self.hit_panel.addWidget(self.hit_radius_spin)
+        
+    def toggle_calibration(self, enabled):
+        if enabled and not self.calibration_panel.count():
+            self.build_calibration_panel()
+        set_layout_visible(self.calibration_panel, enabled)
+        self.canvas.set_calibration_mode(enabled)
+        
+    def build_calibration_panel(self):
+        calibration_seconds_label = QLabel('落地引线秒数 (0=未知):')
+        self.calibration_seconds_spin = QDoubleSpinBox()
+        self.calibration_seconds_spin.setRange(0, 60)
+        self.calibration_seconds_spin.setDecimals(2)
+        self.calibration_seconds_spin.setSingleStep(0.1)
+        calibration_layout = QHBoxLayout()
+        self.fit_button = QPushButton('拟合常数')
+        clear_observations_button = QPushButton('清空记录')
+        for button in (self.fit_button, clear_observations_button):
+            self.defer_style(button, CALIBRATION_BUTTON_STYLE)
+        self.calibration_label = QLabel()
+        self.calibration_seconds_spin.valueChanged.connect(self.update_flight_seconds)
+        self.fit_button.clicked.connect(self.fit_calibration)
+        clear_observations_button.clicked.connect(self.canvas.clear_observations)
+        self.canvas.observations_changed.connect(self.update_calibration_label)
+        self.update_calibration_label(len(self.canvas.observations))
+        calibration_layout.addWidget(self.fit_button)
+        calibration_layout.addWidget(clear_observations_button)
+        self.calibration_panel.addWidget(calibration_seconds_label)
+        self.calibration_panel.addWidget(self.calibration_seconds_spin)
+        self.calibration_panel.addLayout(calibration_layout)
+        self.calibration_panel.addWidget(self.calibration_label)
+        
+    def update_flight_seconds(self, value):
+        self.canvas.flight_seconds = value if value > 0 else float('nan')
+        
+    def update_calibration_label(self, count):
+        import calibration
+
+        self.calibration_label.setText(f'已记录 {count} 发')
+        self.fit_button.setEnabled(count >= calibration.MIN_SHOTS)
+        
+    def fit_calibration(self):
+        # 以当前常数为初值拟合, 结果写回输入框 (100%力度速度保持不变, 作为拟合的单位)
+        import calibration
+
+        result = calibration.fit(self.canvas.observations, self.gravity_spin.value(),
+                                 self.velocity_spin.value(), self.wind_accel_spin.value(),
+                                 self.tick_spin.value())
+        self.gravity_spin.setValue(result.gravity)
+        self.wind_accel_spin.setValue(result.wind_accel)
+        self.tick_spin.setValue(result.ticks_per_second)
+        self.calibration_label.setText(
+            f'已记录 {len(self.canvas.observations)} 发, 落点误差 RMS {result.rms:.1f} px')
+        
+    def toggle_recording(self, enabled):
+        if not enabled:
+            self.canvas.stop_recording()
+            self.record_button.setText('录制会话')
+            return
+        path, _ = QFileDialog.getSaveFileName(self, '录制会话', 'session.aimlog', 'Session log (*.aimlog)')
+        if not path:
+            self.record_button.setChecked(False)
+            return
+        self.canvas.start_recording(path)
+        self.record_button.setText('停止录制')
+        
+    def toggle_service(self, enabled):
+        if not enabled:
+            if self.service_thread:
+                self.service_thread.stop()
+                self.service_thread = None
+            self.service_button.setText('本地服务')
+            return
+        import service  # asyncio 只在开启服务时导入
+
+        thread = service.ServiceThread(service.SolverService(self.service_defaults()))
+        try:
+            thread.start()
+        except OSError as e:
+            # 端口被占用等: 恢复按钮状态, 原因放在提示里
+            self.service_button.setChecked(False)
+            self.service_button.setToolTip(f'无法监听 {thread.address}: {e}')
+            return
+        self.service_thread = thread
+        self.service_button.setText(f'服务: {thread.address}')
+        self.service_button.setToolTip('')
+
+    def service_defaults(self):
+        # 服务请求中未给出的参数取当前界面上的值
+        canvas = self.canvas
+        return {
+            'gravity': canvas.gravity,
+            'max_velocity': canvas.max_velocity,
+            'wind_power': canvas.wind_power,
+            'wind_accel': canvas.wind_accel,
+            'ticks_per_second': canvas.ticks_per_second,
+            'width': canvas.width(),
+            'height': canvas.height(),
+            'engine': canvas.engine,
+        }
+
+    def update_service_defaults(self):
+        if self.service_thread:
+            import service
+
+            # 整体替换字典, 服务线程下一批使用新值
+            self.service_thread.service.defaults = {**service.cli.DEFAULTS, **self.service_defaults()}
+
+    def export_stats(self):
+        if not self.canvas.stats:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, '导出统计', 'aimer_stats.json', 'JSON (*.json)')
+        if path:
+            self.canvas.stats.dump(path)
+        
     def update_wind_label(self):
         value = self.wind_slider.value()
         direction = "←" if value < 0 else "→" if value > 0 else "-"
@@ -640,10 +2213,27 @@ class AimerTool(QMainWindow):
             wind_power=self.wind_slider.value(),
             wind_accel=self.wind_accel_spin.value()
         )
+        self.update_service_defaults()
 
 def main():
+    launched = time.time()
+    started = time.perf_counter()
+    import multiprocessing
+
+    multiprocessing.freeze_support()  # 打包成 exe 后进程池的子进程需要
     app = QApplication(sys.argv)
-    tool = AimerTool()
+    probe = os.environ.get(STARTUP_PROBE)
+    tool = AimerTool(restore_settings=not probe)
+    constructed = time.perf_counter()
+    if probe:
+        # benchmark.py: 打印启动各阶段时间 (秒, 相对 main 入口), 首帧画完后退出
+        def first_frame():
+            print(json.dumps({'construct': constructed - started,
+                              'first_frame': time.perf_counter() - started,
+                              'main_entry': launched - float(probe)}), flush=True)
+            app.quit()
+
+        tool.canvas.first_frame.connect(first_frame, Qt.QueuedConnection)
     tool.show()
     sys.exit(app.exec_())
 
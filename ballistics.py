@@ -0,0 +1,609 @@
+"""Qt-free ballistics core for the aimer.
+
+All functions take plain floats or NumPy arrays (broadcast against each
+other) in canvas pixel coordinates, with the screen y axis pointing down.
+Angles are radians measured counter-clockwise from +x, power is 0-100.
+"""
+import math
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+TRAJECTORY_DT = 0.02  # 更小的时间步长以获得更平滑的轨迹
+MAX_TRAJECTORY_SAMPLES = 1 << 22
+FUSE_SECONDS = 6
+ADAPTIVE_GRID = 257  # 自适应采样时估算弧长密度所用的网格点数
+DEFAULT_CANVAS_SIZE = 1000
+TICKS_PER_FUSE_SECOND = 50  # 游戏每秒(引线1秒)推进的帧数
+FIXED_SHIFT = 16  # 游戏内部的 16.16 定点数
+ENGINES = ('continuous', 'tick')
+FAN_POWERS = tuple(range(10, 101, 10))  # 扇形预览: 固定角度时的力度档位 (%)
+FAN_ANGLES = tuple(range(0, 91, 10))  # 扇形预览: 固定力度时的仰角档位 (度)
+FAN_MODES = ('power', 'angle')
+MAX_AIM_STEP = 0.05  # refine_aim 每步最多修正的角度 (弧度)
+
+_time_grid = np.zeros(1)
+
+
+def sample_times(n):
+    # 按顺序累加 dt 得到的时间序列, 与逐步 t += dt 的浮点结果完全一致
+    global _time_grid
+    if len(_time_grid) < n:
+        steps = np.full(max(n, 2 * len(_time_grid)), TRAJECTORY_DT)
+        steps[0] = 0.0
+        _time_grid = np.cumsum(steps)
+    return _time_grid[:n]
+
+
+def shot_angle(dx, dy):
+    """Launch angle for a drag vector (dx, dy) in screen coordinates."""
+    if np.ndim(dx) == 0 and np.ndim(dy) == 0:
+        return math.atan2(-dy, dx)
+    return np.arctan2(-np.asarray(dy, dtype=float), dx)
+
+
+def shot_power(dx, dy, max_radius):
+    """Power percentage (0-100) for a drag vector, 100 when max_radius is unset."""
+    if np.ndim(dx) == 0 and np.ndim(dy) == 0:
+        if max_radius is None:
+            return 100
+        distance = math.sqrt(dx * dx + dy * dy)
+        return 100 if distance > max_radius else (distance / max_radius) * 100
+    if max_radius is None:
+        return np.full(np.broadcast(dx, dy).shape, 100.0)
+    return np.minimum(100.0, np.hypot(dx, dy) / max_radius * 100)
+
+
+def launch_velocity(angle, power, max_velocity):
+    """Initial velocity components (v0x, v0y) with v0y pointing up."""
+    v0 = max_velocity * (np.asarray(power, dtype=float) / 100)
+    return v0 * np.cos(angle), v0 * np.sin(angle)
+
+
+def _first_positive_root(a, b, c):
+    # a*t^2 + b*t + c = 0 的最小正根, 无解为 inf (数值稳定的求根公式, a 可为 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = b * b - 4 * a * c
+        sq = np.sqrt(np.where(disc >= 0, disc, np.nan))
+        q = -0.5 * (b + np.where(b >= 0, sq, -sq))
+        roots = np.stack(np.broadcast_arrays(q / a, c / q))
+    roots = np.where((roots > 0) & np.isfinite(roots), roots, np.inf)
+    return roots.min(axis=0)
+
+
+def exit_times(x0, y0, v0x, v0y, wind_ax, gravity, width, height):
+    """Analytic time at which a shot leaves the canvas.
+
+    The horizontal motion leaves through the left or right edge, the
+    vertical motion only counts once the projectile is falling below the
+    bottom edge. Returns ``inf`` where neither ever happens.
+    """
+    x0, y0, v0x, v0y, wind_ax, gravity, width, height = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (x0, y0, v0x, v0y, wind_ax, gravity, width, height)))
+    t_x = np.minimum(_first_positive_root(0.5 * wind_ax, v0x, x0),
+                     _first_positive_root(0.5 * wind_ax, v0x, x0 - width))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_apex = np.maximum(v0y / gravity, 0.0)
+        disc = v0y * v0y - 2 * gravity * (y0 - height)
+        t_fall = (v0y + np.sqrt(np.maximum(disc, 0.0))) / gravity
+        t_y = np.where(disc >= 0, np.maximum(t_fall, t_apex), t_apex)
+        t_linear = np.where(v0y < 0, np.maximum((height - y0) / -v0y, 0.0), np.inf)
+    t_y = np.where(gravity > 0, t_y, t_linear)
+    return np.minimum(t_x, np.nan_to_num(t_y, nan=np.inf))
+
+
+class TrajectoryBatch(NamedTuple):
+    """Sampled trajectories for a batch of shots.
+
+    ``points`` is a contiguous (total, 2) float64 array holding every
+    shot's samples back to back; shot ``i`` occupies
+    ``points[offsets[i]:offsets[i + 1]]``. ``fuse_points`` is
+    (shots, FUSE_SECONDS, 2) and only the first ``fuse_counts[i]`` markers
+    of each shot are valid.
+    """
+    points: np.ndarray
+    offsets: np.ndarray
+    fuse_points: np.ndarray
+    fuse_counts: np.ndarray
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def trajectory(self, i):
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def fuse(self, i):
+        return self.fuse_points[i, :self.fuse_counts[i]]
+
+
+def _fixed_samples(x0, y0, v0x, v0y, wind_ax, gravity, width, height):
+    # 固定步长 TRAJECTORY_DT 采样, 返回 (points, offsets, going_down)
+    shots = len(x0)
+    t_exit = exit_times(x0, y0, v0x, v0y, wind_ax, gravity, width, height)
+    with np.errstate(invalid='ignore'):
+        n = np.where(np.isfinite(t_exit), t_exit / TRAJECTORY_DT + 4, 1024)
+    n = np.minimum(n, MAX_TRAJECTORY_SAMPLES).astype(np.int64)
+
+    # 每发炮弹的停止下标; 采样长度不够的重新加倍采样
+    counts = np.zeros(shots, dtype=np.int64)
+    going_down = np.zeros(shots, dtype=bool)
+    chunks = []
+    pending = np.arange(shots)
+    while len(pending):
+        lengths = n[pending]
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        shot = np.repeat(np.arange(len(pending)), lengths)
+        local = np.arange(lengths.sum()) - starts[shot]
+        t = sample_times(int(lengths.max()))[local]
+        src = pending[shot]
+        x = x0[src] + v0x[src] * t + 0.5 * wind_ax[src] * t * t
+        y = y0[src] - (v0y[src] * t - 0.5 * gravity[src] * t * t)
+        down = (v0y[src] - gravity[src] * t) < 0
+        out_x = (x < 0) | (x > width[src])
+        stop = out_x | (down & (y > height[src]))
+
+        last = np.full(len(pending), -1, dtype=np.int64)
+        hit_pos = np.flatnonzero(stop)
+        hit_shot, first = np.unique(shot[hit_pos], return_index=True)
+        last[hit_shot] = hit_pos[first]
+        capped = (last < 0) & (lengths >= MAX_TRAJECTORY_SAMPLES)
+        last[capped] = starts[capped] + lengths[capped] - 1
+        done = last >= 0
+        # 越过左右边界的点不保留, 下落越过底边的点保留
+        counts[pending[done]] = local[last[done]] + ~out_x[last[done]]
+        going_down[pending[done]] = down[last[done]]
+        keep = done[shot] & (local < counts[src])
+        chunks.append((src[keep], x[keep], y[keep]))
+
+        pending = pending[~done]
+        n[pending] = np.minimum(n[pending] * 2, MAX_TRAJECTORY_SAMPLES)
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    points = np.empty((offsets[-1], 2))
+    if len(chunks) == 1:
+        points[:, 0], points[:, 1] = chunks[0][1], chunks[0][2]
+    else:
+        shot, x, y = (np.concatenate(c) for c in zip(*chunks))
+        order = np.argsort(shot, kind='stable')
+        points[:, 0], points[:, 1] = x[order], y[order]
+    return points, offsets, going_down
+
+
+def _adaptive_samples(x0, y0, v0x, v0y, wind_ax, gravity, width, height, tolerance, max_points):
+    # 按误差上限自适应采样, 返回 (points, offsets, going_down)
+    #
+    # 抛物线上弦 [t, t+h] 偏离曲线的最大距离为 |A_perp| h^2 / 8, 而加速度垂直于
+    # 速度的分量 A_perp = |A x V0| / |v(t)|, 所以允许的步长 h ~ sqrt(8 tol |v| / |A x V0|):
+    # 速度慢、弯曲大的顶点附近采样密, 直线段采样稀. 在按该密度拉伸的时间轴 s 上等距
+    # 取点, 并保证速度最小(曲率最大)的时刻本身是一个顶点.
+    t_end = exit_times(x0, y0, v0x, v0y, wind_ax, gravity, width, height)
+    t_end = np.where(np.isfinite(t_end), t_end, MAX_TRAJECTORY_SAMPLES * TRAJECTORY_DT)
+    inside = (x0 >= 0) & (x0 <= width)
+    stop_at_start = (v0y < 0) & (y0 > height)
+    t_end = np.where(stop_at_start, 0.0, t_end)
+
+    u = np.linspace(0.0, 1.0, ADAPTIVE_GRID)
+    tg = t_end[:, None] * u
+    speed = np.hypot(v0x[:, None] + wind_ax[:, None] * tg, v0y[:, None] - gravity[:, None] * tg)
+    cross = np.abs(wind_ax * v0y + gravity * v0x)
+    # 密度在网格上只是近似, 留 10% 余量保证误差不超过 tolerance
+    density = np.sqrt(cross[:, None] / (8 * 0.9 * tolerance * np.maximum(speed, 1e-9)))
+    s = np.zeros_like(tg)
+    s[:, 1:] = np.cumsum(0.5 * (density[:, 1:] + density[:, :-1]) * np.diff(tg, axis=1), axis=1)
+    s_total = s[:, -1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_turn = (v0y * gravity - v0x * wind_ax) / (wind_ax * wind_ax + gravity * gravity)
+    has_turn = (t_turn > 0) & (t_turn < t_end)
+    # 把每一行拼接成一条单调序列, 一次 interp 完成所有炮弹的 s(t) 与 t(s) 查表
+    s_row = np.arange(len(x0)) * (s_total.max(initial=0.0) + 1.0)
+    t_row = np.arange(len(x0)) * (t_end.max(initial=0.0) + 1.0)
+    s_flat = (s + s_row[:, None]).ravel()
+    t_flat = (tg + t_row[:, None]).ravel()
+    s_turn = np.interp(np.where(has_turn, t_turn, 0.0) + t_row, t_flat, s_flat) - s_row
+    s_turn = np.where(has_turn, s_turn, 0.0)
+
+    n1 = np.where(has_turn, np.ceil(s_turn), 0).astype(np.int64)
+    n2 = np.maximum(np.ceil(s_total - s_turn), 1).astype(np.int64)
+    if max_points is not None:
+        budget = max(int(max_points) - 1, 2)
+        over = n1 + n2 > budget
+        n1_capped = np.clip(np.round(budget * s_turn / np.maximum(s_total, 1e-12)), has_turn, budget - 1)
+        n1 = np.where(over, n1_capped, n1).astype(np.int64)
+        n2 = np.where(over, budget - n1, n2).astype(np.int64)
+    counts = np.where(inside, np.where(stop_at_start, 1, n1 + n2 + 1), 0)
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    shot = np.repeat(np.arange(len(x0)), counts)
+    k = np.arange(offsets[-1]) - offsets[shot]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first_leg = s_turn[shot] * k / np.maximum(n1[shot], 1)
+        second_leg = s_turn[shot] + (s_total[shot] - s_turn[shot]) * (k - n1[shot]) / n2[shot]
+    sk = np.where(k <= n1[shot], first_leg, second_leg)
+    t = np.interp(sk + s_row[shot], s_flat, t_flat) - t_row[shot]
+    # 端点精确取在离开画布的时刻
+    t = np.where(k == counts[shot] - 1, t_end[shot], t)
+    points = np.empty((offsets[-1], 2))
+    points[:, 0] = x0[shot] + v0x[shot] * t + 0.5 * wind_ax[shot] * t * t
+    points[:, 1] = y0[shot] - (v0y[shot] * t - 0.5 * gravity[shot] * t * t)
+    going_down = (v0y - gravity * t_end) < 0
+    return points, offsets, going_down
+
+
+def trajectories(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+                 ticks_per_second, width=DEFAULT_CANVAS_SIZE, height=DEFAULT_CANVAS_SIZE,
+                 tolerance=None, max_points=None):
+    """Sample every shot of a batch until it leaves the canvas.
+
+    By default shots are sampled every ``TRAJECTORY_DT``: samples past the
+    left/right edge are dropped, the first sample that falls below the
+    bottom edge is kept. With ``tolerance`` (pixels) the sampling is
+    adaptive instead: the fewest vertices that keep the polyline within
+    ``tolerance`` of the true parabola, ending exactly on the canvas edge,
+    and never more than ``max_points`` per shot when that is given.
+
+    All shot parameters broadcast against each other; the result is a
+    :class:`TrajectoryBatch`.
+    """
+    args = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+        x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+        ticks_per_second, width, height)))
+    x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel, tps, width, height = (
+        np.ravel(a) for a in args)
+    v0x, v0y = launch_velocity(angle, power, max_velocity)
+    wind_ax = wind_power * wind_accel
+    shots = len(x0)
+
+    if tolerance is None:
+        points, offsets, going_down = _fixed_samples(x0, y0, v0x, v0y, wind_ax, gravity, width, height)
+    else:
+        points, offsets, going_down = _adaptive_samples(x0, y0, v0x, v0y, wind_ax, gravity,
+                                                        width, height, tolerance, max_points)
+
+    # 直接计算6个时间点的位置, 下落且越过底边后的时间点不再显示
+    ft = np.arange(1, FUSE_SECONDS + 1) * tps[:, None]
+    fuse_points = np.empty((shots, FUSE_SECONDS, 2))
+    fuse_points[..., 0] = x0[:, None] + v0x[:, None] * ft + 0.5 * wind_ax[:, None] * ft * ft
+    fuse_points[..., 1] = y0[:, None] - (v0y[:, None] * ft - 0.5 * gravity[:, None] * ft * ft)
+    below = going_down[:, None] & (fuse_points[..., 1] > height[:, None])
+    fuse_counts = np.where(below.any(axis=1), below.argmax(axis=1) + 1, FUSE_SECONDS)
+    return TrajectoryBatch(points, offsets, fuse_points, fuse_counts)
+
+
+def trajectory(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+               ticks_per_second, width=DEFAULT_CANVAS_SIZE, height=DEFAULT_CANVAS_SIZE,
+               tolerance=None, max_points=None, engine='continuous'):
+    """Single-shot form of :func:`trajectories`, returns (points, fuse_points).
+
+    With ``engine='tick'`` the shot is stepped by :func:`tick_trajectories`
+    and the sampling options are ignored.
+    """
+    if engine == 'tick':
+        batch = tick_trajectories(x0, y0, angle, power, gravity, max_velocity, wind_power,
+                                  wind_accel, ticks_per_second, width, height)
+    else:
+        batch = trajectories(x0, y0, angle, power, gravity, max_velocity, wind_power,
+                             wind_accel, ticks_per_second, width, height, tolerance, max_points)
+    return batch.trajectory(0), batch.fuse(0)
+
+
+def shot_batch(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+               ticks_per_second, width=DEFAULT_CANVAS_SIZE, height=DEFAULT_CANVAS_SIZE,
+               tolerance=None, max_points=None, engine='continuous'):
+    """:func:`trajectories` or :func:`tick_trajectories`, depending on ``engine``."""
+    if engine == 'tick':
+        return tick_trajectories(x0, y0, angle, power, gravity, max_velocity, wind_power,
+                                 wind_accel, ticks_per_second, width, height)
+    return trajectories(x0, y0, angle, power, gravity, max_velocity, wind_power,
+                        wind_accel, ticks_per_second, width, height, tolerance, max_points)
+
+
+def fan(x0, y0, angle, power, mode, gravity, max_velocity, wind_power, wind_accel,
+        ticks_per_second, width=DEFAULT_CANVAS_SIZE, height=DEFAULT_CANVAS_SIZE,
+        tolerance=None, max_points=None, engine='continuous'):
+    """Family of arcs around one shot, sampled as a single batch.
+
+    ``mode='power'`` keeps ``angle`` and fires at every ``FAN_POWERS``
+    level; ``mode='angle'`` keeps ``power`` and fires at every
+    ``FAN_ANGLES`` elevation, mirrored to the side ``angle`` faces.
+    Returns ``(angles, powers, batch)``.
+    """
+    if mode == 'power':
+        powers = np.array(FAN_POWERS, dtype=float)
+        angles = np.full(len(powers), float(angle))
+    elif mode == 'angle':
+        elevations = np.radians(FAN_ANGLES)
+        angles = elevations if math.cos(angle) >= 0 else math.pi - elevations
+        powers = np.full(len(angles), float(power))
+    else:
+        raise ValueError(f'unknown fan mode {mode!r}')
+    batch = shot_batch(x0, y0, angles, powers, gravity, max_velocity, wind_power, wind_accel,
+                       ticks_per_second, width, height, tolerance, max_points, engine)
+    return angles, powers, batch
+
+
+def _tick_samples(px0, py0, vx, vy, ax, ay, width, height):
+    # 逐帧整数积分 v += a; p += v 的闭式解 p_n = p0 + n v + a n (n + 1) / 2 (整数运算, 与逐帧累加完全一致),
+    # 返回 (points, offsets, going_down, x(n), y(n))
+    shots = len(px0)
+    one = float(1 << FIXED_SHIFT)
+
+    def at(src, n):
+        tri = n * (n + 1) // 2
+        x = (px0[src] + n * vx[src] + tri * ax[src]) / one
+        y = (py0[src] + n * vy[src] + tri * ay[src]) / one
+        return x, y
+
+    # 用等效的连续抛物线估计离开画布的帧数, 不够的重新加倍
+    n_exit = exit_times(px0 / one, py0 / one, (vx + 0.5 * ax) / one, -(vy + 0.5 * ay) / one,
+                        ax / one, ay / one, width, height)
+    with np.errstate(invalid='ignore'):
+        n = np.where(np.isfinite(n_exit), np.ceil(n_exit) + 4, 1024)
+    n = np.minimum(n, MAX_TRAJECTORY_SAMPLES).astype(np.int64)
+
+    counts = np.zeros(shots, dtype=np.int64)
+    going_down = np.zeros(shots, dtype=bool)
+    chunks = []
+    pending = np.arange(shots)
+    while len(pending):
+        lengths = n[pending]
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        shot = np.repeat(np.arange(len(pending)), lengths)
+        local = np.arange(lengths.sum()) - starts[shot]
+        src = pending[shot]
+        x, y = at(src, local)
+        down = vy[src] + ay[src] * local > 0
+        out_x = (x < 0) | (x > width[src])
+        stop = out_x | (down & (y > height[src]))
+
+        last = np.full(len(pending), -1, dtype=np.int64)
+        hit_pos = np.flatnonzero(stop)
+        hit_shot, first = np.unique(shot[hit_pos], return_index=True)
+        last[hit_shot] = hit_pos[first]
+        capped = (last < 0) & (lengths >= MAX_TRAJECTORY_SAMPLES)
+        last[capped] = starts[capped] + lengths[capped] - 1
+        done = last >= 0
+        counts[pending[done]] = local[last[done]] + ~out_x[last[done]]
+        going_down[pending[done]] = down[last[done]]
+        keep = done[shot] & (local < counts[src])
+        chunks.append((src[keep], x[keep], y[keep]))
+
+        pending = pending[~done]
+        n[pending] = np.minimum(n[pending] * 2, MAX_TRAJECTORY_SAMPLES)
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    points = np.empty((offsets[-1], 2))
+    shot, x, y = (np.concatenate(c) for c in zip(*chunks))
+    order = np.argsort(shot, kind='stable')
+    points[:, 0], points[:, 1] = x[order], y[order]
+    return points, offsets, going_down, at
+
+
+def tick_trajectories(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+                      ticks_per_second, width=DEFAULT_CANVAS_SIZE, height=DEFAULT_CANVAS_SIZE):
+    """Per-tick fixed-point counterpart of :func:`trajectories`.
+
+    The game advances projectiles ``TICKS_PER_FUSE_SECOND`` times per fuse
+    second, i.e. every ``ticks_per_second / TICKS_PER_FUSE_SECOND`` units of
+    simulation time, with 16.16 fixed-point velocity and acceleration that
+    are truncated once at launch. Each tick does ``v += a; p += v``, so the
+    drawn vertices are exactly the positions the game visits; they drift
+    from the continuous arc by the half-tick Euler offset and the
+    truncation error.
+    """
+    args = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+        x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+        ticks_per_second, width, height)))
+    x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel, tps, width, height = (
+        np.ravel(a) for a in args)
+    v0x, v0y = launch_velocity(angle, power, max_velocity)
+    dt = tps / TICKS_PER_FUSE_SECOND
+    one = 1 << FIXED_SHIFT
+    # 与游戏一样向零截断成定点数; y 轴向下为正
+    fixed = lambda v: np.trunc(v * one).astype(np.int64)
+    px0, py0 = np.round(x0 * one).astype(np.int64), np.round(y0 * one).astype(np.int64)
+    vx, vy = fixed(v0x * dt), fixed(-v0y * dt)
+    ax, ay = fixed(wind_power * wind_accel * dt * dt), fixed(gravity * dt * dt)
+    points, offsets, going_down, at = _tick_samples(px0, py0, vx, vy, ax, ay, width, height)
+
+    ticks = np.arange(1, FUSE_SECONDS + 1) * TICKS_PER_FUSE_SECOND
+    fuse_points = np.empty((len(x0), FUSE_SECONDS, 2))
+    fuse_points[..., 0], fuse_points[..., 1] = at(np.arange(len(x0))[:, None], ticks)
+    below = going_down[:, None] & (fuse_points[..., 1] > height[:, None])
+    fuse_counts = np.where(below.any(axis=1), below.argmax(axis=1) + 1, FUSE_SECONDS)
+    return TrajectoryBatch(points, offsets, fuse_points, fuse_counts)
+
+
+def min_aim_power(x0, y0, tx, ty, gravity, max_velocity, wind_power, wind_accel):
+    """Smallest power (0-100, may exceed 100) whose arc passes through (tx, ty)."""
+    dx = np.asarray(tx, dtype=float) - x0
+    dh = y0 - np.asarray(ty, dtype=float)  # 向上为正
+    wind_ax = np.asarray(wind_power, dtype=float) * wind_accel
+    v2 = dh * gravity - dx * wind_ax + np.sqrt((wind_ax * wind_ax + gravity * gravity) * (dx * dx + dh * dh))
+    return np.sqrt(np.maximum(v2, 0.0)) / max_velocity * 100
+
+
+def solve_aim(x0, y0, tx, ty, power, gravity, max_velocity, wind_power, wind_accel):
+    """Launch angles that hit (tx, ty) with the given power.
+
+    Writing the launch velocity in terms of the flight time t turns
+    ``|v| = v0`` into a quadratic in ``t**2``, so both solutions come out in
+    closed form. Returns ``(angles, times)`` with a trailing axis of length 2:
+    index 0 is the flat shot, index 1 the high lob. Unreachable entries are
+    NaN.
+    """
+    dx = np.asarray(tx, dtype=float) - x0
+    dh = y0 - np.asarray(ty, dtype=float)
+    wind_ax = np.asarray(wind_power, dtype=float) * wind_accel
+    v0 = max_velocity * (np.asarray(power, dtype=float) / 100)
+    a = 0.25 * (wind_ax * wind_ax + gravity * gravity)
+    b = dh * gravity - dx * wind_ax - v0 * v0
+    c = dx * dx + dh * dh
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = b * b - 4 * a * c
+        sq = np.sqrt(np.where(disc >= 0, disc, np.nan))
+        q = -0.5 * (b - sq)  # b < 0 为可达的必要条件
+        u = np.stack(np.broadcast_arrays(c / q, q / a), axis=-1)
+        u = np.where(u > 0, u, np.nan)
+        t = np.sqrt(u)
+        vx = (dx[..., None] - 0.5 * wind_ax[..., None] * u) / t
+        vy = (dh[..., None] + 0.5 * np.asarray(gravity, dtype=float)[..., None] * u) / t
+    return np.arctan2(vy, vx), t
+
+
+def refine_aim(x0, y0, tx, ty, angles, power, gravity, max_velocity, wind_power, wind_accel, steps=4):
+    """Newton-refine approximate launch angles (e.g. from a firing table).
+
+    The residual is the height by which the arc misses ``ty`` when it
+    first reaches ``tx``; its derivative with respect to the angle is
+    exact, so a seed within a degree or so converges in a few steps
+    (each step is capped at ``MAX_AIM_STEP`` radians).
+    Returns ``(angles, miss)`` where ``miss`` is the remaining vertical miss
+    in px (NaN where the arc never reaches ``tx``).
+    """
+    angles = np.array(angles, dtype=float)
+    v0 = max_velocity * power / 100
+    wind_ax = wind_power * wind_accel
+    dx, dh = tx - x0, y0 - ty  # 向上为正
+    for step in range(steps + 1):
+        vx, vy = v0 * np.cos(angles), v0 * np.sin(angles)
+        t = _first_positive_root(0.5 * wind_ax, vx, -dx)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(np.isfinite(t), t, np.nan)
+            miss = vy * t - 0.5 * gravity * t * t - dh
+            if step == steps:
+                break
+            # x(t(θ)) = dx 两边对 θ 求导得 dt/dθ, 再代入 y
+            dt = vy * t / (vx + wind_ax * t)
+            slope = vx * t + (vy - gravity * t) * dt
+            # 限制步长, 避免在射程最远处附近跳到另一支解上
+            angles = angles - np.clip(miss / slope, -MAX_AIM_STEP, MAX_AIM_STEP)
+    return np.remainder(angles + math.pi, 2 * math.pi) - math.pi, np.abs(miss)
+
+
+def aim_powers(x0, y0, tx, ty, gravity, max_velocity, wind_power, wind_accel, steps=201):
+    """``steps`` powers from the minimum that reaches (tx, ty) to 100, or empty."""
+    p_min = float(min_aim_power(x0, y0, tx, ty, gravity, max_velocity, wind_power, wind_accel))
+    if not p_min <= 100:
+        return np.empty(0)
+    powers = np.linspace(p_min, 100, steps)
+    # 最小力度处两个解重合, 判别式可能因舍入略小于 0; 稍微抬高一点
+    powers[0] = min(p_min * (1 + 1e-9), 100)
+    return powers
+
+
+def aim_solutions(x0, y0, tx, ty, gravity, max_velocity, wind_power, wind_accel, steps=201):
+    """Every (angle, power) pair that reaches (tx, ty), sampled over power.
+
+    Sweeps ``steps`` power levels from the minimum reachable power to 100
+    (see :func:`aim_powers`) and returns ``(powers, angles)`` where
+    ``angles`` is (steps, 2) as in :func:`solve_aim`. Both arrays are empty
+    when the target is out of range.
+    """
+    powers = aim_powers(x0, y0, tx, ty, gravity, max_velocity, wind_power, wind_accel, steps)
+    if not len(powers):
+        return powers, np.empty((0, 2))
+    angles, _ = solve_aim(x0, y0, tx, ty, powers, gravity, max_velocity, wind_power, wind_accel)
+    return powers, angles
+
+
+class TrajectoryCache:
+    """Bounded LRU memo of single-shot trajectories.
+
+    Keys are the shot parameters quantized to ``angle_step`` radians,
+    ``power_step`` percent and ``param_digits`` decimals for the physics
+    constants, plus the integer shooter position, canvas size, sampling
+    options and engine. Misses
+    are computed from the quantized values, so a hit always returns the
+    same arrays a fresh computation of that key would. Entries are evicted
+    least-recently-used first once their arrays exceed ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=32 << 20, angle_step=1e-4, power_step=0.01, param_digits=6):
+        self.max_bytes = max_bytes
+        self.angle_step = angle_step
+        self.power_step = power_step
+        self.param_digits = param_digits
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+            ticks_per_second, width=DEFAULT_CANVAS_SIZE, height=DEFAULT_CANVAS_SIZE,
+            tolerance=None, max_points=None, engine='continuous'):
+        d = self.param_digits
+        return (int(round(x0)), int(round(y0)),
+                int(round(angle / self.angle_step)), int(round(power / self.power_step)),
+                round(gravity, d), round(max_velocity, d), round(wind_power, d),
+                round(wind_accel, d), round(ticks_per_second, d), int(width), int(height),
+                tolerance, max_points, engine)
+
+    def trajectory(self, *args, **kwargs):
+        """Cached :func:`trajectory`; the returned arrays are read-only."""
+        key = self.key(*args, **kwargs)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        x0, y0, qa, qp, *rest = key
+        entry = trajectory(x0, y0, qa * self.angle_step, qp * self.power_step, *rest)
+        for array in entry:
+            array.flags.writeable = False
+        self._entries[key] = entry
+        self.nbytes += sum(array.nbytes for array in entry)
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.nbytes -= sum(array.nbytes for array in old)
+            self.evictions += 1
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def tick_time_to(points, segment, position, ticks_per_second):
+    """Time at which a :func:`tick_trajectories` path reaches ``position``.
+
+    ``points[k]`` is the position after ``k`` ticks and ``position`` lies on
+    the segment ``points[segment]`` to ``points[segment + 1]``; the time is
+    interpolated between the two ticks.
+    """
+    start, end = points[segment], points[segment + 1]
+    length = math.hypot(*(end - start))
+    fraction = math.hypot(*(np.asarray(position) - start)) / length if length else 0.0
+    return (segment + fraction) * ticks_per_second / TICKS_PER_FUSE_SECOND
+
+
+def flight_time_to(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel, px, py):
+    """Time at which a shot passes closest to the on-arc point (px, py)."""
+    v0x, v0y = (float(v) for v in launch_velocity(angle, power, max_velocity))
+    wind_ax = wind_power * wind_accel
+    candidates = [0.0]
+    for coeffs in ((0.5 * wind_ax, v0x, x0 - px), (0.5 * gravity, -v0y, y0 - py)):
+        roots = np.roots(coeffs) if any(coeffs[:2]) else []
+        candidates += [r.real for r in roots if abs(r.imag) < 1e-9 and r.real >= 0]
+    times = np.array(candidates)
+    x = x0 + v0x * times + 0.5 * wind_ax * times * times
+    y = y0 - (v0y * times - 0.5 * gravity * times * times)
+    return float(times[np.argmin(np.hypot(x - px, y - py))])
@@ -0,0 +1,304 @@
+"""Headless benchmarks for the aimer's physics and rendering hot paths.
+
+Runs under the offscreen Qt platform, so no display is needed:
+
+    python benchmark.py -o bench.json
+    python benchmark.py -o new.json --compare bench.json
+
+The startup group launches ``aimer.py`` in fresh processes and times
+process start -> first canvas frame, split into interpreter start plus
+imports (``main_entry``), window construction and show -> first paint.
+
+Every benchmark records per-call latencies and reports mean and
+percentiles in milliseconds. Results are written as JSON with stable keys
+so two runs can be diffed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5.QtCore import QEvent, QPoint, QPointF, Qt, PYQT_VERSION_STR, QT_VERSION_STR
+from PyQt5.QtGui import QImage, QMouseEvent, QPainterPath, QPolygonF
+from PyQt5.QtWidgets import QApplication
+
+import aimer
+import ballistics
+
+CANVAS_SIZE = (3240, 1800)
+GRAVITIES = (1.0, 4.0, 50.0)
+WINDS = (-10, 0, 10)
+SAMPLINGS = {'adaptive': 0.25, 'fixed': None}
+ENGINE_CASES = {'adaptive': (0.25, 'continuous'), 'fixed': (None, 'continuous'), 'tick': (None, 'tick')}
+SWEEP_SHOTS = 2000
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        'count': int(len(ms)),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def make_canvas(gravity=4.0, wind=0, tolerance=0.25, engine='continuous'):
+    canvas = aimer.TransparentCanvas()
+    canvas.resize(*CANVAS_SIZE)
+    canvas.sample_tolerance = tolerance
+    canvas.engine = engine
+    canvas.set_parameters(max_radius=280, gravity=gravity, max_velocity=95,
+                          ticks_per_second=7.0, wind_power=wind, wind_accel=0.49)
+    canvas.center_point = QPoint(CANVAS_SIZE[0] // 2, CANVAS_SIZE[1] - 100)
+    return canvas
+
+
+def drag_points(canvas, count):
+    # 围绕中心点扫过 0-180 度、半径在 0.3-1.2 倍最大半径间变化的拖动轨迹
+    center = canvas.center_point
+    angles = np.linspace(0.05, np.pi - 0.05, count)
+    radii = canvas.max_radius * (0.75 + 0.45 * np.sin(np.linspace(0, 6 * np.pi, count)))
+    return [QPoint(int(center.x() + r * np.cos(a)), int(center.y() - r * np.sin(a)))
+            for a, r in zip(angles, radii)]
+
+
+def bench_trajectory(repeat):
+    results = {}
+    for sampling, (tolerance, engine) in ENGINE_CASES.items():
+        for gravity in GRAVITIES:
+            for wind in WINDS:
+                canvas = make_canvas(gravity, wind, tolerance, engine)
+                samples = []
+                vertices = []
+                for point in drag_points(canvas, repeat):
+                    canvas.current_point = point
+                    canvas.trajectory_cache.clear()
+                    canvas._trajectory_key = None
+                    start = time.perf_counter()
+                    canvas.calculate_trajectory()
+                    samples.append(time.perf_counter() - start)
+                    vertices.append(len(canvas.trajectory_points))
+                stats = summarize(samples)
+                stats['mean_vertices'] = float(np.mean(vertices))
+                results[f'{sampling}/g={gravity:g}/wind={wind}'] = stats
+    return results
+
+
+def bench_sweep(repeat):
+    # 一次批量计算 SWEEP_SHOTS 发炮弹 (整个角度 x 力度网格的一部分)
+    angles, powers = np.meshgrid(np.linspace(0.1, np.pi - 0.1, SWEEP_SHOTS // 40),
+                                 np.linspace(20, 100, 40), indexing='ij')
+    shots = (CANVAS_SIZE[0] / 2, CANVAS_SIZE[1] - 100, angles.ravel(), powers.ravel(),
+             4.0, 95, 3, 0.49, 7.0, *CANVAS_SIZE)
+    cases = {
+        'adaptive': lambda: ballistics.trajectories(*shots, tolerance=0.25),
+        'fixed': lambda: ballistics.trajectories(*shots),
+        'tick': lambda: ballistics.tick_trajectories(*shots),
+        # 扇形预览: 10 条轨迹一次批量计算
+        'fan': lambda: ballistics.fan(shots[0], shots[1], 0.8, 50, 'power', *shots[4:],
+                                      tolerance=0.25)[2],
+    }
+    results = {}
+    for name, run in cases.items():
+        samples = []
+        for _ in range(max(repeat // 5, 3)):
+            start = time.perf_counter()
+            batch = run()
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        stats['shots'] = len(batch)
+        stats['vertices'] = int(len(batch.points))
+        results[name] = stats
+    return results
+
+
+def bench_paint(repeat):
+    results = {}
+    image = QImage(*CANVAS_SIZE, QImage.Format_ARGB32_Premultiplied)
+    for sampling, tolerance in SAMPLINGS.items():
+        canvas = make_canvas(1.0, 0, tolerance)
+        states = {'empty': None, 'drag': drag_points(canvas, 3)[1]}
+        for state, point in states.items():
+            canvas.current_point = point
+            canvas._trajectory_key = None
+            canvas.calculate_trajectory()
+            canvas.render(image)  # 预热静态图层缓存
+            samples = []
+            for _ in range(repeat):
+                image.fill(0)
+                start = time.perf_counter()
+                canvas.render(image)
+                samples.append(time.perf_counter() - start)
+            results[f'{sampling}/{state}'] = summarize(samples)
+    return results
+
+
+def bench_memory(repeat):
+    # 长而平缓的低重力弧线: 对比数组 + QPolygonF 与原先 QPointF 列表 + QPainterPath 的内存和构建耗时
+    results = {}
+    for gravity in (1.0, 0.25):
+        canvas = make_canvas(gravity, 0, None)
+        canvas.current_point = drag_points(canvas, 3)[1]
+        canvas.calculate_trajectory()
+        points = canvas.trajectory_points
+        n = len(points)
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            aimer.polygon_from_array(points)
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+
+        def legacy_arc():
+            qpoints = [QPointF(x, y) for x, y in points.tolist()]
+            path = QPainterPath()
+            path.addPolygon(QPolygonF(qpoints))
+            return qpoints, path
+
+        legacy = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            legacy_arc()
+            legacy.append(time.perf_counter() - start)
+        tracemalloc.start()
+        kept = legacy_arc()
+        wrappers = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        # Python 包装对象 (tracemalloc) + 每个 QPointF 的 C++ 对象 16 字节
+        # + QPolygonF 16 字节/点 + QPainterPath 元素 24 字节/点
+        legacy_bytes = wrappers + n * (16 + 16 + 24)
+        footprint = canvas.memory_footprint()
+        stats.update({
+            'vertices': n,
+            'bytes': footprint['trajectory_total_bytes'],
+            'legacy_bytes_estimate': legacy_bytes,
+            'legacy_mean_ms': float(np.mean(legacy) * 1000),
+        })
+        results[f'fixed/g={gravity:g}'] = stats
+    return results
+
+
+def bench_drag(app, events, interval):
+    results = {}
+    for sampling, tolerance in SAMPLINGS.items():
+        canvas = make_canvas(1.0, 0, tolerance)
+        canvas.show()
+        app.processEvents()
+        points = drag_points(canvas, events)
+        canvas.mousePressEvent(QMouseEvent(QEvent.MouseButtonPress, QPointF(points[0]),
+                                           Qt.LeftButton, Qt.LeftButton, Qt.NoModifier))
+        frames = canvas.repaint_frames
+        runs = canvas.scheduler.runs
+        samples = []
+        for point in points:
+            event = QMouseEvent(QEvent.MouseMove, QPointF(point), Qt.NoButton,
+                                Qt.LeftButton, Qt.NoModifier)
+            start = time.perf_counter()
+            canvas.mouseMoveEvent(event)
+            app.processEvents()
+            samples.append(time.perf_counter() - start)
+            if interval:
+                time.sleep(interval / 1000)
+        canvas.mouseReleaseEvent(QMouseEvent(QEvent.MouseButtonRelease, QPointF(points[-1]),
+                                             Qt.LeftButton, Qt.NoButton, Qt.NoModifier))
+        app.processEvents()
+        stats = summarize(samples)
+        stats['recomputes'] = canvas.scheduler.runs - runs
+        stats['paints'] = canvas.repaint_frames - frames
+        stats['mean_repaint_pixels'] = canvas.repaint_stats()['mean_pixels']
+        results[sampling] = stats
+        canvas.close()
+    return results
+
+
+def bench_startup(runs):
+    # 冷启动: 新进程启动 aimer.py, 到画布第一帧画完 (aimer 在首帧后打印各阶段时间并退出)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'aimer.py')
+    samples = {'first_frame': [], 'main_entry': [], 'construct': [], 'show_to_paint': []}
+    for _ in range(runs):
+        env = dict(os.environ, **{aimer.STARTUP_PROBE: repr(time.time())})
+        output = subprocess.run([sys.executable, script], env=env, capture_output=True,
+                                text=True, timeout=60, check=True).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        samples['first_frame'].append(probe['main_entry'] + probe['first_frame'])
+        samples['main_entry'].append(probe['main_entry'])
+        samples['construct'].append(probe['construct'])
+        samples['show_to_paint'].append(probe['first_frame'] - probe['construct'])
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def compare(results, baseline):
+    # 打印与基准结果的 p50/p95 对比, 比值 < 1 表示变快
+    for group, entries in results.items():
+        for name, stats in entries.items():
+            old = baseline.get('results', {}).get(group, {}).get(name)
+            if not old:
+                continue
+            ratios = [stats[key] / old[key] if old[key] else float('nan')
+                      for key in ('p50_ms', 'p95_ms')]
+            print(f'{group:>10} {name:<28} p50 x{ratios[0]:.2f}  p95 x{ratios[1]:.2f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', default='bench_results.json', help='JSON results file')
+    parser.add_argument('--repeat', type=int, default=50, help='calls per trajectory/paint case')
+    parser.add_argument('--events', type=int, default=500, help='mouse-move events in the drag replay')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='milliseconds between replayed events, 1 ms = 1000 Hz mouse '
+                             '(0 = as fast as possible)')
+    parser.add_argument('--startup-runs', type=int, default=10,
+                        help='cold starts of aimer.py in the startup benchmark (0 = skip)')
+    parser.add_argument('--compare', help='previous JSON results to compare against')
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = {
+        'trajectory': bench_trajectory(args.repeat),
+        'sweep': bench_sweep(args.repeat),
+        'paint': bench_paint(args.repeat),
+        'memory': bench_memory(args.repeat),
+        'drag': bench_drag(app, args.events, args.interval),
+    }
+    if args.startup_runs:
+        results['startup'] = bench_startup(args.startup_runs)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'platform': platform.platform(),
+            'canvas': list(CANVAS_SIZE),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for group, entries in results.items():
+        for name, stats in entries.items():
+            print(f'{group:>10} {name:<28} p50 {stats["p50_ms"]:8.3f} ms  '
+                  f'p95 {stats["p95_ms"]:8.3f} ms  p99 {stats["p99_ms"]:8.3f} ms')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Event-driven flight of bouncing, fused projectiles (grenades).
+
+Between events a projectile follows the closed-form parabola of
+``ballistics``, so a flight is a chain of segments, each starting from a
+position and velocity. For every segment the engine works out the next
+event instead of stepping time:
+
+* detonation: the fuse runs out ``fuse_seconds * ticks_per_second`` after
+  launch (known in advance);
+* exit: the analytic time the arc leaves the canvas
+  (``ballistics.exit_times``);
+* terrain: the segment is cut into short pieces and the terrain mask's
+  block index finds the first solid piece, which is then resampled
+  finely on the closed form to get the contact time.
+
+At a terrain contact the velocity is reflected about the surface normal,
+which is estimated from the solid pixels around the contact, and its
+normal component is scaled by ``restitution``. Without a terrain mask the
+canvas bottom is the ground. A projectile that rebounds off the surface
+slower than ``REST_SPEED``, or whose last segment moved less than
+``STUCK_DISTANCE`` (wedged in a crevice), stays where it is until it
+detonates. Work per
+flight is two vectorized terrain queries per segment, and ``budget_ms``
+caps the total.
+
+Flights always use the continuous closed form: the per-tick engine
+(``ballistics.tick_trajectories``) has no bounce model, so grenade paths
+ignore the canvas engine selection.
+"""
+import math
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+import ballistics
+
+DEFAULT_FUSE = 3  # 游戏里手雷引线默认 3 秒
+DEFAULT_RESTITUTION = 0.5
+MAX_BOUNCES = 64
+REST_SPEED = 2.0  # 反弹后沿法向的速度低于这个值 (像素/单位时间) 视为静止, 不在地面上一路小跳
+STUCK_DISTANCE = 0.5  # 两次反弹之间移动不到这么多像素 (卡在缝里) 视为静止
+PIECE_LENGTH = 8.0  # 地形检测时每段折线的长度上限 (像素)
+MAX_PIECES = 4096
+REFINE_SAMPLES = 65  # 命中小段内的细分点数, 8 像素 / 64 = 1/8 像素
+NORMAL_RADIUS = 3  # 估计表面法向时采样的邻域半径 (像素)
+DEFAULT_BUDGET_MS = 4.0
+
+_offsets = np.array([(dx, dy) for dy in range(-NORMAL_RADIUS, NORMAL_RADIUS + 1)
+                     for dx in range(-NORMAL_RADIUS, NORMAL_RADIUS + 1)
+                     if 0 < dx * dx + dy * dy <= NORMAL_RADIUS * NORMAL_RADIUS], dtype=float)
+
+
+class Flight(NamedTuple):
+    """Full path of one grenade.
+
+    ``points`` is the multi-bounce polyline up to detonation (or exit),
+    ``bounces`` the contact points, ``fuse_points`` the position at every
+    whole fuse second before detonation. ``detonation`` is None when the
+    grenade left the canvas first; ``truncated`` is set when the bounce
+    limit or the time budget cut the flight short.
+    """
+    points: np.ndarray
+    bounces: np.ndarray
+    fuse_points: np.ndarray
+    detonation: object
+    detonation_time: float
+    truncated: bool
+
+
+def _position(p, v, a, t):
+    return p + v * t + 0.5 * a * t * t
+
+
+def surface_normal(terrain, x, y, direction):
+    """Unit normal of the terrain at (x, y), pointing away from the solid side.
+
+    Falls back to ``-direction`` where the neighbourhood gives no hint.
+    """
+    solid = terrain.is_solid(x + _offsets[:, 0], y + _offsets[:, 1])
+    if solid.any() and not solid.all():
+        normal = -_offsets[solid].sum(axis=0)
+        length = math.hypot(*normal)
+        if length > 1e-9:
+            return normal / length
+    length = math.hypot(*direction)
+    return -np.asarray(direction) / length if length > 1e-9 else np.array([0.0, -1.0])
+
+
+def _terrain_contact(terrain, p, v, a, duration):
+    # 在 [0, duration] 内找到第一次接触地形的时刻, 没有则为 None
+    speed = math.hypot(*v) + math.hypot(*a) * duration
+    pieces = int(min(max(math.ceil(speed * duration / PIECE_LENGTH), 1), MAX_PIECES))
+    t = np.linspace(0.0, duration, pieces + 1)
+    points = p + np.outer(t, v) + 0.5 * np.outer(t * t, a)
+    hit = terrain.first_hit(points)
+    if hit is None:
+        return None
+    segment = hit[0]
+    if segment == 0 and terrain.is_solid(*points[0]):
+        return 0.0
+    # 在命中的小段内一次取 REFINE_SAMPLES 个时刻, 取第一个实心点之前的时刻
+    ts = np.linspace(t[segment], t[min(segment + 1, pieces)], REFINE_SAMPLES)
+    fine = p + np.outer(ts, v) + 0.5 * np.outer(ts * ts, a)
+    solid = terrain.is_solid(fine[:, 0], fine[:, 1])
+    first = int(solid.argmax()) if solid.any() else REFINE_SAMPLES - 1
+    return ts[max(first - 1, 0)]
+
+
+def simulate(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+             ticks_per_second, width=ballistics.DEFAULT_CANVAS_SIZE,
+             height=ballistics.DEFAULT_CANVAS_SIZE, terrain=None, fuse_seconds=DEFAULT_FUSE,
+             restitution=DEFAULT_RESTITUTION, tolerance=0.25, budget_ms=DEFAULT_BUDGET_MS):
+    """Chain flight segments from launch until detonation; returns a :class:`Flight`.
+
+    Coordinates are canvas pixels with y pointing down, as everywhere in
+    the canvas. ``tolerance`` is the sampling tolerance of the drawn
+    segments (see ``ballistics.trajectories``). With ``terrain`` None the
+    grenade bounces off the canvas bottom.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000
+    v0x, v0y = ballistics.launch_velocity(angle, power, max_velocity)
+    p = np.array([float(x0), float(y0)])
+    v = np.array([float(v0x), -float(v0y)])
+    a = np.array([wind_power * wind_accel, float(gravity)])
+    fuse_time = fuse_seconds * ticks_per_second
+    marks = np.arange(1, math.floor(fuse_seconds) + 1) * ticks_per_second
+    marks = marks[marks < fuse_time]
+
+    pieces, bounces, fuse_points = [p[None]], [], []
+    t = 0.0
+    detonation = None
+    truncated = False
+    resting = False
+    while True:
+        remaining = fuse_time - t
+        if resting:
+            duration = remaining
+            event = 'detonate'
+        else:
+            # y 向上为正的形式交给 exit_times
+            exit_t = float(ballistics.exit_times(p[0], p[1], v[0], -v[1], a[0], a[1], width, height))
+            duration, event = (remaining, 'detonate') if remaining <= exit_t else (exit_t, 'exit')
+            if terrain is not None and duration > 0:
+                contact = _terrain_contact(terrain, p, v, a, duration)
+                if contact is not None:
+                    duration, event = contact, 'bounce'
+
+        for mark in marks[(marks >= t) & (marks < t + duration)].tolist():
+            fuse_points.append(p if resting else _position(p, v, a, mark - t))
+        if not resting and duration > 0:
+            # 弦与抛物线的最大偏差 |a| h^2 / 8 不超过 tolerance 的等时间步长
+            accel = math.hypot(*a)
+            count = math.ceil(duration / math.sqrt(8 * tolerance / accel)) if accel > 0 else 1
+            ts = np.linspace(0.0, duration, min(max(count, 1), MAX_PIECES) + 1)[1:]
+            pieces.append(p + np.outer(ts, v) + 0.5 * np.outer(ts * ts, a))
+        end = _position(p, v, a, duration) if not resting else p
+        # 本段路程的上限 |v| t + |a| t^2 / 2; 卡在缝里时每次反弹都几乎不动
+        travelled = math.hypot(*v) * duration + 0.5 * math.hypot(*a) * duration * duration
+        t += duration
+
+        if event == 'detonate':
+            detonation = end
+            break
+        if event == 'exit' and terrain is None and v[1] + a[1] * duration > 0 and end[1] >= height - 1e-6:
+            # 没有地形时以画布底边为地面
+            event = 'bounce'
+        if event == 'exit':
+            break
+        # 反弹: 法向分量乘以恢复系数后反向, 切向分量保留
+        velocity = v + a * duration
+        if terrain is None:
+            normal = np.array([0.0, -1.0])
+        else:
+            normal = surface_normal(terrain, end[0], end[1], velocity)
+        along = velocity @ normal
+        if along < 0:
+            velocity = velocity - (1 + restitution) * along * normal
+        bounces.append(end)
+        p = end + normal * 0.5  # 推离表面, 避免下一段起点仍在实心像素内
+        v = velocity
+        if velocity @ normal < REST_SPEED or travelled < STUCK_DISTANCE or len(bounces) >= MAX_BOUNCES:
+            resting = True
+            truncated = len(bounces) >= MAX_BOUNCES
+        if time.perf_counter() > deadline:
+            # 超出时间预算: 就地引爆, 标记为截断
+            detonation, truncated = p, True
+            break
+
+    points = np.concatenate(pieces)
+    return Flight(points, np.array(bounces).reshape(-1, 2), np.array(fuse_points).reshape(-1, 2),
+                  detonation, t if detonation is not None else math.nan, truncated)
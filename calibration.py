@@ -0,0 +1,156 @@
+"""Fit the physics constants to recorded real shots.
+
+Each observation is a shot fired in the game (start point, launch angle
+and power from the drag vector, wind notch) together with where it
+actually landed and, optionally, how many fuse seconds it flew.
+
+Landing points only pin down the shape of the arcs: scaling simulation
+time by k together with max_velocity / k, gravity and wind_accel / k**2
+and ticks_per_second * k draws exactly the same arcs and fuse markers. So
+max_velocity is held at its current value and the fitter solves for
+gravity and wind_accel plus the unknown flight time of every shot with
+damped Gauss-Newton on the stacked x/y residuals. ticks_per_second only
+maps fuse seconds to simulation time, so it is fitted afterwards in closed
+form and only from shots whose flight seconds were recorded.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+import ballistics
+
+MIN_SHOTS = 2  # 2n 个方程, 2 + n 个未知数
+MAX_ITERATIONS = 50
+
+
+class Observation(NamedTuple):
+    """One recorded shot; ``seconds`` is NaN when the flight time is unknown."""
+    x0: float
+    y0: float
+    angle: float
+    power: float
+    wind_power: float
+    tx: float
+    ty: float
+    seconds: float = float('nan')
+
+
+class Calibration(NamedTuple):
+    """Fitted constants. ``residuals`` are per-shot landing misses in pixels."""
+    gravity: float
+    max_velocity: float
+    wind_accel: float
+    ticks_per_second: float
+    times: np.ndarray
+    residuals: np.ndarray
+    rms: float
+    iterations: int
+
+
+def _initial_times(x0, y0, cx, cy, wind, gravity, max_velocity, wind_accel, tx, ty):
+    # 用当前常数求各发炮弹离观测落点最近的时刻: 候选为 x、y 方程各自的根
+    v0x, v0y = max_velocity * cx, max_velocity * cy
+    wind_ax = wind * wind_accel
+    candidates = []
+    for a, b, c in ((0.5 * wind_ax, v0x, x0 - tx), (0.5 * gravity, -v0y, y0 - ty)):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sq = np.sqrt(b * b - 4 * a * c)
+            linear = -c / b
+            candidates += [np.where(a != 0, (-b + sq) / (2 * a), linear),
+                           np.where(a != 0, (-b - sq) / (2 * a), linear)]
+    t = np.stack(candidates)
+    t = np.where(np.isfinite(t) & (t > 0), t, np.nan)
+    x = x0 + v0x * t + 0.5 * wind_ax * t * t
+    y = y0 - (v0y * t - 0.5 * gravity * t * t)
+    miss = np.where(np.isnan(t), np.inf, np.hypot(x - tx, y - ty))
+    best = t[miss.argmin(axis=0), np.arange(t.shape[1])]
+    return np.where(np.isnan(best), 1.0, best)
+
+
+def fit(observations, gravity, max_velocity, wind_accel, ticks_per_second,
+        iterations=MAX_ITERATIONS, tol=1e-10):
+    """Least-squares constants for a list of :class:`Observation`.
+
+    The current constants are the starting point and ``max_velocity`` is
+    kept as the unit of the fit (see the module docstring); ``ticks_per_second`` is
+    returned unchanged when no observation has ``seconds``. Constants the
+    shots carry no information about (e.g. wind_accel when every shot had
+    zero wind) stay at their starting value.
+    """
+    if len(observations) < MIN_SHOTS:
+        raise ValueError(f'need at least {MIN_SHOTS} shots, got {len(observations)}')
+    x0, y0, angle, power, wind, tx, ty, seconds = np.array(observations, dtype=float).T
+    n = len(x0)
+    cx = power / 100 * np.cos(angle)
+    cy = power / 100 * np.sin(angle)
+    rows = np.arange(n)
+
+    v = float(max_velocity)
+    params = np.array([gravity, wind_accel], dtype=float)
+    t = _initial_times(x0, y0, cx, cy, wind, gravity, v, wind_accel, tx, ty)
+
+    def residuals(params, t):
+        g, a = params
+        rx = x0 + v * cx * t + 0.5 * wind * a * t * t - tx
+        ry = y0 - (v * cy * t - 0.5 * g * t * t) - ty
+        return np.concatenate((rx, ry))
+
+    def solve(params, t):
+        r = residuals(params, t)
+        cost = r @ r
+        damping = 1e-3
+        jac = np.zeros((2 * n, 2 + n))
+        done = 0
+        for done in range(1, iterations + 1):
+            g, a = params
+            # 雅可比: 前 2 列为常数, 其余每发炮弹只有自己的飞行时间一列非零
+            jac[:n, 1] = 0.5 * wind * t * t
+            jac[n:, 0] = 0.5 * t * t
+            jac[rows, 2 + rows] = v * cx + wind * a * t
+            jac[n + rows, 2 + rows] = -v * cy + g * t
+            scale = np.linalg.norm(jac, axis=0)
+            scale[scale == 0] = 1.0
+            js = jac / scale
+            lhs = js.T @ js
+            rhs = js.T @ r
+            while damping <= 1e12:
+                step = np.linalg.lstsq(lhs + damping * np.diag(np.diag(lhs) + 1e-12), -rhs,
+                                       rcond=None)[0] / scale
+                new_params = params + step[:2]
+                new_t = t + step[2:]
+                if (new_params > 0).all() and (new_t > 0).all():
+                    new_r = residuals(new_params, new_t)
+                    new_cost = new_r @ new_r
+                    if new_cost <= cost:
+                        break
+                damping *= 10
+            else:
+                break
+            improvement = cost - new_cost
+            params, t, r, cost = new_params, new_t, new_r, new_cost
+            damping = max(damping / 10, 1e-9)
+            if improvement <= tol * max(cost, 1.0):
+                break
+        return params, t, r, cost, done
+
+    params, t, r, cost, done = solve(params, t)
+    # 初值离真值较远时个别炮弹的飞行时间可能落在错误的分支上, 用拟合结果重新取初值再解一次
+    retry = solve(params, _initial_times(x0, y0, cx, cy, wind, params[0], v, params[1], tx, ty))
+    if retry[3] < cost:
+        params, t, r, cost = retry[:4]
+        done += retry[4]
+
+    timed = np.isfinite(seconds) & (seconds > 0)
+    if timed.any():
+        # 逻辑时间 = 引线秒数 * ticks_per_second, 最小二乘闭式解
+        ticks_per_second = float(t[timed] @ seconds[timed] / (seconds[timed] @ seconds[timed]))
+    miss = np.hypot(r[:n], r[n:])
+    return Calibration(float(params[0]), v, float(params[1]), ticks_per_second,
+                       t, miss, float(np.sqrt(np.mean(miss * miss))), done)
+
+
+def observation(x0, y0, dx, dy, max_radius, wind_power, tx, ty, seconds=float('nan')):
+    """Observation from a drag vector as the canvas measures it."""
+    return Observation(float(x0), float(y0), ballistics.shot_angle(dx, dy),
+                       float(ballistics.shot_power(dx, dy, max_radius)), float(wind_power),
+                       float(tx), float(ty), float(seconds))
@@ -0,0 +1,254 @@
+"""Headless batch solver: stream shot specs in, trajectories out.
+
+Runs without Qt. Every input record is one shot spec, given either as a
+launch (``angle`` in degrees and ``power`` 0-100) or as a target
+(``tx``, ``ty`` and an optional ``power``, default 100, solved for the
+flat shot and the lob). The shooter position is ``x0``, ``y0``. Any
+physics constant (``gravity``, ``max_velocity``, ``wind_power``,
+``wind_accel``, ``ticks_per_second``, ``width``, ``height``, ``engine``)
+may be given per record and otherwise comes from the command line.
+An optional ``id`` is echoed back; records without one get their
+0-based position in the input stream. A record that can't be solved (bad
+JSON, missing or non-finite numbers, unreachable target) gets an
+``error`` instead of its solutions; the rest of the stream goes on.
+
+    python cli.py shots.jsonl -o out.jsonl
+    python cli.py shots.csv --workers 4 --summary
+    echo '{"x0": 100, "y0": 900, "angle": 45, "power": 80}' | python cli.py
+
+Output is one JSON line per input record, in input order, with the
+trajectory points, the fuse-second markers and the impact point (where
+the arc leaves the canvas). Records are read and solved in fixed-size
+chunks, and at most a few chunks are in flight at once, so memory stays
+bounded whatever the input size.
+"""
+import argparse
+import csv
+import json
+import math
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import NamedTuple
+
+import numpy as np
+
+import ballistics
+
+DEFAULTS = {
+    'gravity': 4.0,
+    'max_velocity': 95.0,
+    'wind_power': 0.0,
+    'wind_accel': 0.49,
+    'ticks_per_second': 7.0,
+    'width': 3240,
+    'height': 1800,
+    'engine': 'continuous',
+}
+PHYSICS = ('gravity', 'max_velocity', 'wind_power', 'wind_accel', 'ticks_per_second', 'width', 'height')
+CHUNK = 256
+WINDOW_PER_WORKER = 2  # 每个工作进程最多排队的块数
+
+
+class BadRecord(NamedTuple):
+    """Input line that is not a shot spec; solved into an error result."""
+    line: int
+    error: str
+
+
+def read_specs(stream, fmt):
+    """Yield shot specs (dicts) from a JSONL or CSV text stream.
+
+    JSONL lines that don't parse to an object are yielded as
+    :class:`BadRecord` so they keep their place in the output.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value not in (None, '')}
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            spec = json.loads(line)
+        except ValueError as e:
+            yield BadRecord(number, f'bad JSON: {e}')
+            continue
+        yield spec if isinstance(spec, dict) else BadRecord(number, 'record must be a JSON object')
+
+
+def _number(value, name):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f'{name} must be finite, got {value!r}')
+    return value
+
+
+def _shot(spec, defaults):
+    # 规格 -> (参数, 发射列表); 目标点模式解出平射和吊射两个发射角
+    if not isinstance(spec, dict):
+        raise TypeError('spec must be a JSON object')
+    params = {key: spec.get(key, defaults[key]) for key in DEFAULTS}
+    for key in PHYSICS:
+        params[key] = _number(params[key], key)
+    if params['engine'] not in ballistics.ENGINES:
+        raise ValueError(f"unknown engine {params['engine']!r}")
+    x0, y0 = _number(spec['x0'], 'x0'), _number(spec['y0'], 'y0')
+    if 'tx' in spec:
+        power = _number(spec.get('power', 100), 'power')
+        angles, _ = ballistics.solve_aim(
+            x0, y0, _number(spec['tx'], 'tx'), _number(spec['ty'], 'ty'), power,
+            params['gravity'], params['max_velocity'], params['wind_power'], params['wind_accel'])
+        launches = [(float(a), power) for a in np.ravel(angles) if not math.isnan(a)]
+    else:
+        launches = [(math.radians(_number(spec['angle'], 'angle')), _number(spec['power'], 'power'))]
+    return x0, y0, params, launches
+
+
+def validate(spec, defaults=DEFAULTS):
+    """Error message :func:`solve` would give ``spec``, or None if it can be solved."""
+    try:
+        _shot(spec, {**DEFAULTS, **defaults})
+    except (KeyError, TypeError, ValueError) as e:
+        return f'{type(e).__name__}: {e}'
+    return None
+
+
+def solve(specs, defaults=DEFAULTS, tolerance=0.25, digits=3, points=True, start=0):
+    """Solve a list of specs; returns one result dict per spec.
+
+    All launches of the chunk that share an engine go through a single
+    vectorized batch call. ``start`` is the stream position of
+    ``specs[0]``, used as the id of specs that don't have one.
+    """
+    defaults = {**DEFAULTS, **defaults}
+    results = [None] * len(specs)
+    rows = {engine: [] for engine in ballistics.ENGINES}
+    for i, spec in enumerate(specs):
+        result = {'id': spec.get('id', start + i)} if isinstance(spec, dict) else {'id': start + i}
+        if isinstance(spec, BadRecord):
+            result['error'] = f'line {spec.line}: {spec.error}'
+            results[i] = result
+            continue
+        try:
+            x0, y0, params, launches = _shot(spec, defaults)
+        except (KeyError, TypeError, ValueError) as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+            results[i] = result
+            continue
+        result['solutions'] = []
+        if not launches:
+            result['error'] = 'target out of range'
+        results[i] = result
+        for angle, power in launches:
+            rows[params['engine']].append(
+                (i, (x0, y0, angle, power, *(params[key] for key in PHYSICS))))
+
+    for engine, shots in rows.items():
+        if not shots:
+            continue
+        owners = [i for i, _ in shots]
+        columns = [np.array(c) for c in zip(*(shot for _, shot in shots))]
+        if engine == 'tick':
+            batch = ballistics.tick_trajectories(*columns)
+        else:
+            batch = ballistics.trajectories(*columns, tolerance=tolerance or None)
+        for k, owner in enumerate(owners):
+            trajectory = batch.trajectory(k)
+            solution = {
+                'angle': round(math.degrees(columns[2][k]), 6),
+                'power': round(float(columns[3][k]), 6),
+                'impact': np.round(trajectory[-1], digits).tolist() if len(trajectory) else None,
+                'fuse': np.round(batch.fuse(k), digits).tolist(),
+            }
+            if points:
+                solution['trajectory'] = np.round(trajectory, digits).tolist()
+            results[owner]['solutions'].append(solution)
+    return results
+
+
+def _solve_lines(specs, options, start):
+    return [json.dumps(result, separators=(',', ':')) for result in solve(specs, **options, start=start)]
+
+
+def run(specs, output, options, chunk=CHUNK, workers=0):
+    """Stream ``specs`` through :func:`solve` and write JSON lines to ``output``.
+
+    With ``workers`` > 0 chunks are solved in a process pool; results are
+    still written in input order and at most ``WINDOW_PER_WORKER`` chunks
+    per worker are pending at any time. Returns the number of records.
+    """
+    specs = iter(specs)
+    count = 0
+    if workers <= 0:
+        while True:
+            block = list(islice(specs, chunk))
+            if not block:
+                return count
+            for line in _solve_lines(block, options, count):
+                output.write(line + '\n')
+            count += len(block)
+
+    pending = deque()
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            # 先补满窗口, 再按顺序写出最早提交的块
+            while len(pending) < workers * WINDOW_PER_WORKER:
+                block = list(islice(specs, chunk))
+                if not block:
+                    break
+                pending.append(pool.submit(_solve_lines, block, options, count))
+                count += len(block)
+            if not pending:
+                return count
+            for line in pending.popleft().result():
+                output.write(line + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='*', help='JSONL or CSV files (default: stdin)')
+    parser.add_argument('-o', '--output', help='output JSONL file (default: stdout)')
+    parser.add_argument('--format', choices=('jsonl', 'csv'),
+                        help='input format (default: by file extension, JSONL for stdin)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='worker processes (0 = solve in this process)')
+    parser.add_argument('--chunk', type=int, default=CHUNK, help='specs per batch')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='adaptive sampling tolerance in px (0 = fixed time step)')
+    parser.add_argument('--digits', type=int, default=3, help='decimals in the output coordinates')
+    parser.add_argument('--summary', action='store_true',
+                        help='omit trajectory points, keep impact and fuse markers')
+    for key, value in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                            help=f'default {key} (%(default)s)')
+    args = parser.parse_args(argv)
+
+    options = {
+        'defaults': {key: getattr(args, key) for key in DEFAULTS},
+        'tolerance': args.tolerance,
+        'digits': args.digits,
+        'points': not args.summary,
+    }
+
+    def specs():
+        if not args.inputs:
+            yield from read_specs(sys.stdin, args.format or 'jsonl')
+        for path in args.inputs:
+            fmt = args.format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+            with open(path, encoding='utf-8', newline='') as f:
+                yield from read_specs(f, fmt)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        run(specs(), output, options, args.chunk, args.workers)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
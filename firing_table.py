@@ -0,0 +1,293 @@
+"""Precomputed firing tables, memory-mapped from disk.
+
+For one physics profile (gravity, max_velocity, wind_accel) the landing
+of a shot depends only on its launch angle,
+power and wind notch and on how far below (or above) the shooter it comes
+down. A table stores, for every grid point (wind, power, drop, angle), the
+horizontal distance at which the arc crosses that drop on its way down,
+as float32 (NaN when it never gets there). Shooter position and canvas
+size don't enter, and neither does ticks_per_second (it only scales the
+fuse clock), so one table serves every session with that profile.
+
+The file is a fixed header followed by the raw array:
+
+    8s  magic 'AIMFTAB\\0'    H version    H reserved
+    32s SHA-256 of profile and grid
+    3d  profile               (see ``Profile``)
+    grid                      (see ``Grid`` / ``GRID``)
+    ... zero padding up to ``DATA_OFFSET``, then the float32 array
+
+Opening a table only parses the header and maps the array, so it is
+instant whatever its size; lookups read the few pages they touch.
+``open_table`` names files after the profile hash, so changing any
+constant simply selects (or builds) a different file. Every table is
+about 280 MiB, so only the ``MAX_TABLES`` most recently used ones are
+kept in a directory; older ones are deleted whenever a new one is built.
+
+    python firing_table.py build --gravity 4 --max-velocity 95
+    python firing_table.py info ~/.aimer/tables/<hash>.aimtab
+"""
+import argparse
+import hashlib
+import math
+import os
+import struct
+import sys
+from typing import NamedTuple
+
+import numpy as np
+
+MAGIC = b'AIMFTAB\0'
+VERSION = 2
+HEADER = struct.Struct('<8sHH32s')
+PROFILE = struct.Struct('<3d')
+GRID = struct.Struct('<ddIddIiIddI')
+DATA_OFFSET = 4096  # 数据按页对齐, 头部之后补零
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.aimer', 'tables')
+SUFFIX = '.aimtab'
+MAX_TABLES = 4  # 每张约 280 MiB, 目录里只保留最近用过的这么多张
+
+
+class Profile(NamedTuple):
+    """Physics constants a table is valid for."""
+    gravity: float
+    max_velocity: float
+    wind_accel: float
+
+
+class Grid(NamedTuple):
+    """Sampling of the table axes.
+
+    Angles are radians counter-clockwise from +x, powers percent, winds
+    whole slider notches, drops pixels downwards from the shooter.
+    """
+    angle0: float = -math.pi / 2
+    angle_step: float = math.radians(1.0)
+    angles: int = 361
+    power0: float = 0.0
+    power_step: float = 1.0
+    powers: int = 101
+    wind0: int = -10
+    winds: int = 21
+    drop0: float = -1024.0
+    drop_step: float = 32.0
+    drops: int = 97
+
+    @property
+    def shape(self):
+        return (self.winds, self.powers, self.drops, self.angles)
+
+    def axis(self, name):
+        start, step, count = {
+            'angle': (self.angle0, self.angle_step, self.angles),
+            'power': (self.power0, self.power_step, self.powers),
+            'wind': (self.wind0, 1, self.winds),
+            'drop': (self.drop0, self.drop_step, self.drops),
+        }[name]
+        return start + step * np.arange(count)
+
+
+def digest(profile, grid):
+    """SHA-256 identifying a (profile, grid) pair."""
+    return hashlib.sha256(PROFILE.pack(*map(float, profile)) + GRID.pack(*grid)).digest()
+
+
+def table_path(profile, grid=Grid(), directory=DEFAULT_DIR):
+    return os.path.join(directory, digest(profile, grid).hex()[:16] + SUFFIX)
+
+
+def _landing_dx(profile, wind, power, drop, angle):
+    # 下降段穿过 drop 高度时的水平位移 (闭式解), 到不了为 NaN
+    v0 = profile.max_velocity * power / 100
+    vx, vy = v0 * np.cos(angle), v0 * np.sin(angle)
+    g = profile.gravity
+    dh = -drop  # 向上为正
+    with np.errstate(invalid='ignore', divide='ignore'):
+        disc = vy * vy - 2 * g * dh
+        t = (vy + np.sqrt(disc)) / g
+        t = np.where((disc >= 0) & (t > 0), t, np.nan)
+    return vx * t + 0.5 * wind * profile.wind_accel * t * t
+
+
+def build(path, profile, grid=Grid()):
+    """Compute a table and write it to ``path`` (atomically replaced)."""
+    profile = Profile(*map(float, profile))
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    header = (HEADER.pack(MAGIC, VERSION, 0, digest(profile, grid)) +
+              PROFILE.pack(*profile) + GRID.pack(*grid))
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(header.ljust(DATA_OFFSET, b'\0'))
+    data = np.memmap(temporary, np.float32, 'r+', DATA_OFFSET, grid.shape)
+    power = grid.axis('power')[:, None, None]
+    drop = grid.axis('drop')[None, :, None]
+    angle = grid.axis('angle')[None, None, :]
+    # 逐个风力档位计算, 内存占用只有一个切片
+    for i, wind in enumerate(grid.axis('wind').tolist()):
+        data[i] = _landing_dx(profile, wind, power, drop, angle)
+    data.flush()
+    del data
+    os.replace(temporary, path)
+
+
+class FiringTable:
+    """Read-only memory-mapped table (see the module docstring)."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            head = f.read(HEADER.size + PROFILE.size + GRID.size)
+        if len(head) < HEADER.size + PROFILE.size + GRID.size:
+            raise ValueError(f'{path} is not a firing table')
+        magic, version, _, hash_ = HEADER.unpack_from(head)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a firing table')
+        if version != VERSION:
+            raise ValueError(f'unsupported firing table version {version}')
+        self.path = path
+        self.profile = Profile(*PROFILE.unpack_from(head, HEADER.size))
+        self.grid = Grid(*GRID.unpack_from(head, HEADER.size + PROFILE.size))
+        if hash_ != digest(self.profile, self.grid):
+            raise ValueError(f'{path}: header checksum mismatch')
+        expected = DATA_OFFSET + 4 * int(np.prod(self.grid.shape))
+        if os.path.getsize(path) != expected:
+            raise ValueError(f'{path}: truncated firing table')
+        self.data = np.memmap(path, np.float32, 'r', DATA_OFFSET, self.grid.shape)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def matches(self, gravity, max_velocity, wind_accel):
+        return self.profile == Profile(float(gravity), float(max_velocity), float(wind_accel))
+
+    def _index(self, value, start, step, count):
+        # 连续下标 -> (下界下标, 权重); 超出网格的为 NaN
+        f = (np.asarray(value, dtype=float) - start) / step
+        f = np.where((f >= 0) & (f <= count - 1), f, np.nan)
+        i = np.clip(np.nan_to_num(np.floor(f), nan=0).astype(np.int64), 0, max(count - 2, 0))
+        return i, f - i
+
+    def landing(self, x0, y0, angle, power, wind_power, ground_y):
+        """Landing x of shots that come down at ``ground_y``, NaN off the table."""
+        grid = self.grid
+        axes = (self._index(wind_power, grid.wind0, 1, grid.winds),
+                self._index(power, grid.power0, grid.power_step, grid.powers),
+                self._index(np.asarray(ground_y, dtype=float) - y0,
+                            grid.drop0, grid.drop_step, grid.drops),
+                self._index(np.mod(np.asarray(angle, dtype=float) - grid.angle0, 2 * math.pi) + grid.angle0,
+                            grid.angle0, grid.angle_step, grid.angles))
+        result = 0.0
+        # 16 个角点的多线性插值
+        for corner in range(16):
+            index, weight = [], 1.0
+            for bit, (i, w) in enumerate(axes):
+                up = corner >> bit & 1
+                index.append(i + up)
+                weight = weight * (w if up else 1 - w)
+            # 权重为 0 的角点不参与, 避免网格边缘相邻的 NaN 传进来
+            value = self.data[tuple(np.broadcast_arrays(*index))]
+            result = result + np.where(weight == 0, 0.0, weight * value)
+        return x0 + result
+
+    def aim(self, x0, y0, tx, ty, power, wind_power):
+        """Launch angles that land on (tx, ty) on the way down.
+
+        Interpolates the table row over all angles and returns
+        ``[flat, lob]`` (radians, NaN where missing) like
+        ``ballistics.solve_aim``, but only for hits on the descending
+        branch.
+        """
+        grid = self.grid
+        picks = (self._index(wind_power, grid.wind0, 1, grid.winds),
+                 self._index(power, grid.power0, grid.power_step, grid.powers),
+                 self._index(ty - y0, grid.drop0, grid.drop_step, grid.drops))
+        if any(math.isnan(float(w)) for _, w in picks):
+            return np.full(2, np.nan)
+        row = np.zeros(grid.angles)
+        for corner in range(8):
+            index, weight = [], 1.0
+            for bit, (i, w) in enumerate(picks):
+                up = corner >> bit & 1
+                index.append(int(i) + up)
+                weight *= float(w) if up else 1 - float(w)
+            if weight:
+                row += weight * self.data[tuple(index)]
+        # 角度方向上 dx 与目标差值变号的位置线性插值出发射角
+        miss = row - (tx - x0)
+        crossing = np.flatnonzero(np.sign(miss[:-1]) * np.sign(miss[1:]) < 0)
+        if len(crossing) == 0:
+            return np.full(2, np.nan)
+        f = miss[crossing] / (miss[crossing] - miss[crossing + 1])
+        angles = grid.angle0 + (crossing + f) * grid.angle_step
+        # 朝目标一侧的仰角 (向下为负); 射程最远的仰角以下为平射, 以上为吊射
+        toward = 1.0 if tx >= x0 else -1.0
+        angle_axis = grid.axis('angle')
+        elevation = angles if toward > 0 else math.pi - angles
+        peak = angle_axis[np.nanargmax(row * toward)]
+        peak = peak if toward > 0 else math.pi - peak
+        flat, lob = elevation < peak, elevation >= peak
+        return np.array([angles[flat][elevation[flat].argmin()] if flat.any() else np.nan,
+                         angles[lob][elevation[lob].argmax()] if lob.any() else np.nan])
+
+
+def prune(directory=DEFAULT_DIR, keep=MAX_TABLES):
+    """Delete all but the ``keep`` most recently used tables in ``directory``."""
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(SUFFIX)]
+    except OSError:
+        return
+    paths = sorted((os.path.join(directory, name) for name in names),
+                   key=lambda path: os.path.getmtime(path), reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # 仍被映射 (Windows) 或已被删除, 下次再清理
+
+
+def open_table(profile, grid=Grid(), directory=DEFAULT_DIR, create=True, keep=MAX_TABLES):
+    """Table for ``profile``, building it first when missing or unreadable.
+
+    Opening marks the file as used; building one prunes the directory to
+    the ``keep`` most recently used tables. Returns None when the file is
+    missing and ``create`` is false.
+    """
+    path = table_path(profile, grid, directory)
+    try:
+        table = FiringTable(path)
+        os.utime(path)
+        return table
+    except (OSError, ValueError):
+        if not create:
+            return None
+    build(path, profile, grid)
+    prune(directory, keep)
+    return FiringTable(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or inspect firing tables')
+    sub = parser.add_subparsers(dest='command', required=True)
+    make = sub.add_parser('build', help='build the table for a physics profile')
+    make.add_argument('--gravity', type=float, default=4.0)
+    make.add_argument('--max-velocity', type=float, default=95.0)
+    make.add_argument('--wind-accel', type=float, default=0.49)
+    make.add_argument('--directory', default=DEFAULT_DIR)
+    info = sub.add_parser('info', help='print the header of a table file')
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        profile = Profile(args.gravity, args.max_velocity, args.wind_accel)
+        path = table_path(profile, directory=args.directory)
+        build(path, profile)
+        print(f'{path} ({os.path.getsize(path) / 2 ** 20:.1f} MiB)')
+        return 0
+    table = FiringTable(args.path)
+    print(f'{table.profile}\n{table.grid}\nshape {table.grid.shape}, {table.nbytes / 2 ** 20:.1f} MiB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
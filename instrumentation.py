@@ -0,0 +1,69 @@
+"""Latency and frame-time samples for the canvas performance HUD.
+
+FrameStats is Qt-free: the canvas feeds it timings and reads back rolling
+percentiles. When the HUD is off the canvas holds no FrameStats at all,
+so the instrumentation costs nothing.
+"""
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+SERIES = ('input_latency_ms', 'trajectory_ms', 'paint_ms', 'frame_ms', 'vertices')
+
+
+class FrameStats:
+    """Rolling per-frame samples.
+
+    ``window`` is how many recent samples the percentiles cover and
+    ``history`` how many are kept for :meth:`dump`.
+    """
+
+    def __init__(self, window=240, history=10000):
+        self.window = window
+        self.samples = {name: deque(maxlen=history) for name in SERIES}
+        self.frames = 0
+        self._input_time = None
+        self._last_paint = None
+
+    def mark_input(self):
+        # 记录尚未显示到屏幕上的最早一次输入
+        if self._input_time is None:
+            self._input_time = time.perf_counter()
+
+    def record(self, name, value):
+        self.samples[name].append(value)
+
+    def paint_done(self, started):
+        now = time.perf_counter()
+        self.frames += 1
+        self.record('paint_ms', (now - started) * 1000)
+        if self._last_paint is not None:
+            self.record('frame_ms', (now - self._last_paint) * 1000)
+        self._last_paint = now
+        if self._input_time is not None:
+            self.record('input_latency_ms', (now - self._input_time) * 1000)
+            self._input_time = None
+
+    def percentiles(self, name, qs=(50, 95, 99)):
+        values = list(self.samples[name])[-self.window:]
+        if not values:
+            return {f'p{q}': 0.0 for q in qs}
+        return {f'p{q}': float(v) for q, v in zip(qs, np.percentile(values, qs))}
+
+    def last(self, name):
+        values = self.samples[name]
+        return values[-1] if values else 0
+
+    def summary(self):
+        return {name: dict(self.percentiles(name), last=self.last(name)) for name in SERIES}
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'frames': self.frames,
+                'window': self.window,
+                'summary': self.summary(),
+                'samples': {name: list(values) for name, values in self.samples.items()},
+            }, f, indent=1)
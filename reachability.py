@@ -0,0 +1,203 @@
+"""Reachability heat map over the full angle x power space.
+
+For a fixed shooter position and physics profile every (angle, power)
+shot on a dense grid is simulated and each canvas cell counts how many
+shots pass through it. Shots are computed in vectorized batches; the full
+grid is split by angle into chunks for a process pool. A coarse grid can
+be computed in-process first so something is on screen right away; until
+a chunk of the full grid is in, its angle sector is filled in from the
+coarse grid, scaled to the number of shots it stands for.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ballistics
+
+DEFAULT_ANGLES = 720
+DEFAULT_POWERS = 200
+DEFAULT_CELL = 4  # Heat-map cell size in canvas pixels
+CHUNK_ANGLES = 24  # Angles per process-pool task
+
+_worker_state = {}
+
+
+def shot_grid(angles, powers):
+    """Angles over the full circle and powers in (0, 100]."""
+    return (np.linspace(-math.pi, math.pi, angles, endpoint=False),
+            np.linspace(100 / powers, 100, powers))
+
+
+def densify(points, offsets, step):
+    """Resample every polyline of a batch so consecutive samples are <= step apart.
+
+    Returns ``(samples, shot)`` where ``shot`` is the batch index of each sample.
+    """
+    shots = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    if len(points) == 0:
+        return points, shots
+    # 只对同一发炮弹内的相邻点连线
+    same = shots[1:] == shots[:-1]
+    start, delta = points[:-1][same], np.diff(points, axis=0)[same]
+    owner = shots[:-1][same]
+    pieces = np.maximum(np.ceil(np.hypot(delta[:, 0], delta[:, 1]) / step), 1).astype(np.int64)
+    segment = np.repeat(np.arange(len(start)), pieces)
+    k = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    f = (k / pieces[segment])[:, None]
+    last = offsets[1:][np.diff(offsets) > 0] - 1
+    samples = np.concatenate((start[segment] + delta[segment] * f, points[last]))
+    shot = np.concatenate((owner[segment], shots[last]))
+    order = np.argsort(shot, kind='stable')
+    return samples[order], shot[order]
+
+
+def _reach_keys(x0, y0, angles, powers, gravity, max_velocity, wind_power, wind_accel,
+                width, height, cell, terrain):
+    # 每个 (发射, 格子) 组合一个键 shot * 格子数 + 格子, 排序去重; 发射按角度优先编号
+    rows, cols = -(-int(height) // cell), -(-int(width) // cell)
+    a, p = np.meshgrid(angles, powers, indexing='ij')
+    batch = ballistics.trajectories(x0, y0, a.ravel(), p.ravel(), gravity, max_velocity,
+                                    wind_power, wind_accel, 1.0, width, height,
+                                    tolerance=cell / 4)
+    samples, shot = densify(batch.points, batch.offsets, cell / 2)
+    if terrain is not None and len(samples):
+        # 每发炮弹在第一个实心像素之后的采样点不再计数
+        solid = terrain.is_solid(samples[:, 0], samples[:, 1])
+        index = np.arange(len(shot))
+        first_solid = np.full(len(batch), len(shot))
+        np.minimum.at(first_solid, shot[solid], index[solid])
+        keep = index <= first_solid[shot]
+        samples, shot = samples[keep], shot[keep]
+    cx = np.clip((samples[:, 0] // cell).astype(np.int64), 0, cols - 1)
+    cy = np.clip((samples[:, 1] // cell).astype(np.int64), 0, rows - 1)
+    keys = shot * (rows * cols) + cy * cols + cx
+    # 先去掉相邻重复再排序去重, 相邻采样大多落在同一格 (排序比 np.unique 的哈希快得多)
+    keys = np.sort(keys[np.concatenate(([True], keys[1:] != keys[:-1]))])
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))], (rows, cols)
+
+
+def reach_counts(x0, y0, angles, powers, gravity, max_velocity, wind_power, wind_accel,
+                 width, height, cell=DEFAULT_CELL, terrain=None):
+    """Count, per ``cell`` x ``cell`` block, how many shots of the grid reach it.
+
+    Shots stop at the canvas edges and, with ``terrain``, at the first
+    solid pixel. Each shot counts at most once per cell.
+    """
+    keys, (rows, cols) = _reach_keys(x0, y0, angles, powers, gravity, max_velocity, wind_power,
+                                     wind_accel, width, height, cell, terrain)
+    cells = keys % (rows * cols)
+    return np.bincount(cells, minlength=rows * cols).reshape(rows, cols).astype(np.int32)
+
+
+def _init_worker(params, terrain):
+    _worker_state['params'] = params
+    _worker_state['terrain'] = terrain
+
+
+def _run_chunk(angles, powers):
+    return reach_counts(angles=angles, powers=powers, terrain=_worker_state['terrain'],
+                        **_worker_state['params'])
+
+
+class CoverageJob:
+    """Progressive heat-map computation.
+
+    ``params`` holds x0, y0, gravity, max_velocity, wind_power, wind_accel,
+    width, height and cell. :meth:`coarse` computes a low-resolution grid
+    in-process; :meth:`start` submits the full grid to a process pool and
+    :meth:`poll` folds finished chunks into :attr:`counts`, which keeps the
+    coarse estimate for the sectors still being computed.
+    """
+
+    def __init__(self, params, angles=DEFAULT_ANGLES, powers=DEFAULT_POWERS, terrain=None,
+                 workers=None):
+        self.params = dict(params)
+        self.params.setdefault('cell', DEFAULT_CELL)
+        self.angles, self.powers = shot_grid(angles, powers)
+        self.terrain = terrain
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.counts = None
+        self.shots = 0
+        self._fine = None  # Sum of the finished chunks
+        self._estimate = None  # (sector, cell, weight) of the coarse grid, see coarse()
+        self._pending = np.ones(-(-len(self.angles) // CHUNK_ANGLES), dtype=bool)
+        self.total_shots = angles * powers
+        self._executor = None
+        self._futures = []
+
+    def coarse(self, factor=8):
+        """Low-resolution counts scaled to the full grid; also becomes :attr:`counts`."""
+        angles, powers = shot_grid(max(len(self.angles) // factor, 1),
+                                   max(len(self.powers) // factor, 1))
+        keys, shape = _reach_keys(angles=angles, powers=powers, terrain=self.terrain, **self.params)
+        size = shape[0] * shape[1]
+        # 粗网格的每个角度归入覆盖它的完整网格块, 一发粗网格炮弹代表该块的若干发
+        sector_of_angle = np.searchsorted(self.angles[::CHUNK_ANGLES], angles, side='right') - 1
+        per_sector = np.bincount(sector_of_angle, minlength=len(self._pending)) * len(powers)
+        chunk_shots = np.diff(np.append(np.arange(0, len(self.angles), CHUNK_ANGLES), len(self.angles)))
+        scale = chunk_shots * len(self.powers) / np.maximum(per_sector, 1)
+        sector = sector_of_angle[keys // size // len(powers)]
+        self._estimate = (sector, keys % size, scale[sector], shape)
+        self.counts = self._merge()
+        return self.counts
+
+    def _merge(self):
+        # 已完成的块用精确计数, 其余扇区用粗网格的估计
+        counts = self._fine
+        if self._estimate is not None and self._pending.any():
+            sector, cells, weights, shape = self._estimate
+            keep = self._pending[sector]
+            estimate = np.bincount(cells[keep], weights=weights[keep], minlength=shape[0] * shape[1])
+            estimate = np.rint(estimate).astype(np.int32).reshape(shape)
+            counts = estimate if counts is None else counts + estimate
+        return counts
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.params, self.terrain))
+        self._futures = [
+            (self._executor.submit(_run_chunk, self.angles[i:i + CHUNK_ANGLES], self.powers),
+             len(self.angles[i:i + CHUNK_ANGLES]) * len(self.powers), i // CHUNK_ANGLES)
+            for i in range(0, len(self.angles), CHUNK_ANGLES)
+        ]
+
+    @property
+    def done(self):
+        return not self._futures
+
+    def poll(self):
+        """Merge finished chunks; returns True when :attr:`counts` changed."""
+        finished = [item for item in self._futures if item[0].done()]
+        if not finished:
+            return False
+        self._futures = [item for item in self._futures if not item[0].done()]
+        for future, shots, sector in finished:
+            counts = future.result()
+            self._fine = counts if self._fine is None else self._fine + counts
+            self._pending[sector] = False
+            self.shots += shots
+        self.counts = self._merge()
+        if self.done:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        return True
+
+    def cancel(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._futures = []
+
+
+def heat_image(counts):
+    """RGBA uint8 heat map (log scale, transparent where unreachable)."""
+    level = np.log1p(counts.astype(np.float32))
+    level /= max(float(level.max()), 1e-6)
+    rgba = np.zeros(counts.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = (255 * np.clip(2 * level, 0, 1)).astype(np.uint8)
+    rgba[..., 1] = (255 * np.clip(2 * level - 1, 0, 1)).astype(np.uint8)
+    rgba[..., 2] = (255 * np.clip(1 - 2 * level, 0, 1) * (level > 0)).astype(np.uint8)
+    rgba[..., 3] = np.where(counts > 0, 60 + 120 * level, 0).astype(np.uint8)
+    return rgba
@@ -0,0 +1,221 @@
+"""Closed-form sensitivity of a shot's landing point.
+
+Along the analytic arc (screen coordinates, y down)
+
+    x(t) = x0 + v0 cos(a) t + 1/2 w A t^2
+    y(t) = y0 - v0 sin(a) t + 1/2 g t^2,        v0 = V p / 100
+
+the partial derivatives of the position with respect to the launch angle
+``a``, the power ``p`` and the wind notch ``w`` are closed form as well,
+so the Jacobian costs a few multiplications per shot instead of
+re-simulating perturbed shots (``uncertainty`` samples them instead).
+
+The shot lands where the arc meets the surface through the nominal
+landing point with normal ``n`` (the canvas edge it leaves through, or
+the terrain). Perturbing the parameters by dq moves the arc by J dq at a
+fixed time and the landing time by dt = -n.J dq / n.v, so the landing
+point moves by
+
+    (I - v n^T / n.v) J dq
+
+that is, the position error at impact time slid along the flight
+direction back onto the surface. The error ellipse is the 2-D position
+error at impact time; its shadow on the surface along ``v`` is the
+landing spread.
+
+The angle and power ranges that still land within a radius of the
+nominal landing point use the same closed forms: the landing point on
+the surface is the root of a quadratic in t, so it is scanned coarsely
+for the first miss in each direction and refined with Newton steps on
+its analytic derivative. (The Jacobian alone is not enough there: near
+the maximum-range elevation it predicts a huge tolerance.)
+"""
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+import ballistics
+
+DEFAULT_HIT_RADIUS = 30  # 像素, 大约是一般武器的爆炸半径
+DEFAULT_SIGMAS = (math.radians(0.5), 1.0, 1.0)  # 角度 (弧度), 力度 (%), 风力 (格)
+ELLIPSE_SIGMA = 2.0
+SCAN_STEPS = 32  # Coarse samples per direction bracketing the first miss
+REFINE_STEPS = 4  # Newton steps at most (bisection when a step leaves the bracket)
+REFINE_TOLERANCE = 0.01  # 像素: 边界处落点偏移与 radius 之差
+
+
+class Sensitivity(NamedTuple):
+    """Landing sensitivity of one shot.
+
+    ``jacobian`` is d position / d (angle, power, wind) at the landing
+    time, ``landing_jacobian`` the same for the landing point on the
+    surface; angles are in radians, power in percent, wind in notches.
+    The error ellipse is centred on ``landing`` with semi-axes ``axes``
+    rotated by ``angle`` radians, and ``landing_sigma`` is the matching
+    half-length of the spread along the surface. ``angle_range`` and
+    ``power_range`` land within ``radius`` of the nominal landing point.
+    """
+    landing: np.ndarray
+    time: float
+    jacobian: np.ndarray
+    landing_jacobian: np.ndarray
+    axes: np.ndarray
+    angle: float
+    landing_sigma: float
+    radius: float
+    angle_range: tuple
+    power_range: tuple
+
+
+def jacobian(angle, power, max_velocity, wind_accel, t):
+    """d position / d (angle, power, wind) at time ``t``, as a (2, 3) array."""
+    rate = max_velocity / 100
+    c, s = math.cos(angle), math.sin(angle)
+    return np.array([[-rate * power * s * t, rate * c * t, 0.5 * wind_accel * t * t],
+                     [-rate * power * c * t, -rate * s * t, 0.0]])
+
+
+def landing_jacobian(jacobian, velocity, normal):
+    """Project a fixed-time Jacobian onto the surface along the flight direction.
+
+    Returns None where the arc only grazes the surface.
+    """
+    along = float(velocity @ normal)
+    if abs(along) < 1e-9:
+        return None
+    return jacobian - np.outer(velocity, normal @ jacobian) / along
+
+
+def edge_normal(x, y, width, height):
+    """Inward normal of the canvas edge (left, right or bottom) nearest to (x, y)."""
+    edges = ((x, (1.0, 0.0)), (width - x, (-1.0, 0.0)), (height - y, (0.0, -1.0)))
+    return np.array(min(edges, key=lambda edge: abs(edge[0]))[1])
+
+
+def canvas_landing(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+                   width=ballistics.DEFAULT_CANVAS_SIZE, height=ballistics.DEFAULT_CANVAS_SIZE):
+    """(time, normal) where the arc leaves the canvas, or None if it never does."""
+    v0x, v0y = (float(v) for v in ballistics.launch_velocity(angle, power, max_velocity))
+    wind_ax = wind_power * wind_accel
+    t = float(ballistics.exit_times(x0, y0, v0x, v0y, wind_ax, gravity, width, height))
+    if not math.isfinite(t):
+        return None
+    x = x0 + v0x * t + 0.5 * wind_ax * t * t
+    y = y0 - (v0y * t - 0.5 * gravity * t * t)
+    return t, edge_normal(x, y, width, height)
+
+
+def _surface_offset(x0, y0, gravity, max_velocity, wind_ax, point, normal, branch, angle, power,
+                    by_angle):
+    # 沿表面 (切向) 测得的落点偏移及其对角度 (by_angle) 或力度的导数, 闭式解;
+    # 到不了表面时为 None
+    rate = max_velocity / 100
+    nx, ny = normal
+    px, py = point
+    c, s = math.cos(angle), math.sin(angle)
+    ux, uy = rate * power * c, -rate * power * s
+    qa = 0.5 * (nx * wind_ax + ny * gravity)
+    qb = nx * ux + ny * uy
+    qc = nx * (x0 - px) + ny * (y0 - py)
+    # 与标称落点同一支的根: 该根处 n.v 的符号与 branch 相同
+    if abs(qa) < 1e-12:
+        if qb == 0:
+            return None
+        t = -qc / qb
+    else:
+        disc = qb * qb - 4 * qa * qc
+        if disc < 0:
+            return None
+        t = (-qb + branch * math.sqrt(disc)) / (2 * qa)
+    vx, vy = ux + wind_ax * t, uy + gravity * t
+    along = nx * vx + ny * vy
+    if t <= 0 or abs(along) < 1e-9:
+        return None
+    jx, jy = ((-power * s, -power * c) if by_angle else (c, -s))
+    jx, jy = jx * rate * t, jy * rate * t
+    dt = (nx * jx + ny * jy) / along
+    offset = nx * (y0 + (uy + 0.5 * gravity * t) * t - py) - ny * (x0 + (ux + 0.5 * wind_ax * t) * t - px)
+    return offset, nx * (jy - vy * dt) - ny * (jx - vx * dt)
+
+
+def _tolerance(miss, limit, radius):
+    # 从标称值出发, 偏离多远落点偏移才达到 radius: 先按 limit / SCAN_STEPS 向外走到
+    # 第一次偏出, 再在该区间内割线插值并做牛顿修正 (步长出界时二分). 整个区间都命中时为 limit
+    lo, g_lo, hi, g_hi = 0.0, -radius, None, None
+    for i in range(1, SCAN_STEPS + 1):
+        x = limit * i / SCAN_STEPS
+        result = miss(x)
+        if result is None or result[0] >= 0:
+            hi, g_hi = x, (result[0] if result else None)
+            break
+        lo, g_lo = x, result[0]
+    if hi is None:
+        return limit
+    x = lo - g_lo * (hi - lo) / (g_hi - g_lo) if g_hi is not None else 0.5 * (lo + hi)
+    for _ in range(REFINE_STEPS):
+        result = miss(x)
+        if result is None:
+            hi = x
+            x = 0.5 * (lo + hi)
+            continue
+        g, slope = result
+        if abs(g) < REFINE_TOLERANCE:
+            break
+        if g < 0:
+            lo = x
+        else:
+            hi = x
+        step = x - g / slope if slope else lo
+        x = step if lo < step < hi else 0.5 * (lo + hi)
+    return x
+
+
+def analyze(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel, t, normal,
+            radius=DEFAULT_HIT_RADIUS, sigmas=DEFAULT_SIGMAS, ellipse_sigma=ELLIPSE_SIGMA):
+    """Sensitivity of a shot that lands at time ``t`` on a surface with ``normal``.
+
+    ``sigmas`` are the standard deviations of (angle, power, wind) the
+    ellipse and ``landing_sigma`` are computed for. Returns a
+    :class:`Sensitivity`, or None when the arc grazes the surface.
+    """
+    angle, power, t = float(angle), float(power), float(t)
+    normal = np.asarray(normal, dtype=float)
+    wind_ax = wind_power * wind_accel
+    v0x, v0y = (float(v) for v in ballistics.launch_velocity(angle, power, max_velocity))
+    velocity = np.array([v0x + wind_ax * t, -(v0y - gravity * t)])
+    fixed = jacobian(angle, power, max_velocity, wind_accel, t)
+    projected = landing_jacobian(fixed, velocity, normal)
+    if projected is None:
+        return None
+    point = (x0 + v0x * t + 0.5 * wind_ax * t * t, y0 - (v0y * t - 0.5 * gravity * t * t))
+
+    # 线性化的位置协方差 J S J^T (2x2 对称) 的闭式特征分解: 半轴为 ellipse_sigma 倍标准差
+    scaled = fixed * sigmas
+    (a, b), (_, d) = (scaled @ scaled.T).tolist()
+    mean, spread = 0.5 * (a + d), math.hypot(0.5 * (a - d), b)
+    axes = ellipse_sigma * np.sqrt(np.maximum([mean + spread, mean - spread], 0.0))
+    # 表面上的落点只沿一条线移动, 各参数合成一个标准差
+    landing_sigma = ellipse_sigma * float(np.linalg.norm(projected * sigmas))
+
+    # 角度/力度各自向两侧求容许偏差, 其余参数保持标称值
+    surface = (x0, y0, gravity, max_velocity, wind_ax, point, normal.tolist(),
+               1.0 if float(velocity @ normal) >= 0 else -1.0)
+    ranges = []
+    for by_angle, value, low, high in ((True, angle, angle - math.pi / 2, angle + math.pi / 2),
+                                       (False, power, 0.0, 100.0)):
+        reach = []
+        for direction, limit in ((-1.0, value - low), (1.0, high - value)):
+            def miss(delta, direction=direction):
+                q = value + direction * delta
+                result = _surface_offset(*surface, q if by_angle else angle,
+                                         power if by_angle else q, by_angle)
+                if result is None:
+                    return None
+                offset, slope = result
+                return abs(offset) - radius, direction * math.copysign(1.0, offset) * slope
+
+            reach.append(value + direction * _tolerance(miss, limit, radius))
+        ranges.append(tuple(reach))
+    return Sensitivity(np.array(point), t, fixed, projected, axes, 0.5 * math.atan2(2 * b, a - d),
+                       landing_sigma, float(radius), *ranges)
@@ -0,0 +1,415 @@
+"""Local solver service: trajectories and inverse aim over a socket.
+
+Overlay tools and scripts send newline-delimited JSON requests over
+localhost TCP (or a Unix socket) and get one JSON line back per request,
+tagged with the request ``id``:
+
+    {"id": 1, "x0": 100, "y0": 900, "angle": 45, "power": 80}
+    {"id": 2, "x0": 100, "y0": 900, "tx": 1500, "ty": 1200, "points": false}
+    {"op": "metrics"}
+
+Shot specs are the ones ``cli.py`` reads; fields that are left out come
+from the service defaults (the live parameters when it runs inside the
+aimer). ``deadline_ms`` bounds how long a request may wait; ``points``
+false drops the trajectory and keeps the impact and fuse markers.
+Requests that fail validation are answered with an ``error`` right away
+and never join a batch.
+
+Requests from all connections go into one queue. A single batcher takes
+everything that arrives within ``window`` seconds of the first request
+(up to ``max_batch``), drops requests whose deadline has passed and
+solves the rest in one vectorized ``cli.solve`` call on a worker thread.
+While a batch is being solved new requests queue up, so under load the
+batches grow by themselves.
+
+    python service.py serve --port 8765
+    python service.py metrics --port 8765
+"""
+import argparse
+import asyncio
+import json
+import math
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import cli
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+BATCH_WINDOW = 0.002  # 第一条请求到达后等待更多请求的时间 (秒)
+MAX_BATCH = 4096
+DEFAULT_DEADLINE = 1.0
+LATENCY_SAMPLES = 4096  # 延迟分位数按最近这么多条请求计算
+
+
+class Metrics:
+    """Counters and a sliding window of request latencies."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.solved = 0
+        self.expired = 0
+        self.errors = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self, queue_depth, in_flight):
+        latencies = np.array(self.latencies) * 1000
+        percentiles = (np.percentile(latencies, (50, 95, 99)).round(3).tolist()
+                       if len(latencies) else [None] * 3)
+        return {
+            'uptime_s': round(time.perf_counter() - self.started, 3),
+            'queue_depth': queue_depth,
+            'in_flight': in_flight,
+            'requests': self.requests,
+            'solved': self.solved,
+            'expired': self.expired,
+            'errors': self.errors,
+            'batches': self.batches,
+            'mean_batch': round(self.solved / self.batches, 2) if self.batches else 0.0,
+            'latency_ms': dict(zip(('p50', 'p95', 'p99'), percentiles),
+                               max=round(float(latencies.max()), 3) if len(latencies) else None),
+        }
+
+
+class SolverService:
+    """Request queue plus batcher; owns no sockets (see :func:`serve`).
+
+    ``defaults`` may be replaced at any time (e.g. from the Qt thread); each
+    batch uses the dict that is current when it starts.
+    """
+
+    def __init__(self, defaults=None, window=BATCH_WINDOW, max_batch=MAX_BATCH,
+                 deadline=DEFAULT_DEADLINE, tolerance=0.25, digits=3):
+        self.defaults = {**cli.DEFAULTS, **(defaults or {})}
+        self.window = window
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self.tolerance = tolerance
+        self.digits = digits
+        self.metrics = Metrics()
+        self.in_flight = 0
+        self.connections = set()  # Tasks serving the open connections
+        self._queue = None
+        self._batcher = None
+
+    def start(self):
+        """Start the batcher on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._run())
+
+    async def close_connections(self):
+        """Cancel the open connections and wait until their sockets are closed."""
+        connections = list(self.connections)
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+    def snapshot(self):
+        return self.metrics.snapshot(self._queue.qsize() if self._queue else 0, self.in_flight)
+
+    async def solve(self, spec, deadline=None, points=True):
+        """Result dict for one shot spec, as ``cli.solve`` returns it."""
+        loop = asyncio.get_running_loop()
+        deadline = self.deadline if deadline is None else deadline
+        self.metrics.requests += 1
+        # 不合法的请求直接回复错误, 不进入批次, 以免连累同批的其他请求
+        error = cli.validate(spec, self.defaults)
+        if error is not None:
+            self.metrics.errors += 1
+            return {'id': spec.get('id'), 'error': error}
+        future = loop.create_future()
+        start = time.perf_counter()
+        due = loop.time() + deadline
+        await self._queue.put((spec, points, due, future))
+        try:
+            return await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            self.metrics.expired += 1
+            return {'id': spec.get('id'), 'error': 'deadline exceeded'}
+        finally:
+            self.metrics.latencies.append(time.perf_counter() - start)
+
+    async def _collect(self):
+        # 阻塞等到第一条请求, 然后在窗口期内尽量多收
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        end = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _solve_batch(self, specs, defaults):
+        try:
+            return cli.solve(specs, defaults, self.tolerance, self.digits)
+        except Exception:  # noqa: BLE001 - 校验漏掉的个别坏请求: 逐条重算, 只有它报错
+            results = []
+            for spec in specs:
+                try:
+                    results += cli.solve([spec], defaults, self.tolerance, self.digits)
+                except Exception as e:  # noqa: BLE001
+                    results.append({'id': spec.get('id'), 'error': f'{type(e).__name__}: {e}'})
+            return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            now = loop.time()
+            # 已超时 (等待方已取消) 或截止时间已过的请求不再计算
+            live = [item for item in batch if not item[3].done() and item[2] > now]
+            if not live:
+                continue
+            self.in_flight = len(live)
+            try:
+                results = await loop.run_in_executor(
+                    None, self._solve_batch, [item[0] for item in live], self.defaults)
+            except Exception as e:  # noqa: BLE001 - 整批失败时逐条报告, 服务继续运行
+                results = [{'id': item[0].get('id'), 'error': f'{type(e).__name__}: {e}'}
+                           for item in live]
+            finally:
+                self.in_flight = 0
+            self.metrics.batches += 1
+            for (spec, points, _, future), result in zip(live, results):
+                if not points:
+                    for solution in result.get('solutions', ()):
+                        solution.pop('trajectory', None)
+                if 'error' in result:
+                    self.metrics.errors += 1
+                else:
+                    self.metrics.solved += 1
+                if not future.done():
+                    future.set_result(result)
+
+    async def handle(self, request):
+        """Response dict for one decoded request."""
+        op = request.pop('op', 'solve')
+        if op == 'metrics':
+            return self.snapshot()
+        if op == 'defaults':
+            return dict(self.defaults)
+        if op != 'solve':
+            return {'id': request.get('id'), 'error': f'unknown op {op!r}'}
+        deadline = request.pop('deadline_ms', None)
+        points = bool(request.pop('points', True))
+        if deadline is not None:
+            try:
+                deadline = float(deadline) / 1000
+            except (TypeError, ValueError):
+                deadline = math.nan
+            if not 0 < deadline < math.inf:
+                self.metrics.requests += 1
+                self.metrics.errors += 1
+                return {'id': request.get('id'), 'error': 'deadline_ms must be a positive number'}
+        return await self.solve(request, deadline, points)
+
+
+async def _connection(service, reader, writer):
+    pending = set()
+    sequence = 0
+    service.connections.add(asyncio.current_task())
+
+    async def respond(request):
+        try:
+            response = await service.handle(request)
+        except Exception as e:  # noqa: BLE001 - 每个请求都要有回复
+            response = {'id': request.get('id'), 'error': f'{type(e).__name__}: {e}'}
+        writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+        await writer.drain()
+
+    try:
+        # 每行一个请求, 并发处理, 这样同一连接上流水线发出的请求也能合并成批
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('request must be a JSON object')
+            except ValueError as e:
+                writer.write(json.dumps({'error': f'bad request: {e}'}).encode() + b'\n')
+                continue
+            request.setdefault('id', sequence)
+            sequence += 1
+            task = asyncio.ensure_future(respond(request))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    except (ConnectionError, asyncio.CancelledError):
+        # 对端断开, 或服务停止时被 close_connections 取消
+        pass
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        writer.close()
+        service.connections.discard(asyncio.current_task())
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+    """Start ``service`` and listen on ``path`` (Unix socket) or ``host:port``.
+
+    Returns the asyncio server; the caller keeps the loop running.
+    """
+    def handler(reader, writer):
+        return _connection(service, reader, writer)
+
+    if path:
+        server = await asyncio.start_unix_server(handler, path)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    service.start()
+    return server
+
+
+class ServiceThread(threading.Thread):
+    """Runs the service on its own event loop, e.g. next to the Qt UI."""
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        super().__init__(name='solver-service', daemon=True)
+        self.service = service
+        self.address = path or f'{host}:{port}'
+        self._listen = (host, port, path)
+        self._ready = threading.Event()
+        self._loop = None
+        self._server = None
+        self.error = None
+
+    def run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(serve(self.service, *self._listen))
+        except OSError as e:
+            self.error = e
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            # 让已接受的连接先建立好, 再停止监听; 然后取消仍打开的连接并等它们关闭 writer,
+            # 最后才关事件循环
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._server.close()
+            self._loop.run_until_complete(self.service.close_connections())
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.run_until_complete(self.service.stop())
+            self._loop.close()
+
+    def start(self):
+        """Start listening; raises the OSError if the address is taken."""
+        super().start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self.join()
+
+
+class Client:
+    """Blocking client for scripts: one request at a time over one connection."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, timeout=5.0):
+        if path:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port), timeout)
+        self._file = self._socket.makefile('rwb')
+
+    def request(self, **request):
+        self._file.write(json.dumps(request).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('service closed the connection')
+        return json.loads(line)
+
+    def metrics(self):
+        return self.request(op='metrics')
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local trajectory / aim solver service')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('serve', help='run the service')
+    query = sub.add_parser('metrics', help='print the metrics of a running service')
+    for p in (run, query):
+        p.add_argument('--host', default=DEFAULT_HOST)
+        p.add_argument('--port', type=int, default=DEFAULT_PORT)
+        p.add_argument('--unix', help='Unix socket path instead of TCP')
+    run.add_argument('--window-ms', type=float, default=BATCH_WINDOW * 1000,
+                     help='batching window after the first queued request')
+    run.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    run.add_argument('--deadline-ms', type=float, default=DEFAULT_DEADLINE * 1000,
+                     help='default per-request deadline')
+    run.add_argument('--tolerance', type=float, default=0.25,
+                     help='adaptive sampling tolerance in px (0 = fixed time step)')
+    for key, value in cli.DEFAULTS.items():
+        run.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                         help=f'default {key} (%(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'metrics':
+        client = Client(args.host, args.port, args.unix)
+        print(json.dumps(client.metrics(), indent=2))
+        client.close()
+        return 0
+
+    service = SolverService({key: getattr(args, key) for key in cli.DEFAULTS},
+                            args.window_ms / 1000, args.max_batch, args.deadline_ms / 1000,
+                            args.tolerance)
+
+    async def run_forever():
+        server = await serve(service, args.host, args.port, args.unix)
+        print(f'listening on {args.unix or f"{args.host}:{args.port}"}', flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Binary session recorder and deterministic replay.
+
+A session log is a short header followed by fixed-size little-endian
+records, appended as the canvas receives them:
+
+    uint64  microseconds since recording started
+    uint8   record kind (PRESS, MOVE, RELEASE, PARAMS, RESIZE, ...)
+    7 bytes padding
+    6 x float64 payload
+
+Mouse records carry (x, y, button, buttons, modifiers); PARAMS carries the six
+values passed to ``TransparentCanvas.set_parameters`` and RESIZE the
+canvas size. Every canvas mode that changes what input does or what gets
+computed has its own record, written when it changes and once when
+recording starts:
+
+    AIM_MODE, CALIBRATION   enabled (0/1)
+    ENGINE                  index into ``ballistics.ENGINES``
+    FAN_MODE                index into ``FAN_MODES``
+    GRENADE                 fuse seconds (0 = off), restitution
+    HIT_RADIUS              radius in px (0 = off)
+    TERRAIN                 height, width, byte count (0 x 0 = no terrain)
+
+A TERRAIN record is followed by DATA records whose payload bytes hold the
+mask's bit-packed rows, so every record keeps the same size and logs
+still load straight into a NumPy structured array. The file is flushed
+on every record except mouse moves, and on those at least every
+``FLUSH_INTERVAL`` seconds, so a crash loses little.
+
+Replaying a log feeds the records back through the canvas' event
+handlers and ``AimerTool.update_parameters``, either as fast as possible
+(every record is recomputed, so the output is deterministic) or in real
+time. From the command line:
+
+    python session.py replay match.aimlog --dump out.jsonl
+    python session.py replay match.aimlog --expect out.jsonl
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+import ballistics
+
+MAGIC = b'AIMLOG'
+VERSION = 2
+READABLE_VERSIONS = (1, 2)  # Version 1 logs have no mode records
+HEADER = struct.Struct('<6sH')
+RECORD = struct.Struct('<QB7x6d')
+RECORD_DTYPE = np.dtype([('time_us', '<u8'), ('kind', 'u1'), ('pad', 'V7'), ('values', '<f8', 6)])
+
+PRESS, MOVE, RELEASE, PARAMS, RESIZE = range(1, 6)
+AIM_MODE, CALIBRATION, ENGINE, FAN_MODE, GRENADE, HIT_RADIUS, TERRAIN, DATA = range(6, 14)
+KIND_NAMES = {PRESS: 'press', MOVE: 'move', RELEASE: 'release', PARAMS: 'params', RESIZE: 'resize',
+              AIM_MODE: 'aim_mode', CALIBRATION: 'calibration', ENGINE: 'engine',
+              FAN_MODE: 'fan_mode', GRENADE: 'grenade', HIT_RADIUS: 'hit_radius',
+              TERRAIN: 'terrain', DATA: 'data'}
+KINDS = {name: kind for kind, name in KIND_NAMES.items()}
+PARAMETER_NAMES = ('max_radius', 'gravity', 'max_velocity', 'ticks_per_second', 'wind_power', 'wind_accel')
+FAN_MODES = (None, 'power', 'angle')
+DATA_BYTES = 48  # Payload bytes per DATA record
+FLUSH_INTERVAL = 0.5
+
+
+class SessionRecorder:
+    """Writer for a new session log; an existing file at ``path`` is replaced."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._start = time.perf_counter()
+        self._flushed = self._start
+        self.records = 0
+
+    def record(self, kind, *values):
+        now = time.perf_counter()
+        elapsed = int((now - self._start) * 1e6)
+        self._file.write(RECORD.pack(elapsed, kind, *values, *(0.0,) * (6 - len(values))))
+        self.records += 1
+        if kind != MOVE or now - self._flushed >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._flushed = now
+
+    def terrain(self, mask):
+        """TERRAIN record for a ``TerrainMask`` (or None), followed by its bits."""
+        if mask is None:
+            self.record(TERRAIN, 0, 0, 0)
+            return
+        data = mask.bits.tobytes()
+        elapsed = int((time.perf_counter() - self._start) * 1e6)
+        padded = data.ljust(-(-len(data) // DATA_BYTES) * DATA_BYTES, b'\0')
+        self._file.write(RECORD.pack(elapsed, TERRAIN, mask.height, mask.width, len(data), 0, 0, 0))
+        for i in range(0, len(padded), DATA_BYTES):
+            self._file.write(RECORD.pack(elapsed, DATA, *struct.unpack('<6d', padded[i:i + DATA_BYTES])))
+        self.records += 1 + len(padded) // DATA_BYTES
+        self._file.flush()
+        self._flushed = time.perf_counter()
+
+    def mouse(self, kind, event):
+        pos = event.pos()
+        self.record(kind, pos.x(), pos.y(), int(event.button()), int(event.buttons()),
+                    int(event.modifiers()))
+
+    def close(self):
+        self._file.close()
+
+
+def read_session(path):
+    """Records of a log as a structured array (see ``RECORD_DTYPE``)."""
+    with open(path, 'rb') as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a session log')
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f'unsupported session log version {version}')
+        data = f.read()
+    # 录制中途退出时末尾可能有半条记录, 丢弃
+    usable = len(data) - len(data) % RECORD.size
+    return np.frombuffer(data[:usable], dtype=RECORD_DTYPE)
+
+
+def _terrain(record, following):
+    # TERRAIN 记录及其后的 DATA 记录 -> TerrainMask (或 None)
+    from terrain import TerrainMask
+
+    rows, cols, nbytes = (int(v) for v in record['values'][:3].tolist())
+    if rows == 0:
+        return None
+    data = following[:-(-nbytes // DATA_BYTES)]['values'].tobytes()[:nbytes]
+    bits = np.frombuffer(data, np.uint8).reshape(rows, -1)
+    return TerrainMask(np.unpackbits(bits, axis=1, count=cols).astype(bool))
+
+
+def _apply(record, canvas, tool, following=()):
+    from PyQt5.QtCore import QEvent, QPointF, Qt
+    from PyQt5.QtGui import QMouseEvent
+
+    kind = int(record['kind'])
+    values = record['values'].tolist()
+    if kind in (PRESS, MOVE, RELEASE):
+        event_type = {PRESS: QEvent.MouseButtonPress, MOVE: QEvent.MouseMove,
+                      RELEASE: QEvent.MouseButtonRelease}[kind]
+        event = QMouseEvent(event_type, QPointF(values[0], values[1]), Qt.MouseButton(int(values[2])),
+                            Qt.MouseButtons(int(values[3])), Qt.KeyboardModifiers(int(values[4])))
+        {PRESS: canvas.mousePressEvent, MOVE: canvas.mouseMoveEvent,
+         RELEASE: canvas.mouseReleaseEvent}[kind](event)
+    elif kind == PARAMS:
+        if tool is None:
+            canvas.set_parameters(*values)
+            return
+        # 先不触发信号地写入全部控件, 再统一调用一次 update_parameters
+        widgets = (tool.radius_spin, tool.gravity_spin, tool.velocity_spin,
+                   tool.tick_spin, tool.wind_slider, tool.wind_accel_spin)
+        for widget, value in zip(widgets, values):
+            widget.blockSignals(True)
+            widget.setValue(type(widget.value())(value))
+            widget.blockSignals(False)
+        tool.update_wind_label()
+        tool.update_parameters()
+    elif kind == RESIZE:
+        canvas.resize(int(values[0]), int(values[1]))
+    # 模式直接设到画布上 (回放时控件不跟着变)
+    elif kind == AIM_MODE:
+        canvas.set_aim_mode(bool(values[0]))
+    elif kind == CALIBRATION:
+        canvas.set_calibration_mode(bool(values[0]))
+    elif kind == ENGINE:
+        canvas.set_engine(ballistics.ENGINES[int(values[0])])
+    elif kind == FAN_MODE:
+        canvas.set_fan_mode(FAN_MODES[int(values[0])])
+    elif kind == GRENADE:
+        canvas.set_grenade(values[0] or None, values[1])
+    elif kind == HIT_RADIUS:
+        canvas.set_hit_radius(values[0] or None)
+    elif kind == TERRAIN:
+        canvas.set_terrain(_terrain(record, following))
+
+
+def replay(records, canvas, tool=None, realtime=False, app=None, on_record=None):
+    """Feed ``records`` back through ``canvas`` (and ``tool`` for parameters).
+
+    As fast as possible, every record is recomputed before the next one, so
+    the canvas state after each record is reproducible. With ``realtime``
+    the original timing is kept and Qt events (``app``) are processed
+    between records, so coalescing matches a live session.
+    ``on_record(index, record)`` is called after each record.
+    """
+    start = time.perf_counter()
+    for index, record in enumerate(records):
+        if realtime:
+            due = start + record['time_us'] / 1e6
+            while time.perf_counter() < due:
+                if app is not None:
+                    app.processEvents()
+                time.sleep(min(0.001, max(due - time.perf_counter(), 0)))
+        _apply(record, canvas, tool, records[index + 1:])
+        if realtime:
+            if app is not None:
+                app.processEvents()
+        else:
+            canvas.scheduler.flush()
+        if on_record is not None:
+            on_record(index, record)
+
+
+def canvas_output(canvas):
+    """The computed output of the canvas, as compared between replays."""
+    impact = canvas.impact_point
+    return {
+        'trajectory': canvas.trajectory_points.tolist(),
+        'fuse': canvas.time_points.tolist(),
+        'impact': [impact.x(), impact.y()] if impact else None,
+        'aim': [[angle, power] for angle, power, _ in canvas.aim_solutions],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded aimer session')
+    sub = parser.add_subparsers(dest='command', required=True)
+    play = sub.add_parser('replay', help='feed a session log back through the canvas')
+    play.add_argument('log')
+    play.add_argument('--realtime', action='store_true', help='keep the recorded timing')
+    play.add_argument('--dump', help='write the canvas output after every record (JSON lines)')
+    play.add_argument('--expect', help='compare against a previous --dump, exit 1 on the first mismatch')
+    info = sub.add_parser('info', help='print a summary of a session log')
+    info.add_argument('log')
+    args = parser.parse_args(argv)
+
+    records = read_session(args.log)
+    if args.command == 'info':
+        kinds, counts = np.unique(records['kind'], return_counts=True)
+        duration = records['time_us'][-1] / 1e6 if len(records) else 0.0
+        print(f'{len(records)} records, {duration:.1f} s')
+        for kind, count in zip(kinds, counts):
+            print(f'  {KIND_NAMES.get(int(kind), kind):>8}: {count}')
+        return 0
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+
+    import aimer
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    tool = aimer.AimerTool(restore_settings=False)  # 上次保存的参数会影响回放结果
+    tool.show()
+    app.processEvents()
+    canvas = tool.canvas
+
+    dump = open(args.dump, 'w', encoding='utf-8') if args.dump else None
+    expected = open(args.expect, encoding='utf-8') if args.expect else None
+    mismatch = []
+
+    def on_record(index, record):
+        if dump is None and expected is None:
+            return
+        line = json.dumps(canvas_output(canvas))
+        if dump is not None:
+            dump.write(line + '\n')
+        if expected is not None and not mismatch and expected.readline().rstrip('\n') != line:
+            mismatch.append(index)
+
+    started = time.perf_counter()
+    replay(records, canvas, tool, args.realtime, app, on_record)
+    elapsed = time.perf_counter() - started
+    for f in (dump, expected):
+        if f is not None:
+            f.close()
+    print(f'replayed {len(records)} records in {elapsed * 1000:.1f} ms '
+          f'({canvas.scheduler.runs} recomputes, {canvas.repaint_frames} paints)')
+    if mismatch:
+        print(f'output differs from {args.expect} at record {mismatch[0]}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
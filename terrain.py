@@ -0,0 +1,111 @@
+"""Terrain collision against a bitmap mask.
+
+The mask is preprocessed once into a bit-packed pixel array plus a coarse
+block-occupancy grid, dilated by one block. A polyline piece no longer
+than one block can only touch solid pixels if the dilated block under its
+start point is occupied. Queries therefore step over empty space a block
+at a time and only test individual pixels near terrain.
+"""
+import numpy as np
+
+DEFAULT_BLOCK = 16
+
+
+class TerrainMask:
+    """Solid/empty mask in canvas pixel coordinates (y down)."""
+
+    def __init__(self, solid, block=DEFAULT_BLOCK):
+        solid = np.asarray(solid, dtype=bool)
+        self.height, self.width = solid.shape
+        self.block = block
+        self.bits = np.packbits(solid, axis=1)
+
+        # 粗粒度占用网格: 每个 block x block 区域是否含有实心像素
+        rows = -(-self.height // block)
+        cols = -(-self.width // block)
+        padded = np.zeros((rows * block, cols * block), dtype=bool)
+        padded[:self.height, :self.width] = solid
+        occupied = padded.reshape(rows, block, cols, block).any(axis=(1, 3))
+        # 向 8 邻域膨胀一格, 使长度不超过一个 block 的线段只需检查起点所在格
+        grown = np.pad(occupied, 1)
+        self.coarse = np.zeros_like(occupied)
+        for dy in range(3):
+            for dx in range(3):
+                self.coarse |= grown[dy:dy + rows, dx:dx + cols]
+        self.occupied = occupied
+
+    @classmethod
+    def from_rgba(cls, rgba, threshold=128, block=DEFAULT_BLOCK):
+        """Build from an (H, W, 4) uint8 image; opaque pixels are solid."""
+        return cls(np.asarray(rgba)[..., 3] >= threshold, block)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes + self.coarse.nbytes + self.occupied.nbytes
+
+    def is_solid(self, x, y):
+        """Vectorized pixel test; points outside the mask are empty."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        # 画布内坐标非负, 截断即向下取整; 画布外的点置 0 后由 inside 排除
+        xi = x.astype(np.int64)
+        yi = y.astype(np.int64)
+        xi *= inside
+        yi *= inside
+        byte = self.bits[yi, xi >> 3]
+        return inside & ((byte << (xi & 7).astype(np.uint8)) & 0x80 != 0)
+
+    def _near_terrain(self, x, y):
+        bx = np.floor(np.asarray(x) / self.block).astype(np.int64)
+        by = np.floor(np.asarray(y) / self.block).astype(np.int64)
+        rows, cols = self.coarse.shape
+        inside = (bx >= 0) & (bx < cols) & (by >= 0) & (by < rows)
+        return inside & self.coarse[np.where(inside, by, 0), np.where(inside, bx, 0)]
+
+    def first_hit(self, points, step=0.5):
+        """First solid point along a polyline.
+
+        Returns ``(segment, position)`` where ``segment`` is the index of the
+        polyline segment containing the hit (``points[segment]`` to
+        ``points[segment + 1]``) and ``position`` the (x, y) hit point, or
+        None when the polyline stays in empty space.
+        """
+        points = np.asarray(points, dtype=float)
+        if len(points) == 0:
+            return None
+        if self.is_solid(points[0, 0], points[0, 1]):
+            return 0, points[0].copy()
+        if len(points) < 2:
+            return None
+        start, delta = points[:-1], np.diff(points, axis=0)
+        length = np.hypot(delta[:, 0], delta[:, 1])
+
+        # 先按 block 长度切分, 只保留起点附近有地形的小段
+        pieces = np.maximum(np.ceil(length / self.block), 1).astype(np.int64)
+        segment = np.repeat(np.arange(len(start)), pieces)
+        offsets = np.concatenate(([0], np.cumsum(pieces)))
+        k = np.arange(offsets[-1]) - offsets[segment]
+        f0 = k / pieces[segment]
+        px = start[segment, 0] + delta[segment, 0] * f0
+        py = start[segment, 1] + delta[segment, 1] * f0
+        candidate = np.flatnonzero(self._near_terrain(px, py))
+        if len(candidate) == 0:
+            return None
+
+        # 候选小段内按 step 像素逐点检测, 取沿折线的第一个实心点
+        seg = segment[candidate]
+        piece_len = length[seg] / pieces[seg]
+        samples = np.maximum(np.ceil(piece_len / step), 1).astype(np.int64) + 1
+        owner = np.repeat(np.arange(len(candidate)), samples)
+        sub_offsets = np.concatenate(([0], np.cumsum(samples)))
+        j = np.arange(sub_offsets[-1]) - sub_offsets[owner]
+        f = f0[candidate][owner] + (j / (samples[owner] - 1)) / pieces[seg][owner]
+        s = seg[owner]
+        sx = start[s, 0] + delta[s, 0] * f
+        sy = start[s, 1] + delta[s, 1] * f
+        hits = np.flatnonzero(self.is_solid(sx, sy))
+        if len(hits) == 0:
+            return None
+        first = hits[0]
+        return int(s[first]), np.array([sx[first], sy[first]])
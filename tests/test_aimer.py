@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5.QtWidgets')
+from PyQt5.QtCore import QPointF  # noqa: E402
+
+import aimer  # noqa: E402
+import ballistics  # noqa: E402
+from terrain import TerrainMask  # noqa: E402
+
+
+@pytest.fixture
+def canvas(app):
+    canvas = aimer.TransparentCanvas()
+    canvas.resize(1200, 800)
+    yield canvas
+    canvas.close()
+
+
+def test_tick_engine_times_impact_by_ticks(canvas):
+    # 逐帧轨迹在第 149.5 帧撞墙, 连续解析解则在 150.4 帧: 第 3 个引线点 (150 帧) 不应保留
+    canvas.set_parameters(200, 9.8, 100.0, 4.0, -10, 1.0)
+    canvas.set_engine('tick')
+    solid = np.zeros((800, 1200), dtype=bool)
+    solid[:, :40] = True
+    canvas.set_terrain(TerrainMask(solid))
+    canvas.center_point = QPointF(100, 600)
+    canvas.current_point = QPointF(100 + 156 * np.cos(0.785), 600 - 156 * np.sin(0.785))
+    canvas.calculate_trajectory()
+    assert canvas.impact_point is not None
+
+    segment = len(canvas.trajectory_points) - 2
+    assert segment == 149
+    assert len(canvas.time_points) == 149 // ballistics.TICKS_PER_FUSE_SECOND
+
+
+def test_shift_right_click_pins_without_moving_the_shooter(canvas):
+    from PyQt5.QtCore import QEvent, Qt
+    from PyQt5.QtGui import QMouseEvent
+
+    def right_click(x, y, modifiers):
+        canvas.mousePressEvent(QMouseEvent(QEvent.MouseButtonPress, QPointF(x, y),
+                                           Qt.RightButton, Qt.RightButton, modifiers))
+
+    canvas.set_parameters(200, 9.8, 100.0, 1.0, 0, 1.0)
+    right_click(100, 600, Qt.NoModifier)
+    canvas.last_angle, canvas.last_power = 0.8, 70
+    right_click(400, 500, Qt.ShiftModifier)
+    assert canvas.center_point == QPointF(100, 600).toPoint()
+    assert [point for point, _, _ in canvas.pinned_shooters] == [QPointF(100, 600).toPoint()]
+    assert canvas.last_angle == 0.8
+    # 在固定的射手上再次 Shift+右键取消固定
+    right_click(102, 601, Qt.ShiftModifier)
+    assert canvas.pinned_shooters == []
+
+
+def test_optional_modes_load_nothing_at_startup():
+    # 单独的进程: 其他测试已经导入过这些模块
+    import subprocess
+    import sys
+
+    code = (
+        'import sys\n'
+        'from PyQt5.QtWidgets import QApplication\n'
+        'app = QApplication([])\n'
+        'import aimer\n'
+        'tool = aimer.AimerTool(restore_settings=False)\n'
+        "print(' '.join(m for m in ('bounce', 'sensitivity', 'session', 'terrain', 'instrumentation',\n"
+        "                           'calibration', 'firing_table', 'uncertainty', 'reachability', 'service')\n"
+        '               if m in sys.modules))\n'
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True,
+                            env={**os.environ, 'QT_QPA_PLATFORM': 'offscreen'}, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_mode_panels_are_built_when_first_enabled(app):
+    tool = aimer.AimerTool(restore_settings=False)
+    assert not hasattr(tool, 'fuse_spin')
+    tool.grenade_button.setChecked(True)
+    assert tool.canvas.grenade == (tool.fuse_spin.value(), tool.restitution_spin.value())
+    tool.fuse_spin.setValue(2)
+    assert tool.canvas.grenade[0] == 2
+    tool.grenade_button.setChecked(False)
+    assert tool.canvas.grenade is None and tool.fuse_spin.isHidden()
+    tool.hit_button.setChecked(True)
+    assert tool.canvas.hit_radius == tool.hit_radius_spin.value()
+    tool.calibration_button.setChecked(True)
+    assert tool.canvas.calibration_mode and tool.calibration_label.text() == '已记录 0 发'
+    tool.close()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import ballistics
+
+PHYSICS = (9.8, 100.0, 3.0, 1.0)  # gravity, max_velocity, wind_power, wind_accel
+
+
+def test_tick_time_counts_ticks():
+    batch = ballistics.tick_trajectories(100, 500, 0.9, 70, *PHYSICS, 1.0, 2000, 1000)
+    points = batch.trajectory(0)
+    dt = 1.0 / ballistics.TICKS_PER_FUSE_SECOND
+    for k in (1, 7, len(points) - 2):
+        assert ballistics.tick_time_to(points, k, points[k], 1.0) == pytest.approx(k * dt)
+    middle = (points[3] + points[4]) / 2
+    assert ballistics.tick_time_to(points, 3, middle, 1.0) == pytest.approx(3.5 * dt)
+
+
+def test_tick_fuse_points_lie_on_tick_vertices():
+    batch = ballistics.tick_trajectories(100, 500, 0.9, 70, *PHYSICS, 1.0, 2000, 1000)
+    points, fuse = batch.trajectory(0), batch.fuse(0)
+    ticks = np.arange(1, len(fuse) + 1) * ballistics.TICKS_PER_FUSE_SECOND
+    ticks = ticks[ticks < len(points)]
+    np.testing.assert_array_equal(points[ticks], fuse[:len(ticks)])
+
+
+def test_trajectory_cache_hits_and_evicts_least_recently_used():
+    cache = ballistics.TrajectoryCache()
+    shot = (100, 500, 0.9, 70, *PHYSICS, 1.0, 2000, 1000)
+    points, _ = cache.trajectory(*shot)
+    expected, _ = ballistics.trajectory(100, 500, round(0.9 / 1e-4) * 1e-4, 70, *PHYSICS, 1.0, 2000, 1000)
+    np.testing.assert_array_equal(points, expected)
+    assert not points.flags.writeable
+    # 同一量化格子内的抖动命中缓存
+    assert cache.trajectory(100.2, 500, 0.90001, 70.001, *shot[4:])[0] is points
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 预算恰好放不下三条: 加入第三条时只淘汰最久未用的那条
+    shots = [shot, (100, 500, 1.1, 70, *shot[4:]), (100, 500, 1.3, 70, *shot[4:])]
+    probe = ballistics.TrajectoryCache()
+    for s in shots:
+        probe.trajectory(*s)
+    cache = ballistics.TrajectoryCache(max_bytes=probe.nbytes - 1)
+    first, second = (cache.trajectory(*s)[0] for s in shots[:2])
+    assert cache.trajectory(*shots[0])[0] is first
+    cache.trajectory(*shots[2])
+    assert (len(cache), cache.evictions) == (2, 1)
+    assert cache.trajectory(*shots[0])[0] is first
+    assert cache.trajectory(*shots[1])[0] is not second
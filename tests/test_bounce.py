@@ -0,0 +1,38 @@
+import numpy as np
+
+import bounce
+from terrain import TerrainMask
+
+SHOT = (200.0, 400.0, 1.2, 30.0, 9.8, 100.0, 0.0, 1.0, 20.0, 1200, 800)
+
+
+def test_flat_ground_detonates_at_the_fuse():
+    solid = np.zeros((800, 1200), dtype=bool)
+    solid[700:] = True
+    flight = bounce.simulate(*SHOT, TerrainMask(solid), fuse_seconds=5, restitution=0.5, budget_ms=1000)
+    # 弹跳衰减后停在地面上, 而不是一路小跳到 MAX_BOUNCES
+    assert not flight.truncated
+    assert flight.detonation is not None
+    assert flight.detonation_time == 5 * SHOT[8]
+    assert len(flight.bounces) >= 1
+    assert (flight.bounces[:, 1] <= 700).all() and (flight.bounces[:, 1] > 698).all()
+    assert len(flight.fuse_points) == 4
+
+
+def test_canvas_bottom_is_the_ground_without_terrain():
+    flight = bounce.simulate(*SHOT, None, fuse_seconds=5, restitution=0.5, budget_ms=1000)
+    assert flight.detonation is not None
+    assert len(flight.bounces) >= 1
+    np.testing.assert_allclose(flight.bounces[:, 1], 800)
+    assert flight.points[:, 1].max() <= 800 + 1e-6
+
+
+def test_wedged_grenade_rests_instead_of_bouncing_in_place():
+    # 起点埋在地形里: 每次反弹都在原地 (用时为 0), 应视为静止而不是记满 MAX_BOUNCES 次
+    solid = np.zeros((800, 1200), dtype=bool)
+    solid[500:] = True
+    shot = (600.0, 650.0, *SHOT[2:])
+    flight = bounce.simulate(*shot, TerrainMask(solid), fuse_seconds=5, restitution=1.0, budget_ms=1000)
+    assert not flight.truncated
+    assert len(flight.bounces) == 1
+    assert flight.detonation_time == 5 * SHOT[8]
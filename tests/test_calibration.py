@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import calibration
+
+TRUE = (12.0, 100.0, 0.7, 3.0)  # gravity, max_velocity, wind_accel, ticks_per_second
+
+
+def synthetic(count, timed, seed=0):
+    # 按真实常数飞行随机时长得到落点
+    gravity, max_velocity, wind_accel, ticks_per_second = TRUE
+    rng = np.random.default_rng(seed)
+    observations = []
+    for i in range(count):
+        x0, y0 = rng.uniform(100, 1500), rng.uniform(300, 900)
+        angle, power, wind = rng.uniform(0.3, 1.4), rng.uniform(40, 100), rng.integers(-5, 6)
+        t = rng.uniform(5, 15)
+        v = max_velocity * power / 100
+        tx = x0 + v * np.cos(angle) * t + 0.5 * wind * wind_accel * t * t
+        ty = y0 - (v * np.sin(angle) * t - 0.5 * gravity * t * t)
+        observations.append(calibration.Observation(
+            x0, y0, angle, power, wind, tx, ty, t / ticks_per_second if i < timed else float('nan')))
+    return observations
+
+
+def test_fit_recovers_the_constants():
+    result = calibration.fit(synthetic(8, timed=3), 9.8, 100.0, 1.0, 1.0)
+    assert result.gravity == pytest.approx(TRUE[0], rel=1e-6)
+    assert result.max_velocity == TRUE[1]
+    assert result.wind_accel == pytest.approx(TRUE[2], rel=1e-6)
+    assert result.ticks_per_second == pytest.approx(TRUE[3], rel=1e-6)
+    assert result.rms < 1e-6
+
+
+def test_untimed_shots_keep_ticks_per_second():
+    result = calibration.fit(synthetic(4, timed=0), 9.8, 100.0, 1.0, 1.0)
+    assert result.ticks_per_second == 1.0
+    assert result.gravity == pytest.approx(TRUE[0], rel=1e-6)
+
+
+def test_too_few_shots():
+    with pytest.raises(ValueError, match='at least'):
+        calibration.fit(synthetic(1, timed=0), 9.8, 100.0, 1.0, 1.0)
@@ -0,0 +1,52 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+import cli
+
+SHOT = '{"x0": 100, "y0": 900, "angle": 45, "power": 80}'
+
+
+def run_lines(lines, chunk, workers=0):
+    output = io.StringIO()
+    specs = cli.read_specs(io.StringIO('\n'.join(lines) + '\n'), 'jsonl')
+    count = cli.run(specs, output, {'points': False}, chunk, workers)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert count == len(results)
+    return results
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_default_ids_are_stream_positions(workers):
+    results = run_lines([SHOT] * 5, chunk=2, workers=workers)
+    assert [r['id'] for r in results] == [0, 1, 2, 3, 4]
+
+
+def test_bad_records_keep_their_place():
+    lines = [SHOT, '{not json', SHOT, '[1, 2]', SHOT.replace('}', ', "id": "x"}')]
+    results = run_lines(lines, chunk=2)
+    assert [r['id'] for r in results] == [0, 1, 2, 3, 'x']
+    assert results[1]['error'].startswith('line 2: bad JSON')
+    assert results[3]['error'] == 'line 4: record must be a JSON object'
+    assert 'error' not in results[2]
+
+
+def test_invalid_numbers_are_errors():
+    results = cli.solve([{'x0': 0, 'y0': 0, 'angle': 'nan', 'power': 50}, {'x0': 0}])
+    assert results[0]['error'].startswith('ValueError: angle must be finite')
+    assert results[1]['error'].startswith('KeyError')
+
+
+def test_target_specs_hit_the_target():
+    spec = {'x0': 100, 'y0': 900, 'tx': 900, 'ty': 700, 'power': 100}
+    assert cli.validate(spec) is None
+    [result] = cli.solve([spec], tolerance=0.05, digits=6)
+    assert len(result['solutions']) == 2
+    for solution in result['solutions']:
+        points = np.array(solution['trajectory'])
+        start, delta = points[:-1], np.diff(points, axis=0)
+        f = np.clip(np.einsum('ij,ij->i', (900, 700) - start, delta)
+                    / np.einsum('ij,ij->i', delta, delta), 0, 1)
+        assert np.hypot(*(start + f[:, None] * delta - (900, 700)).T).min() < 1.0
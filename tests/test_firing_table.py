@@ -0,0 +1,71 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+import ballistics
+import firing_table
+
+PROFILE = firing_table.Profile(4.0, 95.0, 0.49)
+GRID = firing_table.Grid(wind0=-1, winds=3)
+
+
+@pytest.fixture(scope='module')
+def table(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tables')
+    return firing_table.open_table(PROFILE, GRID, str(directory))
+
+
+def test_refined_table_aim_matches_exact_solution(app, table):
+    # 射表插值本身会偏离几个像素; 修正后应与闭式解一致
+    from PyQt5.QtCore import QPointF
+
+    import aimer
+
+    canvas = aimer.TransparentCanvas()
+    canvas.set_parameters(200, *PROFILE[:2], 7.0, 0, PROFILE.wind_accel)
+    canvas.firing_table = table
+    rng = np.random.default_rng(0)
+    compared = 0
+    for _ in range(300):
+        wind = int(rng.integers(-1, 2))
+        canvas.wind_power = wind
+        canvas.center_point = QPointF(*rng.uniform((200, 300), (2800, 1700)))
+        canvas.target_point = QPointF(*rng.uniform((200, 300), (2800, 1700)))
+        power = rng.uniform(20, 100)
+        angles = canvas.aim_angles([power])[0]
+        exact, _ = ballistics.solve_aim(canvas.center_point.x(), canvas.center_point.y(),
+                                        canvas.target_point.x(), canvas.target_point.y(), power,
+                                        *PROFILE[:2], wind, PROFILE.wind_accel)
+        np.testing.assert_array_equal(np.isnan(angles), np.isnan(exact))
+        ok = ~np.isnan(exact)
+        seeds = table.aim(canvas.center_point.x(), canvas.center_point.y(),
+                          canvas.target_point.x(), canvas.target_point.y(), power, wind)
+        compared += int((ok & ~np.isnan(seeds)).sum())
+        assert np.abs(angles[ok] - exact[ok]).max(initial=0) < 1e-7
+    assert compared > 100
+    canvas.close()
+
+
+def test_refine_aim_hits_the_target():
+    x0, y0, tx, ty = 300.0, 1200.0, 1500.0, 900.0
+    exact, _ = ballistics.solve_aim(x0, y0, tx, ty, 90, *PROFILE[:2], 2, PROFILE.wind_accel)
+    seeds = exact + math.radians(0.8)
+    angles, miss = ballistics.refine_aim(x0, y0, tx, ty, seeds, 90, *PROFILE[:2], 2, PROFILE.wind_accel)
+    np.testing.assert_allclose(angles, exact, atol=1e-9)
+    assert (miss < 1e-6).all()
+
+
+def test_prune_keeps_most_recently_used(tmp_path):
+    grid = firing_table.Grid(wind0=0, winds=1, powers=2, drops=2, angles=2)
+    paths = []
+    for i in range(4):
+        paths.append(firing_table.table_path((4.0 + i, 95.0, 0.49), grid, str(tmp_path)))
+        firing_table.build(paths[-1], (4.0 + i, 95.0, 0.49), grid)
+    for age, path in enumerate(reversed(paths)):
+        stamp = 1_000_000 - age * 100
+        os.utime(path, (stamp, stamp))
+    firing_table.prune(str(tmp_path), keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        os.path.basename(p) for p in paths[2:])
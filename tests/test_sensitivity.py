@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+import pytest
+
+import sensitivity
+
+SHOT = (200.0, 700.0, 0.9, 60.0)  # x0, y0, angle, power
+PHYSICS = (9.8, 100.0, 2.0, 1.0)  # gravity, max_velocity, wind_power, wind_accel
+WIDTH, HEIGHT = 3000, 1000
+
+
+def ground_x(angle, power):
+    # 暴力求解: 落到画布底边时的 x
+    x0, y0 = SHOT[:2]
+    gravity, max_velocity, wind_power, wind_accel = PHYSICS
+    v = max_velocity * power / 100
+    vx, vy = v * np.cos(angle), v * np.sin(angle)
+    t = (vy + np.sqrt(vy * vy + 2 * gravity * (HEIGHT - y0))) / gravity
+    return x0 + vx * t + 0.5 * wind_power * wind_accel * t * t
+
+
+def analyze(radius=sensitivity.DEFAULT_HIT_RADIUS):
+    t, normal = sensitivity.canvas_landing(*SHOT, *PHYSICS, WIDTH, HEIGHT)
+    np.testing.assert_array_equal(normal, (0.0, -1.0))
+    return sensitivity.analyze(*SHOT, *PHYSICS, t, normal, radius)
+
+
+def test_landing_jacobian_matches_finite_differences():
+    result = analyze()
+    assert result.landing[1] == pytest.approx(HEIGHT)
+    assert result.landing[0] == pytest.approx(ground_x(*SHOT[2:]))
+    h = 1e-6
+    angle, power = SHOT[2:]
+    assert result.landing_jacobian[0, 0] == pytest.approx(
+        (ground_x(angle + h, power) - ground_x(angle - h, power)) / (2 * h), rel=1e-5)
+    assert result.landing_jacobian[0, 1] == pytest.approx(
+        (ground_x(angle, power + h) - ground_x(angle, power - h)) / (2 * h), rel=1e-5)
+    np.testing.assert_allclose(result.landing_jacobian[1], 0, atol=1e-9)
+
+
+@pytest.mark.parametrize('radius', [5, 30, 200])
+def test_hit_ranges_match_brute_force(radius):
+    result = analyze(radius)
+    angle, power = SHOT[2:]
+    nominal = ground_x(angle, power)
+    for (low, high), value, grid, landing in (
+            (result.angle_range, angle, np.linspace(angle - math.pi / 2, angle + math.pi / 2, 200001),
+             lambda a: ground_x(a, power)),
+            (result.power_range, power, np.linspace(0, 100, 200001), lambda p: ground_x(angle, p))):
+        # 标称值两侧连续命中的区间
+        hit = np.abs(landing(grid) - nominal) < radius
+        centre = np.searchsorted(grid, value)
+        misses = np.flatnonzero(~hit)
+        below, above = misses[misses < centre], misses[misses >= centre]
+        expected_low = grid[below[-1]] if len(below) else grid[0]
+        expected_high = grid[above[0]] if len(above) else grid[-1]
+        step = grid[1] - grid[0]
+        assert low == pytest.approx(expected_low, abs=2 * step)
+        assert high == pytest.approx(expected_high, abs=2 * step)
+        assert low < value < high
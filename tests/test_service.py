@@ -0,0 +1,54 @@
+import asyncio
+
+import cli
+import service
+
+SPECS = [{'id': i, 'x0': 100, 'y0': 900, 'angle': 30 + 5 * i, 'power': 80} for i in range(6)]
+
+
+def test_concurrent_requests_share_a_batch():
+    async def main():
+        solver = service.SolverService(window=0.05)
+        solver.start()
+        try:
+            bad = {'id': 'bad', 'x0': 0, 'y0': 0, 'angle': 'nan', 'power': 50}
+            return await asyncio.gather(*(solver.solve(dict(spec)) for spec in SPECS + [bad])), solver
+        finally:
+            await solver.stop()
+
+    results, solver = asyncio.run(main())
+    # 不合法的请求直接回复错误, 其余请求在同一批内求解, 结果与 cli.solve 一致
+    assert results[-1]['error'].startswith('ValueError: angle must be finite')
+    assert results[:-1] == cli.solve(SPECS, solver.defaults, solver.tolerance, solver.digits)
+    assert (solver.metrics.batches, solver.metrics.solved, solver.metrics.errors) == (1, len(SPECS), 1)
+
+
+def test_expired_requests_are_not_solved():
+    async def main():
+        solver = service.SolverService(window=0.2)
+        solver.start()
+        try:
+            return await solver.solve(dict(SPECS[0]), deadline=0.01), solver
+        finally:
+            await solver.stop()
+
+    result, solver = asyncio.run(main())
+    assert result == {'id': 0, 'error': 'deadline exceeded'}
+    assert (solver.metrics.expired, solver.metrics.batches) == (1, 0)
+
+
+def test_client_round_trip_over_unix_socket(tmp_path):
+    path = str(tmp_path / 'solver.sock')
+    thread = service.ServiceThread(service.SolverService(), path=path)
+    thread.start()
+    try:
+        client = service.Client(path=path)
+        result = client.request(**SPECS[1], points=False)
+        assert result['id'] == 1
+        assert result['solutions'] and 'trajectory' not in result['solutions'][0]
+        assert client.request(op='solve', deadline_ms=-1)['error'] == 'deadline_ms must be a positive number'
+        assert client.request(op='nope')['error'] == "unknown op 'nope'"
+        assert client.metrics()['solved'] == 1
+        client.close()
+    finally:
+        thread.stop()
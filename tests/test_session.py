@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import session
+
+pytest.importorskip('PyQt5.QtWidgets')
+from PyQt5.QtCore import QEvent, QPointF, Qt  # noqa: E402
+from PyQt5.QtGui import QMouseEvent  # noqa: E402
+
+import aimer  # noqa: E402
+from terrain import TerrainMask  # noqa: E402
+
+
+def make_tool(app):
+    tool = aimer.AimerTool(restore_settings=False)
+    tool.show()
+    app.processEvents()
+    return tool
+
+
+def send(canvas, kind, x, y, button, buttons, modifiers=Qt.NoModifier):
+    event = QMouseEvent(kind, QPointF(x, y), button, buttons, modifiers)
+    {QEvent.MouseButtonPress: canvas.mousePressEvent,
+     QEvent.MouseMove: canvas.mouseMoveEvent,
+     QEvent.MouseButtonRelease: canvas.mouseReleaseEvent}[kind](event)
+    canvas.scheduler.flush()
+
+
+def drag(canvas, start, end, steps=8):
+    send(canvas, QEvent.MouseButtonPress, *start, Qt.LeftButton, Qt.LeftButton)
+    for x, y in np.linspace(start, end, steps)[1:]:
+        send(canvas, QEvent.MouseMove, x, y, Qt.NoButton, Qt.LeftButton)
+    send(canvas, QEvent.MouseButtonRelease, *end, Qt.LeftButton, Qt.NoButton)
+
+
+def test_replay_follows_mode_changes(app, tmp_path):
+    path = tmp_path / 'modes.aimlog'
+    tool = make_tool(app)
+    canvas = tool.canvas
+    canvas.start_recording(str(path))
+    send(canvas, QEvent.MouseButtonPress, 100, 300, Qt.RightButton, Qt.RightButton)
+    drag(canvas, (100, 300), (180, 240))
+    canvas.set_engine('tick')
+    drag(canvas, (100, 300), (170, 230))
+    solid = np.zeros((canvas.height(), canvas.width()), dtype=bool)
+    solid[350:, :] = True
+    solid[200:260, 300:307] = True  # 宽度不是 8 的倍数, 检查 packbits 的还原
+    canvas.set_terrain(TerrainMask(solid))
+    canvas.set_grenade(2.0, 0.5)
+    drag(canvas, (100, 300), (160, 250))
+    canvas.set_hit_radius(12)
+    drag(canvas, (100, 300), (190, 260))
+    canvas.stop_recording()
+    live = session.canvas_output(canvas)
+    tool.close()
+
+    records = session.read_session(str(path))
+    kinds = set(records['kind'].tolist())
+    assert {session.ENGINE, session.TERRAIN, session.DATA, session.GRENADE} <= kinds
+
+    replayed = make_tool(app)
+    session.replay(records, replayed.canvas, replayed)
+    assert replayed.canvas.engine == 'tick'
+    assert replayed.canvas.grenade == (2.0, 0.5)
+    assert replayed.canvas.hit_radius == 12
+    np.testing.assert_array_equal(replayed.canvas.terrain.bits, canvas.terrain.bits)
+    assert session.canvas_output(replayed.canvas) == live
+    replayed.close()
+
+
+def test_log_is_readable_before_close(app, tmp_path):
+    path = tmp_path / 'open.aimlog'
+    tool = make_tool(app)
+    tool.canvas.start_recording(str(path))
+    tool.canvas.set_aim_mode(True)
+    records = session.read_session(str(path))
+    assert records['kind'][-1] == session.AIM_MODE
+    assert records['values'][-1][0] == 1
+    tool.canvas.stop_recording()
+    tool.close()
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+import ballistics
+import uncertainty
+
+SHOT = (300, 1500, math.radians(55), 75, 4.0, 95, 3, 0.49)
+
+
+def _dense_band(model, width=3240, height=1800, steps=20000):
+    # 参考解: 密集采样每个样本, 找它穿过每个测站法线的位置
+    x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel = SHOT
+    powers, winds, accels = model.perturb(power, wind_power, wind_accel)
+    vx, vy = ballistics.launch_velocity(angle, powers, max_velocity)
+    ax = winds * accels
+    t_exit = ballistics.exit_times(x0, y0, vx, vy, ax, gravity, width, height)
+    n0x, n0y = ballistics.launch_velocity(angle, power, max_velocity)
+    nominal_ax = wind_power * wind_accel
+    nt = ballistics.exit_times(x0, y0, n0x, n0y, nominal_ax, gravity, width, height) * \
+        np.linspace(0, 1, uncertainty.ENVELOPE_COLUMNS)
+    cx = x0 + n0x * nt + 0.5 * nominal_ax * nt * nt
+    cy = y0 - (n0y * nt - 0.5 * gravity * nt * nt)
+    tx, ty = n0x + nominal_ax * nt, -(n0y - gravity * nt)
+    norm = np.hypot(tx, ty)
+    tx, ty = tx / norm, ty / norm
+    t = t_exit[:, None] * np.linspace(0, 1, steps)
+    px = x0 + vx[:, None] * t + 0.5 * ax[:, None] * t * t
+    py = y0 - (vy[:, None] * t - 0.5 * gravity * t * t)
+    widths = []
+    for k in range(len(nt)):
+        along = (px - cx[k]) * tx[k] + (py - cy[k]) * ty[k]
+        offset = ((py - cy[k]) * tx[k] - (px - cx[k]) * ty[k])[:, :-1]
+        crossing = offset[(along[:, :-1] <= 0) & (along[:, 1:] > 0)]
+        widths.append(max(crossing.max(), 0) - min(crossing.min(), 0))
+    return np.array(widths)
+
+
+def test_band_matches_crossings_along_the_arc():
+    model = uncertainty.WindUncertainty(samples=200)
+    result = uncertainty.envelope(*SHOT, model, 3240, 1800)
+    half = len(result.band) // 2
+    widths = np.hypot(*(result.band[:half] - result.band[::-1][:half]).T)
+    assert half == uncertainty.ENVELOPE_COLUMNS
+    np.testing.assert_allclose(widths, _dense_band(model), atol=1.0)
+
+
+def test_wind_is_sampled_in_whole_notches():
+    _, winds, _ = uncertainty.WindUncertainty(wind_sigma=3.0).perturb(70, 9, 0.49)
+    np.testing.assert_array_equal(winds, np.rint(winds))
+    assert winds.max() <= uncertainty.WIND_NOTCHES
+    assert len(np.unique(winds)) > 3
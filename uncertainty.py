@@ -0,0 +1,170 @@
+"""Monte Carlo spread of a shot under uncertain wind and power.
+
+The wind read off the game is often a notch off and ``wind_accel`` is only
+roughly calibrated, so instead of one arc the canvas can show the band a
+perturbed shot stays in and the spread of where it lands. The wind is
+perturbed by whole slider notches, as the game sets it.
+
+The band is built at a fixed number of stations along the nominal arc:
+at each one, every sample is followed to where it crosses the station's
+normal line (the distance along the arc is a quadratic in t, so the
+crossing has a closed form, vectorized over all samples and stations),
+and the band spans the min/max offset of those crossings. Comparing at the same place along the arc instead of the
+same relative time keeps the band wide where the perturbed arcs' flight
+times diverge, near the apex and towards the end.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+import ballistics
+
+DEFAULT_SAMPLES = 2000
+ENVELOPE_COLUMNS = 96  # Instants per shot the band is evaluated at
+REFINE_STEPS = 8  # Bisection steps locating a terrain impact between two instants
+WIND_NOTCHES = 10  # The wind slider goes from -WIND_NOTCHES to +WIND_NOTCHES
+
+
+class Envelope(NamedTuple):
+    """Band and landing spread of a perturbed shot.
+
+    ``band`` is a closed (k, 2) polygon around the nominal arc.
+    ``landings`` holds every sample's landing point (canvas edge or
+    terrain). The spread ellipse is centred on ``center`` with semi-axes
+    ``axes`` rotated by ``angle`` radians (screen coordinates).
+    """
+    band: np.ndarray
+    landings: np.ndarray
+    center: np.ndarray
+    axes: np.ndarray
+    angle: float
+
+
+class WindUncertainty:
+    """Perturbation model for the Monte Carlo envelope.
+
+    ``wind_sigma`` is in wind-slider notches (the drawn offsets are
+    rounded to whole notches), ``accel_sigma`` relative to ``wind_accel``
+    and ``power_sigma`` in power percentage points. The standard normal
+    draws are fixed per instance, so the band moves smoothly while
+    dragging instead of flickering.
+    """
+
+    def __init__(self, samples=DEFAULT_SAMPLES, wind_sigma=1.0, accel_sigma=0.1,
+                 power_sigma=1.0, ellipse_sigma=2.0, seed=0):
+        self.samples = samples
+        self.wind_sigma = wind_sigma
+        self.accel_sigma = accel_sigma
+        self.power_sigma = power_sigma
+        self.ellipse_sigma = ellipse_sigma
+        self.normals = np.random.default_rng(seed).standard_normal((samples, 3))
+
+    def perturb(self, power, wind_power, wind_accel):
+        """Perturbed (power, wind_power, wind_accel) arrays, one entry per sample."""
+        z = self.normals
+        # 游戏里的风力只有整数档位
+        wind = np.clip(wind_power + np.rint(self.wind_sigma * z[:, 1]), -WIND_NOTCHES, WIND_NOTCHES)
+        return (np.clip(power + self.power_sigma * z[:, 0], 0, 100),
+                wind,
+                wind_accel * (1 + self.accel_sigma * z[:, 2]))
+
+
+def _positions(x0, y0, v0x, v0y, wind_ax, gravity, t):
+    return (x0 + v0x * t + 0.5 * wind_ax * t * t,
+            y0 - (v0y * t - 0.5 * gravity * t * t))
+
+
+def _spread_ellipse(landings, sigma):
+    # 落点协方差的特征分解: 半轴为 sigma 倍标准差
+    center = landings.mean(axis=0)
+    if len(landings) < 3:
+        return center, np.zeros(2), 0.0
+    values, vectors = np.linalg.eigh(np.cov(landings, rowvar=False))
+    axes = sigma * np.sqrt(np.maximum(values[::-1], 0.0))
+    major = vectors[:, 1]
+    return center, axes, float(np.arctan2(major[1], major[0]))
+
+
+def envelope(x0, y0, angle, power, gravity, max_velocity, wind_power, wind_accel,
+             model, width=ballistics.DEFAULT_CANVAS_SIZE, height=ballistics.DEFAULT_CANVAS_SIZE,
+             terrain=None, columns=ENVELOPE_COLUMNS):
+    """Envelope of ``model.samples`` perturbed copies of one shot.
+
+    The band has ``columns`` stations along the nominal arc; a sample counts
+    at a station if it crosses the station's normal line before it leaves
+    the canvas or, with ``terrain``, hits the first solid pixel. Returns an
+    :class:`Envelope`, or None when no sample ever lands.
+    """
+    powers, wind_powers, wind_accels = model.perturb(power, wind_power, wind_accel)
+    v0x, v0y = ballistics.launch_velocity(angle, powers, max_velocity)
+    wind_ax = wind_powers * wind_accels
+    t_exit = ballistics.exit_times(x0, y0, v0x, v0y, wind_ax, gravity, width, height)
+    valid = np.isfinite(t_exit)
+    if not valid.any():
+        return None
+    v0x, v0y, wind_ax, t_exit = v0x[valid], v0y[valid], wind_ax[valid], t_exit[valid]
+
+    # 以相对时刻 s = t / t_exit 表示, 每个样本的位移是 s 和 s^2 的线性组合,
+    # 所有样本在所有时刻的位置可以写成一次矩阵乘法
+    s = np.linspace(0.0, 1.0, columns)
+    basis = np.stack((s, s * s))
+    t_land = t_exit
+    if terrain is not None:
+        # 找到每条轨迹第一个落在实心像素上的时刻, 再在前一时刻之间二分细化
+        coeffs = np.column_stack((v0x * t_exit, 0.5 * wind_ax * t_exit ** 2,
+                                  -v0y * t_exit, 0.5 * gravity * t_exit ** 2))
+        solid = terrain.is_solid(x0 + coeffs[:, :2] @ basis, y0 + coeffs[:, 2:] @ basis)
+        hit = solid.any(axis=1)
+        first = solid.argmax(axis=1)
+        rows = np.flatnonzero(hit & (first > 0))
+        lo, hi = t_exit[rows] * s[first[rows] - 1], t_exit[rows] * s[first[rows]]
+        for _ in range(REFINE_STEPS):
+            mid = 0.5 * (lo + hi)
+            mx, my = _positions(x0, y0, v0x[rows], v0y[rows], wind_ax[rows], gravity, mid)
+            inside = terrain.is_solid(mx, my)
+            hi = np.where(inside, mid, hi)
+            lo = np.where(inside, lo, mid)
+        t_land = t_exit.copy()
+        t_land[rows] = hi
+        t_land[hit & (first == 0)] = 0.0
+    lx, ly = _positions(x0, y0, v0x, v0y, wind_ax, gravity, t_land)
+    landings = np.column_stack((lx, ly))
+
+    # 标称轨迹上的测站及其切向/法向
+    n0x, n0y = ballistics.launch_velocity(angle, power, max_velocity)
+    nominal_ax = wind_power * wind_accel
+    nominal_exit = ballistics.exit_times(x0, y0, n0x, n0y, nominal_ax, gravity, width, height)
+    if not np.isfinite(nominal_exit):
+        nominal_exit = np.median(t_exit)
+    nt = nominal_exit * s
+    cx, cy = _positions(x0, y0, n0x, n0y, nominal_ax, gravity, nt)
+    tx, ty = n0x + nominal_ax * nt, -(n0y - gravity * nt)
+    norm = np.hypot(tx, ty)
+    norm[norm == 0] = 1.0
+    tx, ty = tx / norm, ty / norm
+
+    # 每个样本穿过每个测站法线的时刻: 沿切向的距离 a2 t^2 + a1 t + a0 由负变正的根
+    # (数值稳定的形式), 再求该时刻沿法向 (-ty, tx) 的偏移 b2 t^2 + b1 t + b0.
+    # 对样本线性的系数都由一次矩阵乘法得到; 落地前没有穿过的样本记为 NaN, 不计入
+    a0 = (x0 - cx) * tx + (y0 - cy) * ty
+    b0 = (y0 - cy) * tx - (x0 - cx) * ty
+    velocity = np.column_stack((v0x, -v0y))
+    accel = np.column_stack((0.5 * wind_ax, np.ones_like(wind_ax)))
+    a1 = velocity @ np.stack((tx, ty))
+    a2 = accel @ np.stack((tx, 0.5 * gravity * ty))
+    b1 = velocity @ np.stack((-ty, tx))
+    b2 = accel @ np.stack((-ty, 0.5 * gravity * tx))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = -2 * a0 / (a1 + np.sqrt(a1 * a1 - 4 * a0 * a2))
+        t[~((t >= 0) & (t <= t_land[:, None]))] = np.nan
+        offset = b0 + t * (b1 + b2 * t)
+    upper, lower = np.fmax.reduce(offset, axis=0), np.fmin.reduce(offset, axis=0)
+    shown = ~np.isnan(upper)
+    nx, ny = -ty, tx
+    upper, lower = upper[shown], lower[shown]
+    cx, cy, nx, ny = cx[shown], cy[shown], nx[shown], ny[shown]
+    upper, lower = np.maximum(upper, 0.0), np.minimum(lower, 0.0)
+    band = np.concatenate((np.column_stack((cx + nx * upper, cy + ny * upper)),
+                           np.column_stack((cx + nx * lower, cy + ny * lower))[::-1]))
+    center, axes, rotation = _spread_ellipse(landings, model.ellipse_sigma)
+    return Envelope(band, landings, center, axes, rotation)